@@ -0,0 +1 @@
+"""Quotes API benchmarks."""
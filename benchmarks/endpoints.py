@@ -0,0 +1,281 @@
+"""
+Benchmark of the API endpoints.
+
+Runs requests through the Flask test client against the testing application, backed
+by an in-process mongomock database, so no server or database is needed. Every
+dataset size gets freshly seeded quotes with zipf distributed tags and authors.
+
+Reports the p50 and p99 latency, the requests per second and the median peak
+allocation of every endpoint, and writes them to a JSON file that can be passed as
+the baseline of a later run to compare the p50 latencies. The response cache is off
+unless asked for, so repeated requests measure the endpoint and not the cache.
+
+Requires mongomock, which isn't a dependency of the API: pip install mongomock
+
+Usage: python -m benchmarks.endpoints [--sizes 1000,10000] [--requests 200]
+       [--output results.json] [--baseline previous.json] [--response-cache]
+"""
+
+import io
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+import tracemalloc
+from contextlib import redirect_stdout
+
+from passlib.context import CryptContext
+
+from cli.flask_database import seed_quotes
+from quotes_api.app import create_app
+from quotes_api.config import app_config, TestingConfig
+from quotes_api.extensions import bus, generations
+from quotes_api.api.models import Quote
+from quotes_api.api.helpers import materialize_authors
+from quotes_api.auth.models import User
+
+PASSWORD = "benchmark"
+
+
+def benchmark_config(response_cache):
+    """Testing configuration with a mongomock client."""
+
+    try:
+        import mongomock
+    except ImportError:
+        sys.exit("The endpoint benchmarks need mongomock: pip install mongomock")
+
+    class BenchmarkConfig(TestingConfig):
+        """Testing configuration backed by an in-process mongomock database."""
+
+        MONGODB_SETTINGS = {
+            "db": "benchmark_quotes_database",
+            "host": "mongodb://localhost",
+            "mongo_client_class": mongomock.MongoClient,
+        }
+        RESPONSE_CACHE_TTL = TestingConfig.RESPONSE_CACHE_TTL if response_cache else 0
+
+        # Mongomock doesn't support text indexes
+        SEARCH_BACKEND = "index"
+
+    return BenchmarkConfig
+
+
+def seed_dataset(size):
+    """Replace the quotes with a seeded dataset and create the benchmark users."""
+
+    # The seed progress isn't part of the results
+    with redirect_stdout(io.StringIO()):
+        seed_quotes(Quote, size, authors_number=max(size // 20, 1), distribution="zipf")
+
+    materialize_authors()
+
+    # Drop the indexes built from the previous dataset
+    generations.bump("users", "quotes")
+    bus.publish("quotes", {"op": "reset"})
+
+    User.objects.delete()
+    password = CryptContext(schemes=["sha256_crypt"]).hash(PASSWORD)
+
+    for username, roles in (("user", ["basic"]), ("admin", ["basic", "admin"])):
+        User(
+            username=username,
+            email=f"{username}@benchmark.com",
+            password=password,
+            roles=roles,
+        ).save()
+
+
+def login(client, username):
+    """Get the authorization headers of a benchmark user."""
+
+    data = {"username": username, "password": PASSWORD}
+    access_token = client.post("/auth/login", json=data).get_json()["access_token"]
+
+    return {"authorization": f"Bearer {access_token}"}
+
+
+def endpoint_cases(client):
+    """Get the (name, method, url, options) of every benchmarked request."""
+
+    user_headers = login(client, "user")
+    admin_headers = login(client, "admin")
+
+    quote = Quote._get_collection().find_one({}, {"tags": 1, "quote_text": 1})
+    tag = quote["tags"][0]
+    word = quote["quote_text"].split()[-2]
+    admin_id = str(User.objects.get(username="admin").id)
+    login_data = {"username": "user", "password": PASSWORD}
+
+    return [
+        ("QuoteList", "get", "/api/v1/quotes?page=2&per_page=20", user_headers),
+        ("QuoteList tag", "get", f"/api/v1/quotes?tags={tag}", user_headers),
+        ("QuoteList cursor", "get", "/api/v1/quotes?cursor=&per_page=20", user_headers),
+        ("QuoteList search", "get", f"/api/v1/quotes?query={word}", user_headers),
+        ("QuoteResource", "get", f"/api/v1/quotes/{quote['_id']}", user_headers),
+        ("QuoteRandom", "get", "/api/v1/quotes/random", user_headers),
+        ("AuthorList", "get", "/api/v1/authors?per_page=20", user_headers),
+        ("TagList", "get", "/api/v1/tags?sort_by=count", user_headers),
+        ("UserResource", "get", f"/auth/users/{admin_id}", admin_headers),
+        ("UserLogin", "post", "/auth/login", {"json": login_data}),
+    ]
+
+
+def request_function(client, method, url, options):
+    """Get a function that sends a request and checks it succeeded."""
+
+    # Header dictionaries are the authorization, the rest are request options
+    options = options if "json" in options else {"headers": options}
+    send = getattr(client, method)
+
+    def request():
+        response = send(url, **options)
+
+        if response.status_code != 200:
+            raise RuntimeError(f"{method.upper()} {url}: {response.status_code}")
+
+        return response
+
+    return request
+
+
+def percentile(values, fraction):
+    """Nearest rank percentile of a list of values."""
+
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def measure(request, requests):
+    """Get the latency percentiles, throughput and median peak allocation."""
+
+    # Warm up, then time without tracing allocations
+    for _ in range(max(requests // 10, 1)):
+        request()
+
+    latencies = []
+    start = time.perf_counter()
+
+    for _ in range(requests):
+        request_start = time.perf_counter()
+        request()
+        latencies.append((time.perf_counter() - request_start) * 1000)
+
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    peaks = []
+    for _ in range(max(requests // 20, 1)):
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        request()
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append((peak - baseline) / 1024)
+    tracemalloc.stop()
+
+    return {
+        "p50_ms": round(percentile(latencies, 0.5), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "requests_per_second": round(requests / elapsed, 1),
+        "peak_kib": round(percentile(peaks, 0.5), 1),
+    }
+
+
+def git_commit():
+    """Commit the benchmarks ran on, if they run from a git checkout."""
+
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_baseline(path):
+    """Index the results of a previous run by dataset size and endpoint."""
+
+    if path is None:
+        return {}
+
+    with open(path, encoding="utf-8") as file:
+        results = json.load(file)["results"]
+
+    return {(result["size"], result["endpoint"]): result for result in results}
+
+
+def run(sizes, requests, response_cache, baseline):
+    """Run every endpoint on every dataset size and print a table of results."""
+
+    app_config["benchmark"] = benchmark_config(response_cache)
+    app = create_app("benchmark")
+    client = app.test_client()
+    results = []
+
+    print(
+        f"{'size':>8} {'endpoint':<18} {'p50 ms':>8} {'p99 ms':>8} "
+        f"{'req/s':>8} {'peak KiB':>9} {'vs base':>8}"
+    )
+
+    with app.app_context():
+        for size in sizes:
+            seed_dataset(size)
+
+            for name, method, url, options in endpoint_cases(client):
+                result = {"size": size, "endpoint": name, "url": url}
+                result.update(
+                    measure(request_function(client, method, url, options), requests)
+                )
+                results.append(result)
+
+                previous = baseline.get((size, name))
+                change = (
+                    f"{result['p50_ms'] / previous['p50_ms'] - 1:+.0%}"
+                    if previous and previous["p50_ms"]
+                    else ""
+                )
+
+                print(
+                    f"{size:>8} {name:<18} {result['p50_ms']:>8.3f} "
+                    f"{result['p99_ms']:>8.3f} {result['requests_per_second']:>8.1f} "
+                    f"{result['peak_kib']:>9.1f} {change:>8}"
+                )
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the API endpoints.")
+    parser.add_argument("--sizes", default="1000,10000")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--output", help="Write the results to a JSON file.")
+    parser.add_argument("--baseline", help="Compare with the results of a JSON file.")
+    parser.add_argument("--response-cache", action="store_true")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    results = run(
+        sizes, args.requests, args.response_cache, load_baseline(args.baseline)
+    )
+
+    if args.output:
+        report = {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "requests": args.requests,
+            "response_cache": args.response_cache,
+            "results": results,
+        }
+
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
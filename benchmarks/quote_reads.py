@@ -0,0 +1,135 @@
+"""
+Benchmark of the quote read paths.
+
+Compares hydrating quote documents and dumping them with a new marshmallow schema,
+like the quote resources used to, with reading raw documents through the quote
+repository. Reports the median latency and the peak allocation of each request.
+
+The benchmark quotes get a unique tag and are deleted afterwards.
+
+Usage: python -m benchmarks.quote_reads [--config development] [--rounds 50]
+"""
+
+import os
+import time
+import argparse
+import tracemalloc
+from uuid import uuid4
+from statistics import median
+
+from quotes_api.app import create_app
+from quotes_api.api.models import Quote
+from quotes_api.api.schemas import QuoteSchema
+from quotes_api.api.repository import quote_repository
+from quotes_api.common import OffsetPagination
+
+PAGE_SIZES = (5, 50, 500)
+
+
+def document_page(tag, per_page):
+    """Quote list page read as documents."""
+
+    pagination = OffsetPagination(Quote.objects.filter(tags=tag), 1, per_page, per_page)
+    return QuoteSchema(many=True).dump(pagination.items)
+
+
+def raw_page(tag, per_page):
+    """Quote list page read through the quote repository."""
+
+    pagination = OffsetPagination(
+        quote_repository.find(tags=tag), 1, per_page, per_page
+    )
+    return quote_repository.dump(pagination.items)
+
+
+def document_quote(quote_id):
+    """Single quote read as a document."""
+
+    return QuoteSchema().dump(Quote.objects.get(id=quote_id))
+
+
+def raw_quote(quote_id):
+    """Single quote read through the quote repository."""
+
+    return quote_repository.dump_one(quote_repository.get(quote_id))
+
+
+def measure(function, *args, rounds):
+    """Get the median latency in milliseconds and peak allocation in KiB of a call."""
+
+    # Warm up, then time without tracing allocations
+    function(*args)
+
+    latencies = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        function(*args)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    peaks = []
+    for _ in range(max(rounds // 10, 1)):
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        function(*args)
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append((peak - baseline) / 1024)
+    tracemalloc.stop()
+
+    return median(latencies), median(peaks)
+
+
+def run(rounds):
+    """Seed the benchmark quotes, run every case and print a table of results."""
+
+    tag = f"benchmark-{uuid4().hex}"
+    quotes = [
+        Quote(
+            quote_text=f"Benchmark quote {number} {tag}.",
+            author_name=f"Author {number % 50}",
+            author_image="https://example.com/author.png",
+            tags=[tag, "benchmark"],
+        )
+        for number in range(max(PAGE_SIZES))
+    ]
+    Quote.objects.insert(quotes)
+
+    cases = [("get", document_quote, raw_quote, (quotes[0].id,))] + [
+        (f"list per_page={per_page}", document_page, raw_page, (tag, per_page))
+        for per_page in PAGE_SIZES
+    ]
+
+    try:
+        print(
+            f"{'case':<20} {'documents ms':>13} {'raw ms':>8} "
+            f"{'documents KiB':>14} {'raw KiB':>8}"
+        )
+
+        for name, before, after, args in cases:
+            before_latency, before_peak = measure(before, *args, rounds=rounds)
+            after_latency, after_peak = measure(after, *args, rounds=rounds)
+
+            print(
+                f"{name:<20} {before_latency:>13.3f} {after_latency:>8.3f} "
+                f"{before_peak:>14.1f} {after_peak:>8.1f}"
+            )
+
+    finally:
+        Quote.objects.filter(tags=tag).delete()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the quote read paths.")
+    parser.add_argument(
+        "--config", default=os.getenv("APP_CONFIGURATION", "development")
+    )
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    app = create_app(args.config)
+    with app.app_context():
+        run(args.rounds)
+
+
+if __name__ == "__main__":
+    main()
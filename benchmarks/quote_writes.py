@@ -0,0 +1,107 @@
+"""
+Benchmark of the quote write paths.
+
+Compares saving quotes one at a time, like creating them through the quote resource,
+with writing them in chunks with the bulk writer, as inserts and as upserts over the
+same quotes. Reports the throughput of each one in quotes per second.
+
+The benchmark quotes get a unique tag and are deleted afterwards.
+
+Usage: python -m benchmarks.quote_writes [--config development] [--quotes 5000]
+"""
+
+import os
+import time
+import argparse
+from uuid import uuid4
+
+from quotes_api.app import create_app
+from quotes_api.api.models import Quote
+from quotes_api.api.bulk import QuoteBulkWriter
+
+CHUNK_SIZES = (100, 1000)
+
+
+def quote_items(tag, quotes_number):
+    """Quote items as they're sent to the bulk endpoint."""
+
+    return [
+        {
+            "quote_text": f"Benchmark quote {number} {tag}.",
+            "author_name": f"Author {number % 50}",
+            "author_image": "https://example.com/author.png",
+            "tags": [tag, "benchmark"],
+        }
+        for number in range(quotes_number)
+    ]
+
+
+def save_each(items, chunk_size):
+    """Save the quotes one at a time."""
+
+    for item in items:
+        Quote(**item).save()
+
+
+def bulk_insert(items, chunk_size):
+    """Insert the quotes with the bulk writer."""
+
+    QuoteBulkWriter(chunk_size=chunk_size).write(items)
+
+
+def bulk_upsert(items, chunk_size):
+    """Upsert the quotes with the bulk writer, over the quotes already inserted."""
+
+    QuoteBulkWriter(upsert=True, chunk_size=chunk_size).write(items)
+
+
+def measure(function, items, chunk_size):
+    """Get the throughput in quotes per second of writing the quotes."""
+
+    start = time.perf_counter()
+    function(items, chunk_size)
+
+    return len(items) / (time.perf_counter() - start)
+
+
+def run(quotes_number):
+    """Run every case on new benchmark quotes and print a table of results."""
+
+    tag = f"benchmark-{uuid4().hex}"
+    items = quote_items(tag, quotes_number)
+
+    cases = [("save", save_each, None)]
+    for chunk_size in CHUNK_SIZES:
+        cases.append((f"insert chunk={chunk_size}", bulk_insert, chunk_size))
+        cases.append((f"upsert chunk={chunk_size}", bulk_upsert, chunk_size))
+
+    try:
+        print(f"{'case':<20} {'quotes/s':>10}")
+
+        for name, function, chunk_size in cases:
+            # Upserts replace the quotes of the insert before them
+            if function is not bulk_upsert:
+                Quote.objects.filter(tags=tag).delete()
+
+            throughput = measure(function, items, chunk_size)
+            print(f"{name:<20} {throughput:>10.0f}")
+
+    finally:
+        Quote.objects.filter(tags=tag).delete()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the quote write paths.")
+    parser.add_argument(
+        "--config", default=os.getenv("APP_CONFIGURATION", "development")
+    )
+    parser.add_argument("--quotes", type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    app = create_app(args.config)
+    with app.app_context():
+        run(args.quotes)
+
+
+if __name__ == "__main__":
+    main()
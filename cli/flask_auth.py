@@ -0,0 +1,22 @@
+import click
+from flask.cli import with_appcontext
+
+from quotes_api.auth.helpers import prune_database
+
+
+@click.group()
+def auth():
+    """Run authentication related tasks."""
+
+
+@auth.command()
+@with_appcontext
+def prune():
+    """
+    Delete the expired tokens with a single bulk delete.
+
+    :return: None
+    """
+
+    reclaimed = prune_database()
+    click.echo(f"Pruned {reclaimed} expired tokens.")
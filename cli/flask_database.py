@@ -1,4 +1,11 @@
-from random import randrange
+import os
+import gzip
+import time
+from hashlib import blake2b
+from collections import deque
+from itertools import islice
+from multiprocessing import Pool
+from random import Random
 from passlib.context import CryptContext
 
 import click
@@ -6,9 +13,20 @@ from faker import Faker
 from flask import current_app
 from flask.cli import with_appcontext
 
-from quotes_api.extensions import odm as database_ext
-from quotes_api.api.models import Quote
-from quotes_api.auth.models import User
+from quotes_api.extensions import odm as database_ext, bus, generations
+from quotes_api.api.models import Quote, Author
+from quotes_api.api.helpers import materialize_authors
+from quotes_api.api.search import InvertedIndexBackend
+from quotes_api.api.bulk import (
+    QuoteBulkWriter,
+    InvalidItem,
+    read_ndjson,
+    read_json_array,
+    read_csv,
+)
+from quotes_api.api.resources import QuoteList, QuoteRandom
+from quotes_api.auth.models import User, TokenBlacklist
+from quotes_api.common import parse_tag_expression
 
 fake = Faker()
 
@@ -36,17 +54,514 @@ def init():
 
 
 @database.command()
+@click.option("--quotes", "quotes_number", type=int, default=100, help="Quotes.")
+@click.option("--authors", "authors_number", type=int, default=50, help="Authors.")
+@click.option("--tags", "tags_number", type=int, default=200, help="Distinct tags.")
+@click.option(
+    "--tag-distribution",
+    type=click.Choice(["uniform", "zipf"]),
+    default="uniform",
+    help="Popularity of the tags and the authors.",
+)
+@click.option("--workers", type=int, default=1, help="Generator processes.")
+@click.option("--seed", "random_seed", type=int, default=0, help="Random seed.")
+@click.option("--chunk-size", type=int, help="Quotes per bulk insert.")
 @with_appcontext
-def seed():
+def seed(
+    quotes_number,
+    authors_number,
+    tags_number,
+    tag_distribution,
+    workers,
+    random_seed,
+    chunk_size,
+):
     """
     Seed the database with initial values.
+
+    Quotes are generated deterministically from the seed, so the same options always
+    give the same collection, whatever the number of workers.
     :return: None
     """
     app_config = current_app.config
     pwd_hasher = CryptContext(schemes=["sha256_crypt"])
 
     seed_admin(app_config, User, pwd_hasher)
-    seed_quotes(Quote, 100)
+    seed_quotes(
+        Quote,
+        quotes_number,
+        authors_number=authors_number,
+        tags_number=tags_number,
+        distribution=tag_distribution,
+        workers=workers,
+        random_seed=random_seed,
+        chunk_size=chunk_size or app_config["QUOTE_BULK_CHUNK_SIZE"],
+    )
+    seed_authors()
+
+    # Let the running workers know their caches and indexes are stale
+    generations.bump("users", "quotes")
+    bus.publish("quotes", {"op": "reset"})
+
+
+@database.command()
+@with_appcontext
+def authors():
+    """
+    Rebuild the authors collection from the quotes.
+
+    :return: None
+    """
+    seed_authors()
+
+
+@database.command("random-keys")
+@click.option("--redraw", is_flag=True, help="Draw new keys for every quote.")
+@with_appcontext
+def random_keys(redraw):
+    """
+    Add random keys to the quotes that don't have one yet.
+
+    Random quotes are picked by seeking on this key, so quotes are drawn as often as
+    the gaps below their keys are wide. Redraw the keys of every quote now and then to
+    even the gaps out.
+    :return: None
+    """
+    click.secho("Adding random keys to quotes...", bg="magenta", fg="white", bold=True)
+
+    try:
+        result = Quote._get_collection().update_many(
+            {} if redraw else {"random_key": {"$exists": False}},
+            [{"$set": {"random_key": {"$rand": {}}}}],
+        )
+
+        # Random draws stop falling back to sampling once every quote has a key
+        generations.bump("quotes")
+
+        click.secho(
+            f"Added random keys to {result.modified_count} quotes.",
+            bg="green",
+            fg="white",
+            bold=True,
+        )
+
+    except Exception:
+        click.secho(
+            "Could not add random keys to quotes.",
+            err=True,
+            bg="red",
+            fg="white",
+            bold=True,
+        )
+
+
+@database.command("search-index")
+@click.argument("path", required=False)
+@with_appcontext
+def search_index(path):
+    """
+    Build the quote search index and write a snapshot of it.
+
+    Workers using the "index" search backend load the snapshot from the
+    "SEARCH_INDEX_SNAPSHOT" path instead of scanning every quote on startup.
+    :return: None
+    """
+    path = path or current_app.config["SEARCH_INDEX_SNAPSHOT"]
+
+    if not path:
+        click.secho(
+            "No snapshot path given and SEARCH_INDEX_SNAPSHOT is not set.",
+            err=True,
+            bg="red",
+            fg="white",
+            bold=True,
+        )
+        return
+
+    click.secho("Building quote search index...", bg="magenta", fg="white", bold=True)
+
+    try:
+        # Always build from the quotes, not from a previous snapshot
+        backend = InvertedIndexBackend(current_app)
+        backend.snapshot_path = None
+
+        index = backend.get_index()
+        index.save(path)
+        click.secho(
+            f"Wrote search index of {len(index)} quotes to {path}.",
+            bg="green",
+            fg="white",
+            bold=True,
+        )
+
+    except Exception:
+        click.secho(
+            "Could not build the quote search index.",
+            err=True,
+            bg="red",
+            fg="white",
+            bold=True,
+        )
+
+
+@database.command("import")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--format",
+    "file_format",
+    type=click.Choice(["json", "ndjson", "csv"]),
+    help="File format. Guessed from the file extension by default.",
+)
+@click.option(
+    "--upsert",
+    is_flag=True,
+    help="Replace quotes with the same text, instead of failing.",
+)
+@click.option("--chunk-size", type=int, help="Quotes per bulk write.")
+@click.option("--workers", type=int, default=1, help="Writer processes.")
+@click.option("--offset", type=int, default=0, help="Quotes to skip, to resume.")
+@with_appcontext
+def import_quotes(path, file_format, upsert, chunk_size, workers, offset):
+    """
+    Import quotes from a JSON, NDJSON or CSV file, optionally gzip compressed.
+
+    The file is streamed through parsing, validation and chunked unordered bulk
+    writes, so files of any size are imported with bounded memory. Quotes repeated
+    in the file are reported and skipped. An interrupted import can be resumed from
+    the offset it reports.
+    :return: None
+    """
+    app_config = current_app.config
+    chunk_size = chunk_size or app_config["QUOTE_BULK_CHUNK_SIZE"]
+    file_format = file_format or _guess_file_format(path)
+
+    writer = QuoteBulkWriter(
+        upsert=upsert,
+        chunk_size=chunk_size,
+        max_errors=app_config["QUOTE_BULK_MAX_ERRORS"],
+    )
+    writer.processed = offset
+
+    click.secho(f"Importing quotes from {path}...", bg="magenta", fg="white", bold=True)
+    start = time.perf_counter()
+    stopped = False
+
+    try:
+        opener = gzip.open if path.endswith(".gz") else open
+
+        with opener(path, "rt", encoding="utf-8", newline="") as file:
+            items = _skip_items(_read_quotes(file, file_format), offset)
+            chunks = _chunk_items(_dedupe_items(items), chunk_size, offset)
+
+            if workers > 1:
+                _write_chunks_in_workers(writer, chunks, upsert, workers, start)
+            else:
+                for chunk_offset, chunk in chunks:
+                    writer.write_chunk(chunk, chunk_offset)
+                    _echo_import_progress(writer, offset, start)
+
+    except (Exception, KeyboardInterrupt) as err:
+        stopped = True
+
+        # The authors of a chunk that failed in a worker aren't known, recount them all
+        if workers > 1:
+            writer.authors = None
+
+        click.secho(f"Import failed: {err!r}", err=True, fg="red")
+        click.secho(
+            f"Import stopped. Resume it with --offset {writer.processed}.",
+            err=True,
+            bg="red",
+            fg="white",
+            bold=True,
+        )
+
+    finally:
+        # Let the running workers know their caches and indexes are stale
+        writer.finish()
+
+    for error in writer.errors:
+        click.secho(f"Quote {error['index']}: {error['messages']}", fg="red")
+
+    click.secho(
+        f"Imported {writer.inserted} quotes and updated {writer.updated}, "
+        f"{writer.failed} failed.",
+        bg="green",
+        fg="white",
+        bold=True,
+    )
+
+    # Fail the command, so scripts don't take a stopped import for a finished one
+    if stopped:
+        raise click.exceptions.Exit(1)
+
+
+def _guess_file_format(path):
+    """
+    Guess the format of a quotes file from its extension.
+
+    :param path: File path, with an optional ".gz" extension
+    :return: "json", "ndjson" or "csv"
+    """
+    extension = os.path.splitext(path[:-3] if path.endswith(".gz") else path)[1]
+
+    if extension == ".csv":
+        return "csv"
+
+    if extension in (".ndjson", ".jsonl"):
+        return "ndjson"
+
+    return "json"
+
+
+def _read_quotes(file, file_format):
+    """
+    Parse the quote items of a file, one at a time.
+
+    :param file: Text file
+    :param file_format: "json", "ndjson" or "csv"
+    :return: Iterator of quote items
+    """
+    if file_format == "csv":
+        return read_csv(file)
+
+    if file_format == "ndjson":
+        return read_ndjson(file)
+
+    return read_json_array(file)
+
+
+def _skip_items(items, offset):
+    """
+    Skip the items already imported by a previous run.
+
+    :param items: Iterator of quote items
+    :param offset: Number of items to skip
+    :return: Iterator of the remaining items
+    """
+    for _ in islice(items, offset):
+        pass
+
+    return items
+
+
+def _dedupe_items(items):
+    """
+    Replace the quotes repeated in a file with an error.
+
+    Only a short hash of every quote text is kept, so memory stays low. Quotes that
+    are already in the database are left to the unique index.
+    :param items: Iterator of quote items
+    :return: Iterator of quote items
+    """
+    seen = set()
+
+    for item in items:
+        quote_text = item.get("quote_text") if isinstance(item, dict) else None
+
+        if isinstance(quote_text, str):
+            digest = blake2b(quote_text.encode("utf-8"), digest_size=8).digest()
+
+            if digest in seen:
+                item = InvalidItem({"quote_text": ["Quote repeated in the file."]})
+            else:
+                seen.add(digest)
+
+        yield item
+
+
+def _chunk_items(items, chunk_size, offset):
+    """
+    Group quote items into chunks for the bulk writes.
+
+    :param items: Iterator of quote items
+    :param chunk_size: Number of items per chunk
+    :param offset: Position of the first item in the file
+    :return: Iterator of (offset, chunk) tuples
+    """
+    chunk = []
+
+    for item in items:
+        chunk.append(item)
+
+        if len(chunk) == chunk_size:
+            yield offset, chunk
+            offset += len(chunk)
+            chunk = []
+
+    if chunk:
+        yield offset, chunk
+
+
+def _write_chunks_in_workers(writer, chunks, upsert, workers, start):
+    """
+    Write chunks of quotes in a pool of worker processes.
+
+    Only a couple of chunks per worker are in flight, so reading the file doesn't
+    outrun the writes. Results are collected in file order, so the reported offset
+    is always safe to resume from.
+    :param writer: Quote bulk writer that adds up the reports
+    :param chunks: Iterator of (offset, chunk) tuples
+    :param upsert: Whether to replace quotes with the same text
+    :param workers: Number of worker processes
+    :param start: Start time of the import, for the throughput
+    :return: None
+    """
+    offset = writer.processed
+    configuration = os.getenv("APP_CONFIGURATION", "production")
+
+    with Pool(workers, _init_import_worker, (configuration,)) as pool:
+        pending = deque()
+
+        for chunk_offset, chunk in chunks:
+            pending.append(
+                pool.apply_async(_import_chunk, (chunk, chunk_offset, upsert))
+            )
+
+            if len(pending) >= workers * 2:
+                writer.merge(pending.popleft().get())
+                _echo_import_progress(writer, offset, start)
+
+        while pending:
+            writer.merge(pending.popleft().get())
+            _echo_import_progress(writer, offset, start)
+
+
+def _init_import_worker(configuration):
+    """
+    Create an application with its own database connection in a worker process.
+
+    :param configuration: Application configuration name
+    :return: None
+    """
+    # Imported here, the application factory registers this module
+    from quotes_api.app import create_app
+
+    create_app(configuration).app_context().push()
+
+
+def _import_chunk(chunk, offset, upsert):
+    """
+    Write a chunk of quotes in a worker process.
+
+    :param chunk: List of quote items
+    :param offset: Position of the first item in the file
+    :param upsert: Whether to replace quotes with the same text
+    :return: Report of the bulk writer
+    """
+    writer = QuoteBulkWriter(upsert=upsert, chunk_size=len(chunk))
+    writer.write_chunk(chunk, offset)
+
+    # The authors to refresh, once the import finishes in the main process
+    report = writer.report()
+    report["authors"] = None if writer.authors is None else list(writer.authors)
+
+    return report
+
+
+def _echo_import_progress(writer, offset, start):
+    """
+    Print the progress and the throughput of an import.
+
+    :param writer: Quote bulk writer of the import
+    :param offset: Position the import started from
+    :param start: Start time of the import
+    :return: None
+    """
+    elapsed = time.perf_counter() - start
+    throughput = (writer.processed - offset) / elapsed if elapsed else 0
+
+    click.echo(
+        f"{writer.processed} read, {writer.inserted} inserted, "
+        f"{writer.updated} updated, {writer.failed} failed "
+        f"({throughput:.0f} quotes/s)"
+    )
+
+
+@database.command()
+@with_appcontext
+def indexes():
+    """
+    Create the declared indexes and explain the queries issued by the resources.
+
+    :return: None
+    """
+    click.secho("Creating indexes...", bg="magenta", fg="white", bold=True)
+
+    for model in (Quote, Author, User, TokenBlacklist):
+        model.ensure_indexes()
+        index_names = ", ".join(model._get_collection().index_information())
+        click.secho(f"{model.__name__}: {index_names}", fg="white", bold=True)
+
+    click.secho("\nExplaining query shapes...", bg="magenta", fg="white", bold=True)
+
+    for name, cursor in _query_shapes():
+        winning_plan = cursor.explain()["queryPlanner"]["winningPlan"]
+        summary = _plan_summary(winning_plan.get("queryPlan", winning_plan))
+        color = "red" if "COLLSCAN" in summary else "green"
+
+        click.secho(f"{name}: ", fg="white", bold=True, nl=False)
+        click.secho(summary, fg=color)
+
+
+def _query_shapes():
+    """
+    Build a cursor for every query shape issued by the resources.
+
+    :return: List of (name, cursor) tuples
+    """
+    quote_collection = Quote._get_collection()
+    quote_list = QuoteList()
+    random_filters = QuoteRandom()._build_random_quote_filters
+
+    def random_seek(filters):
+        query = {**filters, "random_key": {"$gte": 0.5}}
+        return quote_collection.find(query).sort("random_key", 1).limit(1)
+
+    def keyset(filters):
+        return Quote.objects(**filters).order_by("+id").limit(6)
+
+    def list_filters(tags, author):
+        expression = parse_tag_expression(tags) if tags is not None else None
+        return quote_list._build_quote_list_filters(expression, author)
+
+    return [
+        ("QuoteList tag", Quote.objects(**list_filters("love", None)).limit(5)),
+        ("QuoteList tags AND", Quote.objects(**list_filters("love,life", None))),
+        ("QuoteList tags OR", Quote.objects(**list_filters("love|life", None))),
+        ("QuoteList tags NOT", Quote.objects(**list_filters("love,!life", None))),
+        ("QuoteList author", Quote.objects(**list_filters(None, "Author")).limit(5)),
+        ("QuoteList tag cursor", keyset(list_filters("love", None))),
+        ("QuoteList author cursor", keyset(list_filters(None, "Author"))),
+        ("QuoteRandom", random_seek({})),
+        ("QuoteRandom tag", random_seek(random_filters("love", None))),
+        ("QuoteRandom tags OR", random_seek(random_filters("love|life", None))),
+        ("QuoteRandom author", random_seek(random_filters(None, "Author"))),
+        ("AuthorList", Author.objects.order_by("+author_name").limit(20)),
+        ("Author recount", Quote.objects(author_name="Author")),
+    ]
+
+
+def _plan_summary(stage):
+    """
+    Summarize a query plan as its chain of stages.
+
+    :param stage: Root stage of the winning plan
+    :return: Stages from the root to the leaf, with their index names
+    """
+    stages = []
+
+    while stage:
+        name = stage["stage"]
+        if "indexName" in stage:
+            name = f"{name} {stage['indexName']}"
+
+        stages.append(name)
+        stage = stage.get("inputStage") or next(
+            iter(stage.get("inputStages", [])), None
+        )
+
+    return " <- ".join(stages)
 
 
 def seed_admin(config, model, pwd_hasher):
@@ -100,90 +615,234 @@ def seed_admin(config, model, pwd_hasher):
         )
 
 
-def seed_quotes(model, quotes_number):
+def seed_quotes(
+    model,
+    quotes_number,
+    authors_number=50,
+    tags_number=200,
+    distribution="uniform",
+    workers=1,
+    random_seed=0,
+    chunk_size=1000,
+):
     """
-    Seed fake quotes.
+    Seed fake quotes, replacing the existing ones.
+
+    Quotes are generated in chunks, each one from its own random generator seeded
+    with the seed and the chunk number, in a pool of worker processes when there are
+    several. Chunks are inserted as they're generated, so memory stays flat.
 
-    :param config: Flask application config
     :param model: Mongoengine document model
+    :param quotes_number: Number of quotes
+    :param authors_number: Number of distinct authors
+    :param tags_number: Number of distinct tags
+    :param distribution: "uniform", or "zipf" to skew the tag and author popularity
+    :param workers: Number of generator processes
+    :param random_seed: Seed of the generated data
+    :param chunk_size: Number of quotes per bulk insert
     :return: None
     """
-    # Create all the quote models
-    quote_instances = []
-
-    for _ in range(0, quotes_number):
-        quote = fake.text()
-        author = fake.name()
-        image = fake.image_url()
-        tags = []
-        for _ in range(randrange(1, 10)):
-            tag = fake.word().lower()
-            tags.append(tag)
-
-        quote_data = {
-            "quote_text": quote,
-            "author_name": author,
-            "author_image": image,
-            "tags": tags,
-        }
-        quote = model(**quote_data)
-        quote_instances.append(quote)
-
     click.secho("\nSeeding quotes...", bg="magenta", fg="white", bold=True)
-    _bulk_insert(model, quote_instances, "Quote documents")
-
-
-def _bulk_insert(model, data, label):
-    """
-    Bulk insert data to a specific model and log it. This is more
-    efficient than adding 1 row at a time in a loop.
 
-    :param model: Model being affected
-    :type model: Mongoengine Document
-    :param data: Document fields to be saved
-    :type data: list
-    :param label: Label for the output
-    :type label: str
-    :return: None
-    """
-    # Delete the current data
     try:
-        click.secho(
-            f"Deleting existing {label} documents...",
-            bg="blue",
-            fg="white",
-            bold=True,
-        )
+        click.secho("Deleting existing quotes...", bg="blue", fg="white", bold=True)
         model.objects().delete()
-        click.secho("Documents deleted", bg="green", fg="white", bold=True)
 
     except Exception:
         click.secho(
-            f"Could not delete previous documents for {label} collection.",
+            "Could not delete the existing quotes.",
+            err=True,
             bg="red",
             fg="white",
             bold=True,
-            err=True,
         )
         return None
 
-    # Bulk insert documents
+    vocabulary = _seed_vocabulary(
+        authors_number, tags_number, distribution, random_seed
+    )
+    collection = model._get_collection()
+    chunks = [
+        (random_seed, start, min(chunk_size, quotes_number - start))
+        for start in range(0, quotes_number, chunk_size)
+    ]
+
+    start_time = time.perf_counter()
+    inserted = 0
+
     try:
-        click.secho(
-            f"Creating {len(data)} documents for {label} collection...",
-            bg="blue",
-            fg="white",
-            bold=True,
-        )
-        model.objects.insert(data, load_bulk=False)
-        click.secho(f"Created {len(data)} {label}", bg="green", fg="white", bold=True)
+        for quotes in _generate_chunks(chunks, vocabulary, workers):
+            collection.insert_many(quotes, ordered=False)
+            inserted += len(quotes)
+
+            elapsed = time.perf_counter() - start_time
+            click.echo(f"{inserted} quotes ({inserted / elapsed:.0f} quotes/s)")
+
+        click.secho(f"Created {inserted} quotes.", bg="green", fg="white", bold=True)
 
     except Exception:
         click.secho(
-            f"Could not bulk insert documents for {label} collection.",
+            f"Could not seed quotes, created {inserted}.",
+            err=True,
             bg="red",
             fg="white",
             bold=True,
-            err=True,
         )
+
+
+def _seed_vocabulary(authors_number, tags_number, distribution, random_seed):
+    """
+    Generate the words, authors and tags shared by every chunk of quotes.
+
+    :param authors_number: Number of distinct authors
+    :param tags_number: Number of distinct tags
+    :param distribution: "uniform" or "zipf"
+    :param random_seed: Seed of the generated data
+    :return: Dictionary of words, authors, tags and their cumulative weights
+    """
+    fake.seed_instance(random_seed)
+    fake.unique.clear()
+
+    words = list(dict.fromkeys(word.lower() for word in fake.get_words_list()))
+    authors = [(fake.unique.name(), fake.image_url()) for _ in range(authors_number)]
+
+    # Pairs of words make up the tags that don't fit in the word list
+    tags = list(words[:tags_number])
+    for first in words:
+        if len(tags) >= tags_number:
+            break
+
+        tags.extend(f"{first}-{second}" for second in words[: tags_number - len(tags)])
+
+    # Popularity goes by rank, so don't let it follow the alphabet
+    Random(random_seed).shuffle(tags)
+
+    return {
+        "words": words,
+        "authors": authors,
+        "author_weights": _cumulative_weights(len(authors), distribution),
+        "tags": tags,
+        "tag_weights": _cumulative_weights(len(tags), distribution),
+    }
+
+
+def _cumulative_weights(size, distribution):
+    """
+    Cumulative popularity weights of a population, ranked from the most popular.
+
+    :param size: Size of the population
+    :param distribution: "uniform", or "zipf" for a weight of 1 / rank
+    :return: List of cumulative weights, or None for uniform
+    """
+    if distribution != "zipf":
         return None
+
+    weights = []
+    total = 0.0
+
+    for rank in range(1, size + 1):
+        total += 1.0 / rank
+        weights.append(total)
+
+    return weights
+
+
+def _generate_chunks(chunks, vocabulary, workers):
+    """
+    Generate chunks of quotes in order, in worker processes when there are several.
+
+    Only a couple of chunks per worker are in flight, so generating doesn't outrun
+    the inserts.
+    :param chunks: List of (seed, start, size) tuples
+    :param vocabulary: Words, authors and tags of the quotes
+    :param workers: Number of generator processes
+    :return: Iterator of lists of quote documents
+    """
+    if workers <= 1:
+        _init_seed_worker(vocabulary)
+        for chunk in chunks:
+            yield _generate_quotes(*chunk)
+
+        return
+
+    with Pool(workers, _init_seed_worker, (vocabulary,)) as pool:
+        pending = deque()
+
+        for chunk in chunks:
+            pending.append(pool.apply_async(_generate_quotes, chunk))
+
+            if len(pending) >= workers * 2:
+                yield pending.popleft().get()
+
+        while pending:
+            yield pending.popleft().get()
+
+
+# Vocabulary of the seed worker process
+_seed_vocabulary_state = {}
+
+
+def _init_seed_worker(vocabulary):
+    """
+    Keep the vocabulary in a worker process, so it's only sent once.
+
+    :param vocabulary: Words, authors and tags of the quotes
+    :return: None
+    """
+    _seed_vocabulary_state.update(vocabulary)
+
+
+def _generate_quotes(random_seed, start, size):
+    """
+    Generate a chunk of quote documents.
+
+    The chunk only depends on the seed and its start, not on the other chunks.
+    :param random_seed: Seed of the generated data
+    :param start: Number of the first quote of the chunk
+    :param size: Number of quotes
+    :return: List of quote documents
+    """
+    rng = Random(f"{random_seed}-{start}")
+    words = _seed_vocabulary_state["words"]
+    authors = _seed_vocabulary_state["authors"]
+    tags = _seed_vocabulary_state["tags"]
+    author_weights = _seed_vocabulary_state["author_weights"]
+    tag_weights = _seed_vocabulary_state["tag_weights"]
+
+    quotes = []
+
+    for number in range(start, start + size):
+        # The quote number keeps the text unique
+        text = " ".join(rng.choices(words, k=rng.randrange(6, 20)))
+        author_name, author_image = rng.choices(authors, cum_weights=author_weights)[0]
+        quote_tags = rng.choices(tags, cum_weights=tag_weights, k=rng.randrange(1, 10))
+
+        quotes.append(
+            {
+                "quote_text": f"{text.capitalize()} {number}.",
+                "author_name": author_name,
+                "author_image": author_image,
+                "tags": list(dict.fromkeys(quote_tags)),
+                "random_key": rng.random(),
+            }
+        )
+
+    return quotes
+
+
+def seed_authors():
+    """
+    Materialize the authors collection from the existing quotes.
+
+    :return: None
+    """
+    click.secho("\nMaterializing authors...", bg="magenta", fg="white", bold=True)
+
+    try:
+        materialize_authors()
+        click.secho("Authors materialized.", bg="green", fg="white", bold=True)
+
+    except Exception:
+        click.secho(
+            "Could not materialize authors.", err=True, bg="red", fg="white", bold=True
+        )
@@ -0,0 +1,328 @@
+"""Quote bulk write file. Validates and writes streams of quotes in chunks."""
+
+import csv
+import json
+from copy import copy
+from collections import namedtuple
+from itertools import islice
+
+from marshmallow import EXCLUDE, ValidationError
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from quotes_api.api.models import Quote
+from quotes_api.api.schemas import QuoteSchema
+from quotes_api.api.helpers import materialize_authors, update_author_counts
+from quotes_api.extensions import bus, generations
+from quotes_api.common import get_schema
+
+DUPLICATE_KEY_ERROR = 11000
+
+# Item that couldn't be parsed, reported as an error of its position
+InvalidItem = namedtuple("InvalidItem", ["error"])
+
+
+def read_ndjson(lines):
+    """Parse NDJSON lines into quote items. Blank lines are skipped."""
+
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8", errors="replace")
+
+        if not line.strip():
+            continue
+
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield InvalidItem({"_schema": ["Invalid JSON."]})
+
+
+def read_json_array(file, buffer_size=1 << 16):
+    """
+    Parse a JSON array of quote items from a text file, one item at a time.
+
+    The file is read in buffers, so arrays of any size are parsed with bounded memory.
+    Raises ValueError when the file isn't a JSON array.
+    """
+
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    started = False
+    eof = False
+
+    while True:
+        # Skip the whitespace and the separators between items
+        while position < len(buffer) and buffer[position] in " \t\r\n,":
+            position += 1
+
+        if position == len(buffer):
+            if eof:
+                raise ValueError("Unterminated JSON array")
+
+            more = file.read(buffer_size)
+            eof = not more
+            buffer = buffer[position:] + more
+            position = 0
+            continue
+
+        if not started:
+            if buffer[position] != "[":
+                raise ValueError("Expected a JSON array")
+
+            started = True
+            position += 1
+            continue
+
+        if buffer[position] == "]":
+            return
+
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+
+        # The item continues in the next buffer
+        except ValueError:
+            if eof:
+                raise
+
+            more = file.read(buffer_size)
+            eof = not more
+            buffer = buffer[position:] + more
+            position = 0
+            continue
+
+        yield item
+
+
+def read_csv(file):
+    """
+    Parse CSV rows with a header into quote items.
+
+    Empty cells are left out, and tags are separated by commas inside their cell.
+    """
+
+    for row in csv.DictReader(file):
+        item = {field: value for field, value in row.items() if value}
+
+        if "tags" in item:
+            item["tags"] = [
+                tag.strip() for tag in item["tags"].split(",") if tag.strip()
+            ]
+
+        yield item
+
+
+class QuoteBulkWriter:
+    """
+    Writes quotes in chunks with unordered bulk writes.
+
+    Every chunk is validated with the quote schema in one pass, and its valid quotes
+    are written with a single unordered "bulk_write", so one failing quote doesn't
+    stop the others. With upserts, quotes with an existing "quote_text" are replaced
+    instead of reported as duplicates, and keep their random key.
+
+    Only the counts and the first "max_errors" errors are kept, so streams of any size
+    are written with bounded memory. Unknown fields, like the ids of exported quotes,
+    are ignored. The authors of the written quotes are recounted one by one when they
+    are at most "max_author_recounts", and the authors collection is rebuilt otherwise.
+    """
+
+    def __init__(
+        self, upsert=False, chunk_size=1000, max_errors=100, max_author_recounts=100
+    ):
+        self.upsert = upsert
+        self.chunk_size = chunk_size
+        self.max_errors = max_errors
+        self.max_author_recounts = max_author_recounts
+        self.schema = get_schema(QuoteSchema, many=True, unknown=EXCLUDE)
+        self.collection = Quote._get_collection()
+
+        # Database field names and defaults of the model, without building documents
+        self.db_fields = {name: field.db_field for name, field in Quote._fields.items()}
+        self.defaults = {
+            field.db_field: field.default
+            for field in Quote._fields.values()
+            if field.default is not None
+        }
+
+        self.processed = 0
+        self.inserted = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors = []
+
+        # Authors whose counts may have changed, None when there are too many to recount
+        self.authors = set()
+
+    def write(self, items):
+        """Write an iterable of quote items, chunk by chunk."""
+
+        items = iter(items)
+
+        while True:
+            chunk = list(islice(items, self.chunk_size))
+            if not chunk:
+                return self
+
+            self.write_chunk(chunk)
+
+    def write_chunk(self, chunk, offset=None):
+        """
+        Validate and write a list of quote items with a single bulk write.
+
+        Errors are reported by position, counting from the given offset or from the
+        items written before.
+        """
+
+        offset = self.processed if offset is None else offset
+
+        positions = []
+        raw_quotes = []
+
+        for position, item in enumerate(chunk):
+            if isinstance(item, InvalidItem):
+                self._error(offset + position, item.error)
+            else:
+                positions.append(position)
+                raw_quotes.append(item)
+
+        try:
+            quotes = self.schema.load(raw_quotes)
+            messages = {}
+
+        # Valid data keeps one entry per item, also for the invalid ones
+        except ValidationError as error:
+            quotes = error.valid_data
+            messages = error.messages
+
+        requests = []
+        request_positions = []
+        written_quotes = []
+
+        for index, (position, quote) in enumerate(zip(positions, quotes)):
+            if index in messages:
+                self._error(offset + position, messages[index])
+            else:
+                written_quotes.append(quote)
+                requests.append(self._request(quote))
+                request_positions.append(position)
+
+        if requests:
+            self._add_written_authors(written_quotes)
+            self._bulk_write(requests, request_positions, offset)
+
+        # Only written chunks are processed, so a failed chunk is resumed from its start
+        self.processed += len(chunk)
+
+    def merge(self, report):
+        """Add up the report of another writer, like the one of a worker process."""
+
+        self.processed += report["processed"]
+        self.inserted += report["inserted"]
+        self.updated += report["updated"]
+        self.failed += report["failed"]
+
+        room = self.max_errors - len(self.errors)
+        self.errors.extend(report["errors"][: max(room, 0)])
+
+        if report.get("authors") is None:
+            self.authors = None
+        else:
+            self._add_authors(report["authors"])
+
+    def finish(self):
+        """
+        Refresh what depends on the quotes after writing some.
+
+        Recounts the authors of the written quotes, or rebuilds the authors collection
+        once when there are too many of them, and lets the workers know their caches
+        and indexes are stale. Call it also after a failed write, earlier chunks may
+        have been written.
+        """
+
+        # Authors are added before their chunk is written, so they tell apart attempts
+        if self.authors is None:
+            materialize_authors()
+        elif self.authors:
+            update_author_counts(*self.authors)
+        else:
+            return self
+
+        generations.bump("quotes")
+        bus.publish("quotes", {"op": "reset"})
+
+        return self
+
+    def report(self):
+        """Summary of the written quotes and the errors."""
+
+        return {
+            "processed": self.processed,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "failed": self.failed,
+            "errors": self.errors,
+        }
+
+    def _bulk_write(self, requests, request_positions, offset):
+        try:
+            result = self.collection.bulk_write(requests, ordered=False).bulk_api_result
+
+        except BulkWriteError as error:
+            result = error.details
+
+            for write_error in result["writeErrors"]:
+                if write_error["code"] == DUPLICATE_KEY_ERROR:
+                    message = {"quote_text": ["Quote already exists."]}
+                else:
+                    message = {"_schema": [write_error["errmsg"]]}
+
+                self._error(offset + request_positions[write_error["index"]], message)
+
+        self.inserted += result["nInserted"] + result["nUpserted"]
+        self.updated += result["nMatched"]
+
+    def _add_written_authors(self, quotes):
+        self._add_authors(quote["author_name"] for quote in quotes)
+
+        # Upserts can move existing quotes away from their previous authors
+        if self.upsert and self.authors is not None:
+            quote_texts = [quote["quote_text"] for quote in quotes]
+            previous_quotes = self.collection.find(
+                {"quote_text": {"$in": quote_texts}}, {"author_name": 1, "_id": 0}
+            )
+            self._add_authors(quote["author_name"] for quote in previous_quotes)
+
+    def _add_authors(self, author_names):
+        if self.authors is None:
+            return
+
+        self.authors.update(author_names)
+
+        if len(self.authors) > self.max_author_recounts:
+            self.authors = None
+
+    def _request(self, quote):
+        document = {self.db_fields[name]: value for name, value in quote.items()}
+
+        # Fill in the model defaults, like the tags and the random key
+        for db_field, default in self.defaults.items():
+            if document.get(db_field) in (None, []):
+                document[db_field] = default() if callable(default) else copy(default)
+
+        if not self.upsert:
+            return InsertOne(document)
+
+        random_key = document.pop("random_key")
+        return UpdateOne(
+            {"quote_text": document["quote_text"]},
+            {"$set": document, "$setOnInsert": {"random_key": random_key}},
+            upsert=True,
+        )
+
+    def _error(self, index, messages):
+        self.failed += 1
+
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"index": index, "messages": messages})
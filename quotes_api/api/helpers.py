@@ -0,0 +1,43 @@
+"""Various helpers for the quotes api. Mainly for materialized views."""
+
+from quotes_api.api.models import Quote, Author
+
+
+def materialize_authors():
+    """
+    Rebuilds the authors collection from the quotes with a group aggregation.
+
+    The "$out" stage replaces the collection in one step, keeping its indexes.
+    """
+
+    # Make sure the collection and its indexes exist before replacing it
+    Author.ensure_indexes()
+
+    pipeline = [
+        {"$group": {"_id": "$author_name", "quote_count": {"$sum": 1}}},
+        {"$project": {"_id": 0, "author_name": "$_id", "quote_count": 1}},
+        {"$out": Author._get_collection_name()},
+    ]
+
+    Quote._get_collection().aggregate(pipeline)
+
+
+def update_author_counts(*author_names):
+    """
+    Recounts the quotes of the given authors after a quote write.
+
+    Authors without quotes are removed from the authors collection.
+    """
+
+    for author_name in set(author_names):
+        if author_name is None:
+            continue
+
+        quote_count = Quote.objects(author_name=author_name).count()
+
+        if quote_count > 0:
+            Author.objects(author_name=author_name).update_one(
+                set__quote_count=quote_count, upsert=True
+            )
+        else:
+            Author.objects(author_name=author_name).delete()
@@ -1,5 +1,6 @@
 "Quote api models initialization file."
 
 from quotes_api.api.models.quote import QuoteFields, Quote
+from quotes_api.api.models.author import AuthorFields, Author
 
-__all__ = ["QuoteFields", "Quote"]
+__all__ = ["QuoteFields", "Quote", "AuthorFields", "Author"]
@@ -0,0 +1,31 @@
+"""Author model file."""
+
+from mongoengine import Document, StringField, IntField
+
+from quotes_api.extensions import odm
+
+
+class AuthorFields(Document):
+    """Author Document base class.
+
+    Authors are a materialized view of the quote authors, with the number of quotes
+    each one has. They're kept up to date on quote writes.
+    """
+
+    author_name = StringField(required=True, null=False, unique=True)
+    quote_count = IntField(required=True, null=False, default=0)
+
+    def __str__(self):
+        return f"Author: {self.author_name}\n" f"Quotes: {self.quote_count}\n"
+
+    def __repr__(self):
+        return f"<Author {self.author_name}>"
+
+    meta = {"abstract": True}
+
+
+class Author(odm.Document, AuthorFields):
+    """Author Document for mongodb database instance."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
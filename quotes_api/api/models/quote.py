@@ -1,6 +1,9 @@
 """Quote model file."""
 
-from mongoengine import Document, StringField, ListField
+from datetime import datetime
+from random import random
+
+from mongoengine import Document, StringField, ListField, FloatField, DateTimeField
 
 from quotes_api.extensions import odm
 
@@ -18,6 +21,12 @@ class QuoteFields(Document):
         default=["other"],
     )
 
+    # Uniform random number used to pick random quotes with an index seek
+    random_key = FloatField(required=True, null=False, default=random)
+
+    # Time of the last write, so indexes built before can catch up with edited quotes
+    updated_at = DateTimeField(required=False, null=True, default=datetime.utcnow)
+
     def __str__(self):
         return (
             f"Quote: {self.quote_text}\n"
@@ -35,7 +44,17 @@ class QuoteFields(Document):
                 "fields": ["$quote_text"],
                 "default_language": "english",
                 "weights": {"quote_text": 1},
-            }
+            },
+            # Unfiltered random quote seeks
+            "random_key",
+            # Tag and author filters, sorted by the random key for random quotes
+            # and by the id for keyset pagination. Tag indexes are multikey.
+            {"fields": ["tags", "random_key"]},
+            {"fields": ["author_name", "random_key"]},
+            {"fields": ["tags", "id"]},
+            {"fields": ["author_name", "id"]},
+            # Search index catch up
+            "updated_at",
         ],
         "abstract": True,
     }
@@ -0,0 +1,157 @@
+"""Quote repository file. Read-only access to quotes as raw mongodb documents."""
+
+import json
+from random import random
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from quotes_api.api.models import Quote
+from quotes_api.api.schemas import QuoteSchema
+from quotes_api.common import get_schema, register_serializer, dump_records
+from quotes_api.extensions import caches, generations
+
+
+class QuoteRepository:
+    """
+    Read-only quote queries that don't build mongoengine documents.
+
+    Quotes are fetched as raw mongodb documents with a projection of the fields the
+    quote schema dumps, and dumped with the compiled serializer of the schema. Writes
+    still go through the quote documents, so their validation is kept.
+    """
+
+    def __init__(self, document=Quote, schema=QuoteSchema):
+        self.document = document
+        self.schema = schema
+        self.fields = list(get_schema(schema).dump_fields)
+        self.projection = {document._fields[field].db_field: 1 for field in self.fields}
+
+        register_serializer(schema, document)
+
+    def get(self, quote_id):
+        """Get a quote by id, or None if it doesn't exist."""
+
+        try:
+            object_id = ObjectId(quote_id)
+        except (InvalidId, TypeError):
+            return None
+
+        return self.document._get_collection().find_one(
+            {"_id": object_id}, self.projection
+        )
+
+    def get_many(self, quote_ids):
+        """Get quotes by id with a single query, as a dict keyed by the ids found."""
+
+        object_ids = []
+
+        for quote_id in quote_ids:
+            try:
+                object_ids.append(ObjectId(quote_id))
+            except (InvalidId, TypeError):
+                continue
+
+        if not object_ids:
+            return {}
+
+        quotes = self.document._get_collection().find(
+            {"_id": {"$in": object_ids}}, self.projection
+        )
+
+        return {str(quote["_id"]): quote for quote in quotes}
+
+    def find(self, **filters):
+        """Get a queryset of the quotes matching some mongoengine filters."""
+
+        return self.document.objects.filter(**filters).only(*self.fields).as_pymongo()
+
+    def sample(self, filters, size):
+        """
+        Draws distinct random quotes matching some mongodb filters.
+
+        Each draw seeks on the indexed random key from a random number, wrapping around
+        to the smallest key, so no collection scan is needed. Filters matching fewer
+        quotes than requested fall back to "$sample".
+
+        Seeks aren't exactly uniform, a quote is drawn as often as the gap between its
+        key and the next smaller one is wide. Run "flask database random-keys --redraw"
+        to even the gaps out now and then. Quotes without a random key can't be seeked
+        at all, so every draw uses "$sample" while any of them is left.
+        """
+
+        # Baypassing mongoengine to use pymongo (driver)
+        quote_collection = self.document._get_collection()
+
+        random_quotes = {}
+
+        # Allow some repeated draws before falling back to sampling
+        draws = 0 if self.has_unkeyed_quotes() else size * 3
+
+        for _ in range(draws):
+            if len(random_quotes) == size:
+                break
+
+            key = random()
+            random_quote = quote_collection.find_one(
+                {**filters, "random_key": {"$gte": key}},
+                self.projection,
+                sort=[("random_key", 1)],
+            ) or quote_collection.find_one(
+                {**filters, "random_key": {"$lt": key}},
+                self.projection,
+                sort=[("random_key", -1)],
+            )
+
+            if random_quote is None:
+                break
+
+            random_quotes[random_quote["_id"]] = random_quote
+
+        if len(random_quotes) < size:
+            # Match first, so the filters can use their indexes
+            pipeline = [
+                {"$match": {**filters, "_id": {"$nin": list(random_quotes)}}},
+                {"$sample": {"size": size - len(random_quotes)}},
+                {"$project": self.projection},
+            ]
+
+            for random_quote in quote_collection.aggregate(pipeline):
+                random_quotes[random_quote["_id"]] = random_quote
+
+        return list(random_quotes.values())
+
+    def has_unkeyed_quotes(self):
+        """
+        True if some quote has no random key yet.
+
+        The answer is kept in the quote count cache, keyed by the quotes generation.
+        """
+
+        cache_key = json.dumps(["unkeyed", generations.get("quotes")])
+        count_cache = caches.get_cache("quote_count")
+        unkeyed = count_cache.get(cache_key)
+
+        if unkeyed is None:
+            unkeyed = (
+                self.document._get_collection().find_one(
+                    {"random_key": {"$exists": False}}, {"_id": 1}
+                )
+                is not None
+            )
+            count_cache.set(cache_key, unkeyed)
+
+        return unkeyed
+
+    def dump(self, quotes):
+        """Dump a list of raw quotes with the quote schema."""
+
+        return dump_records(self.schema, list(quotes))
+
+    def dump_one(self, quote):
+        """Dump a single raw quote with the quote schema."""
+
+        return self.dump([quote])[0]
+
+
+quote_repository = QuoteRepository()
@@ -4,6 +4,9 @@ from quotes_api.api.resources.quote import (
     QuoteResource,
     QuoteList,
     QuoteRandom,
+    QuoteBatch,
+    QuoteBulk,
+    QuoteExport,
 )
 from quotes_api.api.resources.author import AuthorList
 from quotes_api.api.resources.tag import TagList
@@ -12,6 +15,9 @@ __all__ = [
     "QuoteResource",
     "QuoteList",
     "QuoteRandom",
+    "QuoteBatch",
+    "QuoteBulk",
+    "QuoteExport",
     "AuthorList",
     "TagList",
 ]
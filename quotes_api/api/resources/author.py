@@ -3,8 +3,15 @@
 from flask import request, make_response
 from flask_restful import Resource
 
-from quotes_api.api.models import Quote
-from quotes_api.common import HttpStatus, author_paginator
+from quotes_api.api.models import Author
+from quotes_api.extensions import response_cache
+from quotes_api.api.helpers import materialize_authors
+from quotes_api.common import (
+    HttpStatus,
+    paginator,
+    OffsetPagination,
+    CursorPagination,
+)
 from quotes_api.api.schemas import AuthorSchema
 from quotes_api.auth.decorators import Role, role_required
 
@@ -18,8 +25,9 @@ class AuthorList(Resource):
       tags:
         - Author
       description: |
-        Get list of available `authors`. Optional `sort_order` parameter determines the order in which the
-        authors are displayed. Requires a valid `user` `api key` for authentication.
+        Get list of available `authors` with their number of quotes. Optional `sort_order` parameter
+        determines the order in which the authors are displayed. Requires a valid `user` `api key`
+        for authentication.
       security:
         - user_api_key: []
         - admin_api_key: []
@@ -36,6 +44,13 @@ class AuthorList(Resource):
             type: integer
             default: 5
           description: Number of results per page.
+        - in: query
+          name: cursor
+          schema:
+            type: string
+          description:
+              Opaque cursor for keyset pagination, taken from the `next` and `prev` links.
+              Send it empty to get the first page. Replaces `page` and skips the totals.
         - in: query
           name: sort_order
           schema:
@@ -59,6 +74,10 @@ class AuthorList(Resource):
                         type: array
                         items:
                           $ref: '#/components/schemas/AuthorSchema'
+        400:
+          description: Invalid cursor.
+        304:
+          description: Not modified since the version in If-None-Match.
         401:
           description: Missing authentication header.
     """
@@ -67,30 +86,51 @@ class AuthorList(Resource):
     method_decorators = []
 
     @role_required([Role.BASIC, Role.ADMIN])
+    @response_cache.cached("quotes")
     def get(self):
         """Get quote authors by alphabetical order."""
 
         args = request.args
         page = int(args.get("page", 1))
         per_page = int(args.get("per_page", 20))
+        cursor = args.get("cursor", None)
         sort_order = str(args.get("sort_order", "asc"))
 
         try:
             sort = self._sort_order_parser(sort_order)
 
-            # Generating pagination of quotes
-            pagination = (
-                Quote.objects()
-                .order_by(sort + "author_name")
-                .paginate(page=page, per_page=per_page)
-            )
-
-            response_body = author_paginator(
+            # Build the authors view the first time it's requested
+            total = Author._get_collection().estimated_document_count()
+            if total == 0:
+                materialize_authors()
+                total = Author._get_collection().estimated_document_count()
+
+            # Generating pagination of authors, seeking on the unique author name
+            if cursor is not None:
+                pagination = CursorPagination(
+                    Author.objects,
+                    cursor,
+                    per_page,
+                    sort_field="author_name",
+                    descending=sort == "-",
+                )
+            else:
+                pagination = OffsetPagination(
+                    Author.objects.order_by(sort + "author_name"),
+                    page,
+                    per_page,
+                    total,
+                )
+
+            response_body = paginator(
                 pagination, "api.authors", AuthorSchema, sort_order=sort_order
             )
 
             return make_response(response_body, HttpStatus.OK_200.value)
 
+        except ValueError:
+            return {"error": "Invalid cursor."}, HttpStatus.BAD_REQUEST_400.value
+
         except Exception:
             return (
                 {"error": "Could not retrieve authors"},
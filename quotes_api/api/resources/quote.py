@@ -1,10 +1,32 @@
 """Quote resource file."""
 
-from flask import request, make_response
+import json
+import zlib
+from datetime import datetime
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from flask import request, make_response, current_app, Response, stream_with_context
 from flask_restful import Resource
 
 from quotes_api.api.models import Quote
-from quotes_api.common import HttpStatus, paginator
+from quotes_api.extensions import caches, bus, generations, response_cache
+from quotes_api.api.helpers import update_author_counts
+from quotes_api.api.search import get_search_backend
+from quotes_api.api.repository import quote_repository
+from quotes_api.api.tag_index import get_tag_index, filter_quotes
+from quotes_api.api.bulk import QuoteBulkWriter, read_ndjson
+from quotes_api.common import (
+    HttpStatus,
+    paginator,
+    OffsetPagination,
+    CursorPagination,
+    get_schema,
+    parse_tag_expression,
+    plain_tags,
+    tag_expression_query,
+    timed,
+)
 from quotes_api.api.schemas import QuoteSchema
 from quotes_api.auth.decorators import Role, role_required
 
@@ -37,6 +59,8 @@ class QuoteResource(Resource):
                 type: object
                 properties:
                   quote: QuoteSchema
+        304:
+          description: Not modified since the version in If-None-Match.
         401:
           description: Missing authentication header.
         404:
@@ -123,18 +147,18 @@ class QuoteResource(Resource):
     method_decorators = []
 
     @role_required([Role.BASIC, Role.ADMIN])
+    @response_cache.cached("quotes")
     def get(self, quote_id):
         """Get quote by id."""
-        try:
-            quote = Quote.objects.get_or_404(id=quote_id)
+        quote = quote_repository.get(quote_id)
 
-        except Exception:
+        if quote is None:
             return (
                 {"error": "Quote does not exist."},
                 HttpStatus.NOT_FOUND_404.value,
             )
-        quote_schema = QuoteSchema()
-        return make_response(quote_schema.dump(quote), HttpStatus.OK_200.value)
+
+        return make_response(quote_repository.dump_one(quote), HttpStatus.OK_200.value)
 
     @role_required([Role.ADMIN])
     def put(self, quote_id):
@@ -149,13 +173,21 @@ class QuoteResource(Resource):
             )
 
         try:
-            # Create quote schema instance
-            quote_schema = QuoteSchema()
+            # Get the shared quote schema instance
+            quote_schema = get_schema(QuoteSchema)
 
             data = quote_schema.load(request.json)
-            quote.update(**data)
+            quote.update(**data, updated_at=datetime.utcnow())
             quote.save()
 
+            # The quote instance still holds the previous author name
+            update_author_counts(quote.author_name, data.get("author_name"))
+            generation = generations.bump("quotes")
+            bus.publish(
+                "quotes",
+                {"op": "saved", "id": str(quote.id), "generation": generation},
+            )
+
             return "", HttpStatus.NO_CONTENT_204.value
 
         except Exception:
@@ -178,12 +210,20 @@ class QuoteResource(Resource):
 
         try:
             # Check quote schema instance
-            quote_schema = QuoteSchema(partial=True)
+            quote_schema = get_schema(QuoteSchema, partial=True)
 
             data = quote_schema.load(request.json)
-            quote.update(**data)
+            quote.update(**data, updated_at=datetime.utcnow())
             quote.save()
 
+            # The quote instance still holds the previous author name
+            update_author_counts(quote.author_name, data.get("author_name"))
+            generation = generations.bump("quotes")
+            bus.publish(
+                "quotes",
+                {"op": "saved", "id": str(quote.id), "generation": generation},
+            )
+
             return "", HttpStatus.NO_CONTENT_204.value
 
         except Exception:
@@ -203,6 +243,14 @@ class QuoteResource(Resource):
 
         try:
             quote.delete()
+
+            update_author_counts(quote.author_name)
+            generation = generations.bump("quotes")
+            bus.publish(
+                "quotes",
+                {"op": "deleted", "id": str(quote_id), "generation": generation},
+            )
+
             return "", HttpStatus.NO_CONTENT_204.value
 
         except Exception:
@@ -239,14 +287,25 @@ class QuoteList(Resource):
             type: integer
             default: 5
           description: Number of results per page.
+        - in: query
+          name: cursor
+          schema:
+            type: string
+          description:
+              Opaque cursor for keyset pagination, taken from the `next` and `prev` links.
+              Send it empty to get the first page. Replaces `page` and skips the totals.
+              Not supported together with `query`.
         - in: query
           name: tags
           schema:
             type: string
           description:
-              Quote tags for filtering.
+              Quote tags expression for filtering.
               Separate by `,` to look for quotes that include every tag (`AND`).
               Separate by `|` to look for quotes that include at least 1 tag (`OR`).
+              Prefix with `!` to look for quotes without a tag (`NOT`).
+              `AND` binds tighter than `OR`, use parentheses to group,
+              e.g. `(love|life),!humor`.
         - in: query
           name: author
           schema:
@@ -257,6 +316,12 @@ class QuoteList(Resource):
           schema:
             type: string
           description: Query for quote search.
+        - in: query
+          name: include_total
+          schema:
+            type: boolean
+            default: true
+          description: Set to `false` to skip counting `total_pages` and `total_records`.
       responses:
         200:
           content:
@@ -273,6 +338,10 @@ class QuoteList(Resource):
                         type: array
                         items:
                           $ref: '#/components/schemas/QuoteSchema'
+        304:
+          description: Not modified since the version in If-None-Match.
+        400:
+          description: Invalid cursor or tags expression.
         401:
           description: Missing authentication header.
 
@@ -308,6 +377,7 @@ class QuoteList(Resource):
     method_decorators = []
 
     @role_required([Role.BASIC, Role.ADMIN])
+    @response_cache.cached("quotes")
     def get(self):
         """Get list of quotes."""
 
@@ -315,29 +385,74 @@ class QuoteList(Resource):
 
         page = int(args.get("page", 1))
         per_page = int(args.get("per_page", 5))
+        cursor = args.get("cursor", None)
         tags = args.get("tags", None)
         author = args.get("author", None)
         query = args.get("query", None)
+        include_total = args.get("include_total", "true").lower() != "false"
+
+        if cursor is not None and query is not None:
+            return (
+                {"error": "Cursor pagination does not support search queries."},
+                HttpStatus.BAD_REQUEST_400.value,
+            )
+
+        try:
+            expression = parse_tag_expression(tags) if tags is not None else None
+
+        except ValueError:
+            return (
+                {"error": "Invalid tags expression."},
+                HttpStatus.BAD_REQUEST_400.value,
+            )
 
         try:
             # Build the filters for the database query
-            filters = self._build_quote_list_filters(tags, author)
-
-            # Do a search query if the user provided a query
-            if query is not None:
-                pagination = (
-                    Quote.objects.filter(**filters)
-                    .search_text(query)
-                    .order_by("$text_score")
-                    .paginate(page=page, per_page=per_page)
-                )
+            filters = self._build_quote_list_filters(expression, author)
+
+            # Read raw documents with only the fields of the schema
+            queryset = quote_repository.find(**filters)
+
+            # Seek from the cursor if the user asked for keyset pagination
+            if cursor is not None:
+                pagination = CursorPagination(queryset, cursor, per_page)
+
+            # Filter pages with the tag index bitmaps, which also count the total
+            elif query is None and filters:
+                queryset = filter_quotes(quote_repository.find(), expression, author)
+                with timed("count"):
+                    total = queryset.count() if include_total else None
+
+                pagination = OffsetPagination(queryset, page, per_page, total)
+
             else:
-                pagination = Quote.objects.filter(**filters).paginate(
-                    page=page, per_page=per_page
-                )
-            response_body = paginator(pagination, "api.quotes", QuoteSchema)
+
+                # Do a search query if the user provided a query
+                if query is not None:
+                    queryset = get_search_backend().search(queryset, query)
+
+                with timed("count"):
+                    total = (
+                        self._count_quotes(queryset, filters, query)
+                        if include_total
+                        else None
+                    )
+
+                pagination = OffsetPagination(queryset, page, per_page, total)
+
+            response_body = paginator(
+                pagination,
+                "api.quotes",
+                QuoteSchema,
+                tags=tags,
+                author=author,
+                query=query,
+            )
             return make_response(response_body, HttpStatus.OK_200.value)
 
+        except ValueError:
+            return {"error": "Invalid cursor."}, HttpStatus.BAD_REQUEST_400.value
+
         except Exception:
             return (
                 {"error": "Could not retrieve quotes."},
@@ -348,8 +463,8 @@ class QuoteList(Resource):
     def post(self):
         """Create new quote."""
         try:
-            # Create quote schema instace
-            quote_schema = QuoteSchema()
+            # Get the shared quote schema instance
+            quote_schema = get_schema(QuoteSchema)
             data = quote_schema.load(request.json)
 
         except Exception:
@@ -360,8 +475,15 @@ class QuoteList(Resource):
             quote = Quote(**data)
             quote.save()
 
-            # Create new quote schema instance that only dumps the id
-            quote_schema = QuoteSchema(only=["id"])
+            update_author_counts(quote.author_name)
+            generation = generations.bump("quotes")
+            bus.publish(
+                "quotes",
+                {"op": "saved", "id": str(quote.id), "generation": generation},
+            )
+
+            # Get a quote schema instance that only dumps the id
+            quote_schema = get_schema(QuoteSchema, only=["id"])
             return make_response(quote_schema.dump(quote), HttpStatus.CREATED_201.value)
 
         except Exception:
@@ -371,27 +493,64 @@ class QuoteList(Resource):
                 HttpStatus.INTERNAL_SERVER_ERROR_500.value,
             )
 
-    def _build_quote_list_filters(self, tags, author):
-        """Filter generation for quote list match."""
+    def _count_quotes(self, queryset, filters, query):
+        """
+        Counts the quotes matched by a query, going through the count cache.
+
+        The cache is keyed by the normalized filters and the quotes generation, so
+        quote writes make the previous counts unreachable. Unfiltered lists use the
+        collection metadata instead of counting documents.
+        """
+
+        if not filters and query is None:
+            return Quote._get_collection().estimated_document_count()
+
+        # Tag order doesn't change the result, so it's left out of the key
+        normalized_filters = {
+            field: sorted(value) if isinstance(value, list) else value
+            for field, value in filters.items()
+        }
+        cache_key = json.dumps(
+            [generations.get("quotes"), normalized_filters, query], sort_keys=True
+        )
+
+        count_cache = caches.get_cache("quote_count")
+        total = count_cache.get(cache_key)
+
+        if total is None:
+            total = queryset.count()
+            count_cache.set(cache_key, total)
+
+        return total
+
+    def _build_quote_list_filters(self, expression, author):
+        """Filter generation for quote list match, from a parsed tags expression."""
 
         filters = {}
 
         # Check if the user provided any tags for filtering
-        if tags is not None:
+        if expression is not None:
+            any_tags = plain_tags(expression, "or")
+            all_tags = plain_tags(expression, "and")
+
+            # User normal filtering when just 1 tag is provided
+            if expression[0] == "tag":
+                filters["tags"] = expression[1]
 
             # Looks for quotes that have at least one tag in their tags
             # It acts as an OR operator.
-            if "|" in tags:
-                filters["tags__in"] = tags.split("|")
+            elif any_tags is not None:
+                filters["tags__in"] = any_tags
 
             # Looks for quotes that have every tag in their tags.
             # It acts as an AND operator.
-            elif "," in tags:
-                filters["tags__all"] = tags.split(",")
+            # The least used tag goes first, so mongodb seeks on the rarest tag.
+            elif all_tags is not None:
+                filters["tags__all"] = sorted(all_tags, key=get_tag_index().count)
 
-            # User normal filtering when just 1 tag is provided
+            # Negations and nested expressions are translated to a raw query
             else:
-                filters["tags"] = tags
+                filters["__raw__"] = tag_expression_query(expression)
 
         # Check if the user provided an author name
         if author is not None:
@@ -410,6 +569,7 @@ class QuoteRandom(Resource):
         - Quote
       description: |
         Get a random `quote` resource. Optional `tags` and `author` parameters filter the result.
+        Optional `count` parameter returns a list of distinct random quotes instead.
         Requires a valid `user` `api key` for authentication.
       security:
         - user_api_key: []
@@ -425,6 +585,12 @@ class QuoteRandom(Resource):
           schema:
             type: string
           description: Author name for filtering.
+        - in: query
+          name: count
+          schema:
+            type: integer
+            minimum: 1
+          description: Number of distinct random quotes to return in a `records` list.
       responses:
         200:
           content:
@@ -433,6 +599,8 @@ class QuoteRandom(Resource):
                 type: object
                 properties:
                   quote: QuoteSchema
+        400:
+          description: Invalid count.
         401:
           description: Missing authentication header.
     """
@@ -447,39 +615,29 @@ class QuoteRandom(Resource):
 
         tags = args.get("tags", None)
         author = args.get("author", None)
+        count = args.get("count", None)
+
+        try:
+            size = int(count) if count is not None else 1
+
+            if not 1 <= size <= current_app.config["RANDOM_QUOTES_MAX_COUNT"]:
+                raise ValueError("Count out of range")
+
+        except ValueError:
+            return {"error": "Invalid count."}, HttpStatus.BAD_REQUEST_400.value
 
         try:
             # Build the filters for the database query
             filters = self._build_random_quote_filters(tags, author)
 
-            # Baypassing mongoengine to use pymongo (driver)
-            quote_collection = Quote._get_collection()
-
-            # Defining the pipeline for the aggregate
-            pipeline = [
-                {
-                    "$project": {
-                        "_id": 1,
-                        "quote_text": 1,
-                        "author_name": 1,
-                        "author_image": 1,
-                        "tags": 1,
-                    }
-                },
-                {"$match": {"$and": [filters]}},
-                {"$sample": {"size": 1}},
-            ]
-
-            # Converting CommandCursor class iterator into a list and
-            # then getting the only item in it
-            random_quote = list(quote_collection.aggregate(pipeline))[0]
-            random_quote["id"] = random_quote.pop("_id")
-
-            # Create quote schema instance
-            quote_schema = QuoteSchema()
+            random_quotes = quote_repository.sample(filters, size)
+
+            if count is not None:
+                response_body = {"records": quote_repository.dump(random_quotes)}
+                return make_response(response_body, HttpStatus.OK_200.value)
 
             return make_response(
-                quote_schema.dump(random_quote), HttpStatus.OK_200.value
+                quote_repository.dump_one(random_quotes[0]), HttpStatus.OK_200.value
             )
 
         except Exception:
@@ -514,3 +672,331 @@ class QuoteRandom(Resource):
             filters["author_name"] = author
 
         return filters
+
+
+class QuoteBatch(Resource):
+    """
+    Batch of quote objects.
+
+    ---
+    post:
+      tags:
+        - Quote
+      description: |
+        Get several `quote` resources by id with a single request. Quotes are returned in
+        the order of the requested ids, and the ids that don't exist are listed in `missing`.
+        Requires a valid `user` `api key` for authentication.
+      security:
+        - user_api_key: []
+        - admin_api_key: []
+      requestBody:
+        content:
+          application/json:
+            schema:
+              type: object
+              properties:
+                ids:
+                  type: array
+                  items:
+                    type: string
+                  maxItems: 100
+      responses:
+        200:
+          content:
+            application/json:
+              schema:
+                type: object
+                properties:
+                  records:
+                    type: array
+                    items:
+                      $ref: '#/components/schemas/QuoteSchema'
+                  missing:
+                    type: array
+                    items:
+                      type: string
+        400:
+          description: Invalid ids.
+        401:
+          description: Missing authentication header.
+    """
+
+    # Decorators applied to all class methods
+    method_decorators = []
+
+    @role_required([Role.BASIC, Role.ADMIN])
+    def post(self):
+        """Get quotes by a list of ids."""
+
+        try:
+            quote_ids = (request.get_json(silent=True) or {})["ids"]
+
+            if not isinstance(quote_ids, list) or not all(
+                isinstance(quote_id, str) for quote_id in quote_ids
+            ):
+                raise ValueError("Ids must be a list of strings")
+
+            if not 1 <= len(quote_ids) <= current_app.config["QUOTE_BATCH_MAX_IDS"]:
+                raise ValueError("Ids out of range")
+
+        except (KeyError, TypeError, ValueError):
+            return {"error": "Invalid ids."}, HttpStatus.BAD_REQUEST_400.value
+
+        try:
+            # Repeated ids are returned once, in the position of the first one
+            # Hex ids are case insensitive, so they're compared in their normal form
+            quote_ids = list(dict.fromkeys(map(self._normalize_quote_id, quote_ids)))
+            quotes = quote_repository.get_many(quote_ids)
+
+            response_body = {
+                "records": quote_repository.dump(
+                    quotes[quote_id] for quote_id in quote_ids if quote_id in quotes
+                ),
+                "missing": [
+                    quote_id for quote_id in quote_ids if quote_id not in quotes
+                ],
+            }
+            return make_response(response_body, HttpStatus.OK_200.value)
+
+        except Exception:
+            return (
+                {"error": "Could not retrieve quotes."},
+                HttpStatus.INTERNAL_SERVER_ERROR_500.value,
+            )
+
+    def _normalize_quote_id(self, quote_id):
+        """Normal form of a quote id, invalid ids are kept as they are."""
+
+        try:
+            return str(ObjectId(quote_id))
+        except InvalidId:
+            return quote_id
+
+
+class QuoteBulk(Resource):
+    """
+    Bulk quote object writes.
+
+    ---
+    post:
+      tags:
+        - Quote
+      description: |
+        Create many `quote` resources with a single request, from a JSON array or from an
+        NDJSON stream sent as `application/x-ndjson`. Quotes are validated and written in
+        chunks, and the quotes that fail don't stop the others. Requires a valid `admin`
+        `api key` for authentication.
+      security:
+        - admin_api_key: []
+      parameters:
+        - in: query
+          name: upsert
+          schema:
+            type: boolean
+            default: false
+          description:
+              Set to `true` to replace the quotes with the same `quote_text`, instead of
+              reporting them as errors.
+      requestBody:
+        content:
+          application/json:
+            schema:
+              type: array
+              items: QuoteSchema
+          application/x-ndjson:
+            schema:
+              QuoteSchema
+      responses:
+        200:
+          content:
+            application/json:
+              schema:
+                type: object
+                properties:
+                  processed:
+                    type: integer
+                  inserted:
+                    type: integer
+                  updated:
+                    type: integer
+                  failed:
+                    type: integer
+                  errors:
+                    type: array
+                    items:
+                      type: object
+                      properties:
+                        index:
+                          type: integer
+                        messages:
+                          type: object
+        400:
+          description: Missing data.
+        401:
+          description: Missing authentication header.
+    """
+
+    # Decorators applied to all class methods
+    method_decorators = []
+
+    @role_required([Role.ADMIN])
+    def post(self):
+        """Create many quotes."""
+
+        upsert = request.args.get("upsert", "false").lower() == "true"
+
+        # NDJSON is parsed line by line, without reading the whole body
+        if request.mimetype == "application/x-ndjson":
+            quotes = read_ndjson(request.stream)
+        else:
+            quotes = request.get_json(silent=True)
+
+            if not isinstance(quotes, list):
+                return {"error": "Missing data."}, HttpStatus.BAD_REQUEST_400.value
+
+        writer = QuoteBulkWriter(
+            upsert=upsert,
+            chunk_size=current_app.config["QUOTE_BULK_CHUNK_SIZE"],
+            max_errors=current_app.config["QUOTE_BULK_MAX_ERRORS"],
+        )
+
+        try:
+            writer.write(quotes)
+            return make_response(writer.report(), HttpStatus.OK_200.value)
+
+        except Exception:
+            return (
+                {"error": "Could not create quote entries."},
+                HttpStatus.INTERNAL_SERVER_ERROR_500.value,
+            )
+
+        finally:
+            # Earlier chunks may be written when a later one fails
+            writer.finish()
+
+
+class QuoteExport(Resource):
+    """
+    Export of quote objects.
+
+    ---
+    get:
+      tags:
+        - Quote
+      description: |
+        Stream every `quote` resource as NDJSON, one quote per line in id order. Optional
+        `tags` and `author` parameters filter the quotes like in the quote list. The stream
+        is gzip compressed when the client accepts it. Requires a valid `user` `api key` for
+        authentication.
+      security:
+        - user_api_key: []
+        - admin_api_key: []
+      parameters:
+        - in: query
+          name: tags
+          schema:
+            type: string
+          description: Quote tags expression for filtering, like in the quote list.
+        - in: query
+          name: author
+          schema:
+            type: string
+          description: Author name for filtering.
+      responses:
+        200:
+          content:
+            application/x-ndjson:
+              schema:
+                QuoteSchema
+        400:
+          description: Invalid tags expression.
+        401:
+          description: Missing authentication header.
+    """
+
+    # Decorators applied to all class methods
+    method_decorators = []
+
+    @role_required([Role.BASIC, Role.ADMIN])
+    def get(self):
+        """Stream the quotes as NDJSON."""
+
+        args = request.args
+        tags = args.get("tags", None)
+        author = args.get("author", None)
+
+        try:
+            expression = parse_tag_expression(tags) if tags is not None else None
+
+        except ValueError:
+            return (
+                {"error": "Invalid tags expression."},
+                HttpStatus.BAD_REQUEST_400.value,
+            )
+
+        try:
+            filters = QuoteList()._build_quote_list_filters(expression, author)
+            batch_size = current_app.config["QUOTE_EXPORT_BATCH_SIZE"]
+
+            # Server side cursor, read in batches and in a stable order, without
+            # keeping the quotes already read in the queryset cache
+            queryset = (
+                quote_repository.find(**filters)
+                .order_by("+id")
+                .batch_size(batch_size)
+                .no_cache()
+            )
+
+            gzip = "gzip" in request.accept_encodings
+            chunks = self._export_chunks(queryset, batch_size)
+
+            response = Response(
+                stream_with_context(self._gzip(chunks) if gzip else chunks),
+                status=HttpStatus.OK_200.value,
+                mimetype="application/x-ndjson",
+            )
+            response.vary.add("Accept-Encoding")
+
+            if gzip:
+                response.content_encoding = "gzip"
+
+            return response
+
+        except Exception:
+            return (
+                {"error": "Could not export quotes."},
+                HttpStatus.INTERNAL_SERVER_ERROR_500.value,
+            )
+
+    def _export_chunks(self, queryset, batch_size):
+        """Serialize the quotes a batch at a time, so memory stays flat."""
+
+        batch = []
+
+        for quote in queryset:
+            batch.append(quote)
+
+            if len(batch) == batch_size:
+                yield self._serialize(batch)
+                batch = []
+
+        if batch:
+            yield self._serialize(batch)
+
+    def _serialize(self, quotes):
+        """Serialize raw quotes as NDJSON lines."""
+
+        lines = (json.dumps(quote) + "\n" for quote in quote_repository.dump(quotes))
+        return "".join(lines).encode("utf-8")
+
+    def _gzip(self, chunks):
+        """Compress a stream of chunks into a single gzip member."""
+
+        compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+
+        for chunk in chunks:
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+
+        yield compressor.flush()
@@ -1,9 +1,13 @@
-"""Author resource file."""
+"""Tag resource file."""
 
-from flask import jsonify, make_response
+from flask import request, make_response
 from flask_restful import Resource
+from flask_mongoengine.pagination import Pagination
 
-from quotes_api.common import HttpStatus
+from quotes_api.extensions import response_cache
+from quotes_api.api.tag_index import get_tag_index
+from quotes_api.common import HttpStatus, paginator
+from quotes_api.api.schemas import TagSchema
 from quotes_api.auth.decorators import Role, role_required
 
 
@@ -16,21 +20,59 @@ class TagList(Resource):
       tags:
         - Tag
       description: |
-        Get list of supported `tags`. Requires a valid `user` `api key` for authentication.
+        Get list of the `tags` used by the quotes with their number of quotes. Optional
+        `sort_by` and `sort_order` parameters determine the order in which the tags are
+        displayed. Requires a valid `user` `api key` for authentication.
       security:
         - user_api_key: []
         - admin_api_key: []
+      parameters:
+        - in: query
+          name: page
+          schema:
+            type: integer
+            default: 1
+          description: Page number of the pagination.
+        - in: query
+          name: per_page
+          schema:
+            type: integer
+            default: 20
+          description: Number of results per page.
+        - in: query
+          name: sort_by
+          schema:
+            type: string
+            enum: [tag, count]
+            default: tag
+          description: Sort the tags by name or by number of quotes.
+        - in: query
+          name: sort_order
+          schema:
+            type: string
+            enum: [asc, desc]
+            default: asc
+          description: Tag sort order.
       responses:
         200:
           content:
             application/json:
               schema:
-                type: object
-                properties:
-                  tags:
-                    type: array
-                    items:
-                      type: string
+                allOf:
+                  - type: object
+                    properties:
+                      meta:
+                        $ref: '#/components/schemas/MetadataSchema'
+                  - type: object
+                    properties:
+                      records:
+                        type: array
+                        items:
+                          $ref: '#/components/schemas/TagSchema'
+        304:
+          description: Not modified since the version in If-None-Match.
+        400:
+          description: Invalid sort field.
         401:
           description: Missing authentication header.
     """
@@ -39,44 +81,53 @@ class TagList(Resource):
     method_decorators = []
 
     @role_required([Role.BASIC, Role.ADMIN])
+    @response_cache.cached("quotes")
     def get(self):
         """Get list of all tags."""
 
+        args = request.args
+        page = int(args.get("page", 1))
+        per_page = int(args.get("per_page", 20))
+        sort_by = str(args.get("sort_by", "tag"))
+        sort_order = str(args.get("sort_order", "asc"))
+
+        if sort_by not in ("tag", "count"):
+            return {"error": "Invalid sort field."}, HttpStatus.BAD_REQUEST_400.value
+
         try:
-            response_body = {
-                "tags": [
-                    "love",
-                    "life",
-                    "inspiration",
-                    "humor",
-                    "philosophy",
-                    "god",
-                    "truth",
-                    "widsom",
-                    "romance",
-                    "poetry",
-                    "death",
-                    "happiness",
-                    "hope",
-                    "faith",
-                    "religion",
-                    "life-lessons",
-                    "success",
-                    "motivational",
-                    "time",
-                    "knowledge",
-                    "love",
-                    "spirituality",
-                    "science",
-                    "books",
-                    "other",
-                ]
-            }
-
-            return make_response(jsonify(response_body), HttpStatus.OK_200.value)
+            # The tag index keeps the sorted tags, so a page is just a slice
+            tag_counts = get_tag_index().tags(
+                by=sort_by, descending=self._sort_order_parser(sort_order) == "-"
+            )
+            pagination = Pagination(tag_counts, page, per_page)
+
+            response_body = paginator(
+                pagination,
+                "api.tags",
+                TagSchema,
+                sort_by=sort_by,
+                sort_order=sort_order,
+            )
+
+            return make_response(response_body, HttpStatus.OK_200.value)
 
         except Exception:
             return (
                 {"error": "Could not retrieve list of tags"},
                 HttpStatus.INTERNAL_SERVER_ERROR_500.value,
             )
+
+    def _sort_order_parser(self, order):
+        """
+        Parses a user query input for the sort_order parameter.
+
+        Checks if the sorting is ascending or descending.
+        """
+
+        if order in ("ascending", "asc", "1"):
+            return "+"
+
+        if order in ("descending", "desc", "-1"):
+            return "-"
+
+        return "+"
@@ -7,3 +7,4 @@ class AuthorSchema(ma.Schema):
     """Marshmallow author schema."""
 
     author_name = ma.String()
+    quote_count = ma.Integer()
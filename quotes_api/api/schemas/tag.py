@@ -7,3 +7,4 @@ class TagSchema(ma.Schema):
     """Marshmallow tag schema."""
 
     tag = ma.String()
+    count = ma.Integer()
@@ -0,0 +1,215 @@
+"""Quote search backends file."""
+
+import os
+import logging
+from datetime import datetime, timedelta
+from threading import RLock
+
+from bson import ObjectId
+from flask import current_app
+
+from quotes_api.api.models import Quote
+from quotes_api.common.search import InvertedIndex
+from quotes_api.extensions import generations
+
+logger = logging.getLogger(__name__)
+
+# Margin for the clocks of the writers, quotes written close to a build are indexed again
+CLOCK_SKEW = timedelta(minutes=1)
+
+
+class MongoTextBackend:
+    """Search backend that uses the mongodb text index of the quotes."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def search(self, queryset, query):
+        """Get the quotes of a queryset matching a query, ranked by text score."""
+
+        return queryset.search_text(query).order_by("$text_score")
+
+    def update(self, message):
+        """Quote writes are indexed by mongodb itself."""
+
+
+class RankedQuerySet:
+    """
+    Quotes ranked by the inverted index.
+
+    Implements the part of the queryset interface used by the paginators, and only
+    fetches the quotes of the requested page from the database.
+    """
+
+    def __init__(self, queryset, quote_ids, skip=0, limit=None):
+        self.queryset = queryset
+        self.quote_ids = quote_ids
+        self._skip = skip
+        self._limit = limit
+
+    def count(self):
+        return len(self.quote_ids)
+
+    def skip(self, skip):
+        return RankedQuerySet(self.queryset, self.quote_ids, skip, self._limit)
+
+    def limit(self, limit):
+        return RankedQuerySet(self.queryset, self.quote_ids, self._skip, limit)
+
+    def __iter__(self):
+        end = None if self._limit is None else self._skip + self._limit
+        page_ids = self.quote_ids[self._skip : end]
+
+        # Raw mongodb documents are keyed by database field names
+        quotes = {
+            str(quote["_id"] if isinstance(quote, dict) else quote.id): quote
+            for quote in self.queryset.filter(id__in=page_ids)
+        }
+
+        return (quotes[quote_id] for quote_id in page_ids if quote_id in quotes)
+
+
+class InvertedIndexBackend:
+    """
+    Search backend that ranks quotes with an in-process inverted index.
+
+    The index covers the quote text and the author name, and is built on first use,
+    from the "SEARCH_INDEX_SNAPSHOT" file when there is one. Quote writes published on
+    the invalidation bus keep it up to date in every worker. Any other change of the
+    "quotes" generation catches the index up on the next search, with the quotes
+    created, deleted or updated since it was last caught up.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.snapshot_path = app.config["SEARCH_INDEX_SNAPSHOT"]
+        self.index = None
+        self.generation = None
+        self.lock = RLock()
+
+    def get_index(self):
+        """Get the inverted index, building it if it doesn't exist or the quotes changed."""
+
+        with self.lock:
+            # Read the generation before building, writes during the build bump it
+            generation = generations.get("quotes", app=self.app)
+
+            if self.index is None:
+                self.index = self._build_index()
+            elif generation != self.generation:
+                self._catch_up(self.index)
+
+            self.generation = generation
+            return self.index
+
+    def search(self, queryset, query):
+        """Get the quotes of a queryset matching a query, ranked by BM25 score."""
+
+        with self.lock:
+            quote_ids = [quote_id for quote_id, _ in self.get_index().search(query)]
+
+        # Let the database apply the tag and author filters to the matches
+        if queryset._query:
+            matches = {
+                str(quote_id)
+                for quote_id in queryset.filter(id__in=quote_ids).distinct("id")
+            }
+            quote_ids = [quote_id for quote_id in quote_ids if quote_id in matches]
+
+        return RankedQuerySet(queryset, quote_ids)
+
+    def update(self, message):
+        """Index a quote write. Nothing to do until the index is built."""
+
+        with self.lock:
+            if self.index is None or self.generation is None:
+                return
+
+            # Bulk changes and missed writes are caught up with on the next search
+            if message["op"] == "reset" or (
+                message.get("generation") != self.generation + 1
+            ):
+                self.generation = None
+                return
+
+            quote_id = message["id"]
+            quote = Quote._get_collection().find_one(
+                {"_id": ObjectId(quote_id)}, {"quote_text": 1, "author_name": 1}
+            )
+
+            if quote is None:
+                self.index.remove(quote_id)
+            else:
+                self.index.add(quote_id, quote["quote_text"], quote["author_name"])
+
+            self.generation = message["generation"]
+
+    def _build_index(self):
+        if self.snapshot_path and os.path.exists(self.snapshot_path):
+            index = InvertedIndex.load(self.snapshot_path)
+        else:
+            index = InvertedIndex()
+
+        self._catch_up(index)
+
+        logger.info("Quote search index built with %s quotes.", len(index))
+        return index
+
+    def _catch_up(self, index):
+        """Index the quotes created, deleted and updated since the index was caught up."""
+
+        quote_collection = Quote._get_collection()
+        projection = {"quote_text": 1, "author_name": 1}
+
+        # Read the time before the quotes, writes during the catch up are read again
+        caught_up_at = datetime.utcnow()
+        since = index.metadata.get("caught_up_at")
+
+        # New indexes, and snapshots without a time, read every quote
+        query = {}
+
+        if len(index) or since is not None:
+            quote_ids = {str(quote_id) for quote_id in quote_collection.distinct("_id")}
+            for quote_id in set(index) - quote_ids:
+                index.remove(quote_id)
+
+            if since is not None:
+                missing_ids = [
+                    ObjectId(quote_id)
+                    for quote_id in quote_ids
+                    if quote_id not in index
+                ]
+                updated_since = datetime.fromisoformat(since) - CLOCK_SKEW
+                query = {
+                    "$or": [
+                        {"_id": {"$in": missing_ids}},
+                        {"updated_at": {"$gte": updated_since}},
+                    ]
+                }
+
+        for quote in quote_collection.find(query, projection):
+            index.add(str(quote["_id"]), quote["quote_text"], quote["author_name"])
+
+        index.metadata["caught_up_at"] = caught_up_at.isoformat()
+
+
+BACKENDS = {"mongo": MongoTextBackend, "index": InvertedIndexBackend}
+
+
+def get_search_backend(app=None):
+    """Get the quote search backend of the application, creating it on first use."""
+
+    app = app or current_app
+
+    if "quote_search" not in app.extensions:
+        backend = app.config["SEARCH_BACKEND"]
+        backend_class = BACKENDS[backend] if isinstance(backend, str) else backend
+        app.extensions["quote_search"] = backend_class(app)
+
+    return app.extensions["quote_search"]
+
+
+def index_quote_write(message):
+    """Invalidation bus subscriber that indexes quote writes in the search backend."""
+
+    get_search_backend().update(message)
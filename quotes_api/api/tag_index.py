@@ -0,0 +1,167 @@
+"""Quote tag index file."""
+
+import logging
+from threading import RLock
+
+from bson import ObjectId
+from flask import current_app
+
+from quotes_api.api.models import Quote
+from quotes_api.common import TagIndex
+from quotes_api.extensions import generations
+
+logger = logging.getLogger(__name__)
+
+
+class QuoteTagIndex:
+    """
+    Tag index of the quotes of an application.
+
+    The index is built on first use with a single scan of the quote tags and authors,
+    and remembers the "quotes" generation it was built at. Quote writes published on
+    the invalidation bus carry their generation and are indexed one by one. Any other
+    change of the generation, like writes of workers that aren't on the bus or bulk
+    changes like seeding, rebuilds the index on its next read.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.index = None
+        self.generation = None
+        self.lock = RLock()
+
+    def get_index(self):
+        """Get the tag index, building it if it doesn't exist or the quotes changed."""
+
+        with self.lock:
+            # Read the generation before building, writes during the build bump it
+            generation = generations.get("quotes", app=self.app)
+
+            if self.index is None or generation != self.generation:
+                self.index = self._build_index()
+                self.generation = generation
+
+            return self.index
+
+    def update(self, message):
+        """Index the tags of a quote write. Nothing to do until the index is built."""
+
+        with self.lock:
+            if self.index is None:
+                return
+
+            # Drop the index when it missed a write, it's rebuilt on the next read
+            if message["op"] == "reset" or (
+                message.get("generation") != self.generation + 1
+            ):
+                self.index = None
+                return
+
+            quote_id = message["id"]
+            quote = Quote._get_collection().find_one(
+                {"_id": ObjectId(quote_id)}, {"tags": 1, "author_name": 1}
+            )
+
+            if quote is None:
+                self.index.remove(quote_id)
+            else:
+                self.index.add(
+                    quote_id, quote.get("tags") or [], quote.get("author_name")
+                )
+
+            self.generation = message["generation"]
+
+    def _build_index(self):
+        index = TagIndex()
+
+        # Quotes come in id order, so the ordinals are assigned without renumbering
+        quotes = Quote._get_collection().find({}, {"tags": 1, "author_name": 1})
+
+        for quote in quotes.sort("_id", 1):
+            index.add(
+                str(quote["_id"]), quote.get("tags") or [], quote.get("author_name")
+            )
+
+        logger.info("Quote tag index built with %s quotes.", len(index))
+        return index
+
+
+class FilteredQuerySet:
+    """
+    Quotes matching a tag expression and an author, filtered by the tag index.
+
+    Implements the part of the queryset interface used by the offset paginator. The
+    count is the size of the matching bitmap, and only the quotes of the requested
+    page are fetched from the database, in id order.
+    """
+
+    def __init__(self, queryset, quote_tags, expression, author, skip=0, limit=None):
+        self.queryset = queryset
+        self.quote_tags = quote_tags
+        self.expression = expression
+        self.author = author
+        self._skip = skip
+        self._limit = limit
+
+    def count(self):
+        with self.quote_tags.lock:
+            index = self.quote_tags.get_index()
+            return len(index.match(self.expression, self.author))
+
+    def skip(self, skip):
+        return self._copy(skip, self._limit)
+
+    def limit(self, limit):
+        return self._copy(self._skip, limit)
+
+    def __iter__(self):
+        # Evaluated under the lock, since writes can renumber the ordinals
+        with self.quote_tags.lock:
+            index = self.quote_tags.get_index()
+            bitmap = index.match(self.expression, self.author)
+            page_ids = index.doc_ids(bitmap, self._skip, self._limit)
+
+        quotes = {
+            str(quote["_id"]): quote for quote in self.queryset.filter(id__in=page_ids)
+        }
+
+        return (quotes[quote_id] for quote_id in page_ids if quote_id in quotes)
+
+    def _copy(self, skip, limit):
+        return FilteredQuerySet(
+            self.queryset, self.quote_tags, self.expression, self.author, skip, limit
+        )
+
+
+def _get_quote_tags(app):
+    if "quote_tags" not in app.extensions:
+        app.extensions["quote_tags"] = QuoteTagIndex(app)
+
+    return app.extensions["quote_tags"]
+
+
+def get_tag_index(app=None):
+    """Get the quote tag index of the application, building it on first use."""
+
+    return _get_quote_tags(app or current_app).get_index()
+
+
+def filter_quotes(queryset, expression=None, author=None, app=None):
+    """
+    Filter raw quotes by a parsed tag expression and an author with the tag index.
+
+    The queryset is only used to fetch the quotes of a page, so it shouldn't have any
+    other filters.
+    """
+
+    quote_tags = _get_quote_tags(app or current_app)
+    return FilteredQuerySet(queryset, quote_tags, expression, author)
+
+
+def index_quote_tags(message):
+    """Invalidation bus subscriber that indexes the tags of quote writes."""
+
+    quote_tags = current_app.extensions.get("quote_tags")
+
+    if quote_tags is not None:
+        quote_tags.update(message)
@@ -7,10 +7,15 @@ from quotes_api.api.resources import (
     QuoteResource,
     QuoteList,
     QuoteRandom,
+    QuoteBatch,
+    QuoteBulk,
+    QuoteExport,
     AuthorList,
     TagList,
 )
-from quotes_api.extensions import apispec
+from quotes_api.extensions import apispec, bus
+from quotes_api.api.search import index_quote_write
+from quotes_api.api.tag_index import index_quote_tags
 from quotes_api.api.schemas import (
     QuoteSchema,
     AuthorSchema,
@@ -27,9 +32,20 @@ api = Api(blueprint)
 api.add_resource(QuoteResource, "/quotes/<quote_id>", endpoint="quote")
 api.add_resource(QuoteList, "/quotes", endpoint="quotes")
 api.add_resource(QuoteRandom, "/quotes/random", endpoint="random_quote")
+api.add_resource(QuoteBatch, "/quotes/batch", endpoint="quote_batch")
+api.add_resource(QuoteBulk, "/quotes/bulk", endpoint="quote_bulk")
+api.add_resource(QuoteExport, "/quotes/export", endpoint="quote_export")
 api.add_resource(AuthorList, "/authors", endpoint="authors")
 api.add_resource(TagList, "/tags", endpoint="tags")
 
+# Invalidation bus subscribers
+@blueprint.record_once
+def subscribe_invalidations(state):
+    """Update the quote indexes of every worker on quote writes."""
+    bus.subscribe("quotes", index_quote_write, app=state.app)
+    bus.subscribe("quotes", index_quote_tags, app=state.app)
+
+
 # Apispec view configuration
 @blueprint.before_app_first_request
 def register_views():
@@ -46,6 +62,9 @@ def register_views():
     apispec.spec.path(view=QuoteResource, app=current_app)
     apispec.spec.path(view=QuoteList, app=current_app)
     apispec.spec.path(view=QuoteRandom, app=current_app)
+    apispec.spec.path(view=QuoteBatch, app=current_app)
+    apispec.spec.path(view=QuoteBulk, app=current_app)
+    apispec.spec.path(view=QuoteExport, app=current_app)
 
     # Adding Author views
     apispec.spec.path(view=AuthorList, app=current_app)
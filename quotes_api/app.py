@@ -5,7 +5,19 @@ from flask import Flask
 from cli import register_cli_commands
 from quotes_api import api, auth
 from quotes_api.config import app_config
-from quotes_api.extensions import jwt, odm, ma, cors, apispec
+from quotes_api.extensions import (
+    jwt,
+    odm,
+    ma,
+    cors,
+    apispec,
+    caches,
+    bus,
+    generations,
+    response_cache,
+    metrics,
+    query_profiler,
+)
 
 
 def create_app(configuration="production"):
@@ -49,10 +61,17 @@ def configure_apispec(app):
 
 def configure_extensions(app):
     """Configure flask extensions."""
+    # Before the database, to monitor the commands of its client
+    metrics.init_app(app)
+    query_profiler.init_app(app)
     odm.init_app(app)
     jwt.init_app(app)
     ma.init_app(app)
     cors.init_app(app)
+    caches.init_app(app)
+    bus.init_app(app)
+    generations.init_app(app)
+    response_cache.init_app(app)
 
 
 def register_blueprints(app):
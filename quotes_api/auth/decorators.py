@@ -8,7 +8,7 @@ from flask_jwt_extended import (
     get_jwt,
 )
 
-from quotes_api.common import HttpStatus
+from quotes_api.common import HttpStatus, timed
 
 
 class Role(Enum):
@@ -27,11 +27,13 @@ def role_required(role_list):
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
-            # First verify a valid access token was sent
-            verify_jwt_in_request()
+            with timed("auth"):
+                # First verify a valid access token was sent
+                verify_jwt_in_request()
+
+                # Get the user claims defined in decorator "additional_claims_loader"
+                claims = get_jwt()
 
-            # Get the user claims defined in decorator "additional_claims_loader"
-            claims = get_jwt()
             roles = claims["roles"]
 
             denied = False
@@ -1,12 +1,45 @@
 """Various helpers for auth. Maily for token blacklisting."""
 
+import time
 from datetime import datetime
+from flask import current_app
 from flask_jwt_extended import decode_token
-from quotes_api.auth.models import TokenBlacklist, User
+from werkzeug.local import LocalProxy
+from quotes_api.auth.models import RevokedUser, TokenBlacklist, User
+from quotes_api.auth.revocation import get_revocation_filter, revoked_user_key
+from quotes_api.extensions import caches, bus, generations
 
+# Sentinel used to tell cache misses apart from cached revocation states
+_MISSING = object()
 
-def add_token_to_database(encoded_token, identity_claim):
-    """Adds a new token to the database. It is not revoked when it's added."""
+
+def _stores_revoked_only():
+    """True in the "denylist" revocation mode, where only revoked tokens are stored."""
+
+    return current_app.config["TOKEN_REVOCATION_MODE"] == "denylist"
+
+
+def _token_expires(decoded_token):
+    exp = decoded_token.get("exp", None)
+
+    if exp is None:
+        return None
+
+    return datetime.utcfromtimestamp(exp)
+
+
+def add_token_to_database(encoded_token, identity_claim, user=None):
+    """Adds a new token to the database. It is not revoked when it's added.
+
+    New tokens don't change the "tokens" generation, their jtis were never cached or
+    added to the revoked token filter.
+
+    Pass the user the token was created for when it's at hand, to skip fetching it again.
+    Nothing is stored in the "denylist" revocation mode, only revoked tokens are.
+    """
+
+    if _stores_revoked_only():
+        return
 
     # Decode token to get its contents
     decoded_token = decode_token(encoded_token)
@@ -15,16 +48,12 @@ def add_token_to_database(encoded_token, identity_claim):
     jti = decoded_token.get("jti")
     token_type = decoded_token.get("type")
     user_identity = decoded_token.get(identity_claim)
-    exp = decoded_token.get("exp", None)
+    expires = _token_expires(decoded_token)
     revoked = False
 
-    if exp is not None:
-        expires = datetime.fromtimestamp(exp)
-    else:
-        expires = None
-
     # Get user document to add to the token blacklist
-    user = User.objects.get(username=user_identity)
+    if user is None:
+        user = User.objects.get(username=user_identity)
 
     db_token = TokenBlacklist(
         jti=jti, token_type=token_type, user=user, expires=expires, revoked=revoked
@@ -38,16 +67,77 @@ def is_token_revoked(decoded_token):
     Because we are adding all the tokens (access and refresh), if the token is not present
     in the database, automatically it's going to be considered as "revoked", as we don't know
     its origin (where it was created).
+
+    Revocation states are cached by jti for at most "REVOCATION_CACHE_TTL" seconds, and never
+    past the token expiration, so most requests don't need a database round trip. Tokens
+    are considered revoked when the lookup fails, and that state isn't cached.
+
+    In the "denylist" revocation mode only revoked tokens are stored, so missing tokens are
+    not revoked, and tokens missing from the revoked token filter skip the database. Tokens
+    of deleted users aren't stored either, they're revoked by the deleted user marker.
     """
 
     jti = str(decoded_token["jti"])
+    user_identity = decoded_token.get(current_app.config["JWT_IDENTITY_CLAIM"])
+    revoked_only = _stores_revoked_only()
+    user_revoked = False
+
+    if revoked_only:
+        revocation_filter = get_revocation_filter()
+        user_revoked = revocation_filter.might_contain(revoked_user_key(user_identity))
+
+        if not user_revoked and not revocation_filter.might_contain(jti):
+            return False
+
+    revocation_cache = caches.get_cache("revocation")
+
+    revoked = revocation_cache.get(jti, _MISSING)
+    if revoked is not _MISSING:
+        return revoked
 
     try:
-        token = TokenBlacklist.objects.get(jti=jti)
-        return token.revoked
+        if user_revoked and _issued_before_user_revoked(user_identity, decoded_token):
+            revoked = True
+        else:
+            token = TokenBlacklist.objects.only("revoked").get(jti=jti)
+            revoked = token.revoked
+    except TokenBlacklist.DoesNotExist:
+        revoked = not revoked_only
+
+    # Fail closed, but only for this request, the next one looks the token up again
     except Exception:
         return True
 
+    revocation_cache.set(jti, revoked, ttl=_revocation_ttl(decoded_token))
+    return revoked
+
+
+def _issued_before_user_revoked(user_identity, decoded_token):
+    """True if the token was issued before its user was deleted."""
+
+    revoked_user = (
+        RevokedUser.objects(username=user_identity).only("revoked_at").first()
+    )
+
+    if revoked_user is None:
+        return False
+
+    issued_at = decoded_token.get("iat", None)
+    return issued_at is None or (
+        datetime.utcfromtimestamp(issued_at) <= revoked_user.revoked_at
+    )
+
+
+def _revocation_ttl(decoded_token):
+    """Seconds a revocation state can be cached for, never past the token expiration."""
+
+    exp = decoded_token.get("exp", None)
+
+    if exp is None:
+        return None
+
+    return exp - time.time()
+
 
 def get_user_tokens(user_identity):
     """Gets all the revoked and unrevoked tokens from a user."""
@@ -62,10 +152,11 @@ def get_user_tokens(user_identity):
         )
 
 
-def revoke_token(token_jti, user_identity):
+def revoke_token(token_jti, user_identity, decoded_token=None):
     """Revokes the given token.
 
-    If no token is found we raise an exception.
+    If no token is found we raise an exception. In the "denylist" revocation mode the
+    token is stored as revoked instead, from its decoded contents.
     """
     try:
         # Get user by its username
@@ -74,13 +165,28 @@ def revoke_token(token_jti, user_identity):
     except:
         raise Exception(f"Could not find user with username '{user_identity}'")
 
-    try:
-        token = TokenBlacklist.objects.get(jti=token_jti, user=user)
-        token.revoked = True
-        token.save()
+    if _stores_revoked_only():
+        decoded_token = decoded_token or {}
 
-    except:
-        raise Exception(f"Could not find token with jti '{token_jti}'")
+        TokenBlacklist.objects(jti=token_jti).update_one(
+            upsert=True,
+            set__token_type=decoded_token.get("type", "access"),
+            set__user=user,
+            set__revoked=True,
+            set__expires=_token_expires(decoded_token),
+        )
+
+    else:
+        try:
+            token = TokenBlacklist.objects.get(jti=token_jti, user=user)
+            token.revoked = True
+            token.save()
+
+        except:
+            raise Exception(f"Could not find token with jti '{token_jti}'")
+
+    generation = generations.bump("tokens")
+    bus.publish("tokens", {"jti": token_jti, "revoked": True, "generation": generation})
 
 
 def unrevoke_token(token_jti, user_identity):
@@ -97,24 +203,126 @@ def unrevoke_token(token_jti, user_identity):
 
     try:
         token = TokenBlacklist.objects.get(jti=token_jti, user=user)
-        token.revoked = False
-        token.save()
+
+        # Unrevoked tokens aren't stored in the "denylist" revocation mode
+        if _stores_revoked_only():
+            token.delete()
+        else:
+            token.revoked = False
+            token.save()
 
     except:
         raise Exception(f"Could not find token with jti {token_jti}")
 
+    generation = generations.bump("tokens")
+    bus.publish(
+        "tokens", {"jti": token_jti, "revoked": False, "generation": generation}
+    )
+
+
+def delete_user(user):
+    """Deletes a user, and revokes its tokens.
+
+    The stored tokens of the user are deleted along with it, and missing tokens count as
+    revoked. Their cached revocation states are evicted from every worker, so the tokens
+    stop working right away, and not when they expire.
+
+    Tokens that aren't stored, like in the "denylist" revocation mode, are revoked by a
+    deleted user marker, which is added to the revoked token filter.
+    """
+
+    jtis = list(TokenBlacklist.objects(user=user).scalar("jti"))
+
+    user.delete()
+    RevokedUser.objects(username=user.username).update_one(
+        upsert=True, set__revoked_at=datetime.utcnow()
+    )
+
+    generation = generations.bump("users", "tokens")
+    bus.publish("users", {"username": user.username})
+    bus.publish(
+        "tokens",
+        {
+            "jti": revoked_user_key(user.username),
+            "revoked": True,
+            "generation": generation,
+        },
+    )
 
-def prune_database():
+    for jti in jtis:
+        bus.publish("tokens", {"jti": jti})
+
+
+def evict_token(message):
     """
-    Delete tokens that have expired from the database.
+    Invalidation bus subscriber that evicts a token from the revocation cache.
+
+    Revoked tokens are also added to the revoked token filter, if it's in use.
+    """
+
+    caches.get_cache("revocation").delete(message["jti"])
+
+    revocation_filter = current_app.extensions.get("revocation_filter")
+    if revocation_filter is not None:
+        revocation_filter.update(message)
+
+
+def load_user(user_identity):
+    """Gets a user by its username, going through the identity cache first.
 
-    How (and if) you call this function is entirely up to you. You could expose it to
-    an endpoint that only administrators could call, you could run it as a cron, set it up with
-    flask cli, etc.
+    The identity cache is disabled unless "USER_CACHE_TTL" is greater than zero.
     """
 
-    now = datetime.now()
-    expired = TokenBlacklist.objects.filter(expires__lte=now)
+    user_cache = caches.get_cache("user")
+    user = user_cache.get(user_identity)
+
+    if user is None:
+        user = User.objects(username=user_identity).first()
+
+        if user is not None:
+            user_cache.set(user_identity, user)
+
+    return user
+
+
+def lazy_user(user_identity):
+    """Proxy to the user with the given username.
+
+    The user is only fetched on first access, and then kept for the rest of the request,
+    so requests that never touch "current_user" don't query the database.
+    """
+
+    loaded = []
+
+    def resolve():
+        if not loaded:
+            loaded.append(load_user(user_identity))
+
+        return loaded[0]
+
+    return LocalProxy(resolve)
+
+
+def evict_user(message):
+    """Invalidation bus subscriber that evicts a user from the identity cache."""
+
+    caches.get_cache("user").delete(message["username"])
+
+
+def prune_database(now=None):
+    """
+    Delete tokens that have expired from the database, and return how many were deleted.
+
+    Expired tokens are deleted with a single "delete_many", so pruning costs one round
+    trip no matter how many tokens expired. Run it with "flask auth prune", on a schedule
+    with "TOKEN_PRUNE_INTERVAL", or let mongodb expire tokens with "TOKEN_TTL_INDEX".
+    """
+
+    # Expiration dates are stored in UTC, like mongodb TTL indexes expect
+    now = now or datetime.utcnow()
+    result = TokenBlacklist._get_collection().delete_many({"expires": {"$lte": now}})
+
+    if result.deleted_count:
+        generations.bump("tokens")
 
-    for token in expired:
-        token.delete()
+    return result.deleted_count
@@ -1,12 +1,14 @@
 """Auth models initialization file."""
 
-
 from quotes_api.auth.models.user import User, UserFields
 from quotes_api.auth.models.blacklist import TokenBlacklist, TokenBlacklistFields
+from quotes_api.auth.models.revoked_user import RevokedUser, RevokedUserFields
 
 __all__ = [
     "User",
     "UserFields",
     "TokenBlacklist",
     "TokenBlacklistFields",
+    "RevokedUser",
+    "RevokedUserFields",
 ]
@@ -1,5 +1,7 @@
 """Black list model file"""
 
+import os
+
 from mongoengine import (
     Document,
     StringField,
@@ -12,6 +14,10 @@ from mongoengine import (
 from quotes_api.extensions import odm
 from quotes_api.auth.models import UserFields
 
+# Let mongodb delete expired tokens, instead of pruning them. Drop the "expires_1" index
+# when changing it, mongodb can't turn a plain index into a TTL index in place.
+TOKEN_TTL_INDEX = os.getenv("TOKEN_TTL_INDEX", "false").lower() == "true"
+
 
 class TokenBlacklistFields(Document):
     """Token blacklist base class representation."""
@@ -34,7 +40,17 @@ class TokenBlacklistFields(Document):
     def __repr__(self):
         return f"<Token {str(self.id)}>"
 
-    meta = {"abstract": True}
+    meta = {
+        "indexes": [
+            # Expired token pruning, or expiration by mongodb itself
+            (
+                {"fields": ["expires"], "expireAfterSeconds": 0}
+                if TOKEN_TTL_INDEX
+                else "expires"
+            ),
+        ],
+        "abstract": True,
+    }
 
 
 class TokenBlacklist(odm.Document, TokenBlacklistFields):
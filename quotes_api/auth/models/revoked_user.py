@@ -0,0 +1,27 @@
+"""Revoked user model file"""
+
+from mongoengine import Document, StringField, DateTimeField
+
+from quotes_api.extensions import odm
+
+
+class RevokedUserFields(Document):
+    """Revoked user base class representation. Tokens issued before are revoked."""
+
+    username = StringField(max_length=80, null=False, unique=True)
+    revoked_at = DateTimeField(null=False)
+
+    def __str__(self):
+        return f"Username: {self.username}\n" f"Revoked At: {self.revoked_at}\n"
+
+    def __repr__(self):
+        return f"<RevokedUser {self.username}>"
+
+    meta = {"abstract": True}
+
+
+class RevokedUser(odm.Document, RevokedUserFields):
+    """Revoked user Document for mongodb database instance."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
@@ -0,0 +1,87 @@
+"""Expired token pruning scheduler file."""
+
+import os
+import logging
+from datetime import datetime
+from threading import Event, Lock, Thread
+
+from pymongo.errors import PyMongoError
+
+from quotes_api.auth.helpers import prune_database
+
+logger = logging.getLogger(__name__)
+
+
+class _PrunerState:
+    """Pruning thread and reclaimed token counts of one application."""
+
+    def __init__(self, app):
+        self.app = app
+        self.interval = app.config["TOKEN_PRUNE_INTERVAL"]
+        self.running_pid = None
+        self.lock = Lock()
+        self.stopped = Event()
+
+        self.runs = 0
+        self.reclaimed = 0
+        self.last_reclaimed = None
+        self.last_run = None
+
+    def start(self):
+        pid = os.getpid()
+
+        with self.lock:
+            if self.running_pid == pid:
+                return
+
+            self.running_pid = pid
+
+        thread = Thread(target=self._run, daemon=True)
+        thread.start()
+
+    def prune(self):
+        """Prune the expired tokens once, and report how many were reclaimed."""
+
+        with self.app.app_context():
+            reclaimed = prune_database()
+
+        self.runs += 1
+        self.reclaimed += reclaimed
+        self.last_reclaimed = reclaimed
+        self.last_run = datetime.utcnow()
+
+        logger.info(
+            "Pruned %d expired tokens, %d since the start.", reclaimed, self.reclaimed
+        )
+        return reclaimed
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.prune()
+            except PyMongoError:
+                logger.exception("Expired token pruning failed, retrying later.")
+
+
+class TokenPruner:
+    """
+    Flask extension that deletes expired tokens every "TOKEN_PRUNE_INTERVAL" seconds.
+
+    Disabled when the interval is zero, like when a TTL index expires the tokens. The
+    pruning thread starts lazily, so every forked worker runs its own, and pruning from
+    several workers at once is harmless. The reclaimed token counts are logged and kept
+    in the "token_pruner" state of the application.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("TOKEN_PRUNE_INTERVAL", 0)
+
+        state = _PrunerState(app)
+        app.extensions["token_pruner"] = state
+
+        if state.interval > 0:
+            app.before_request(state.start)
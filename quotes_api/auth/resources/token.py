@@ -17,9 +17,12 @@ from quotes_api.auth.helpers import (
     add_token_to_database,
 )
 from quotes_api.auth.decorators import Role, role_required
-from quotes_api.common import HttpStatus
+from quotes_api.common import HttpStatus, compile_serializer
 from quotes_api.auth.schemas import TokenBlacklistSchema
 
+# Token lists are read as raw documents and dumped by a compiled serializer
+dump_tokens = compile_serializer(TokenBlacklistSchema, TokenBlacklist, exclude=["user"])
+
 
 class UserTokens(Resource):
     """
@@ -80,10 +83,9 @@ class UserTokens(Resource):
 
         try:
             # Generating pagination of tokens
-            tokens = TokenBlacklist.objects(user=user)
+            tokens = TokenBlacklist.objects(user=user).exclude("user").as_pymongo()
 
-            token_blacklist_schema = TokenBlacklistSchema(many=True, exclude=["user"])
-            response_body = {"records": token_blacklist_schema.dump(tokens)}
+            response_body = {"records": dump_tokens(tokens)}
 
             return make_response(response_body, HttpStatus.OK_200.value)
 
@@ -137,7 +139,9 @@ class TokenRefresh(Resource):
 
             # Add new access token to the database
             # JWT_IDENTITY_CLAIM is an identity claim and it defaults to "identity"
-            add_token_to_database(access_token, app.config["JWT_IDENTITY_CLAIM"])
+            add_token_to_database(
+                access_token, app.config["JWT_IDENTITY_CLAIM"], user=current_user
+            )
 
             response_body = {"access_token": access_token}
             return make_response(response_body, HttpStatus.OK_200.value)
@@ -185,11 +189,11 @@ class AccessTokenRevoke(Resource):
         Used mainly for logout
         """
         try:
-            # Get the JWT ID and the user identity respectively
-            jti = get_jwt()["jti"]
+            # Get the decoded token and the user identity respectively
+            decoded_token = get_jwt()
             user_identity = get_jwt_identity()
 
-            revoke_token(jti, user_identity)
+            revoke_token(decoded_token["jti"], user_identity, decoded_token)
             return "", HttpStatus.NO_CONTENT_204.value
 
         except Exception:
@@ -236,11 +240,11 @@ class RefreshTokenRevoke(Resource):
         """
 
         try:
-            # Get the JWT ID and the user identity respectively
-            jti = get_jwt()["jti"]
+            # Get the decoded token and the user identity respectively
+            decoded_token = get_jwt()
             user_identity = get_jwt_identity()
 
-            revoke_token(jti, user_identity)
+            revoke_token(decoded_token["jti"], user_identity, decoded_token)
             return "", HttpStatus.NO_CONTENT_204.value
 
         except Exception:
@@ -298,7 +302,9 @@ class TrialToken(Resource):
 
             # Add new tokens to the database
             # JWT_IDENTITY_CLAIM is an identity claim and it defaults to "identity"
-            add_token_to_database(token, app.config["JWT_IDENTITY_CLAIM"])
+            add_token_to_database(
+                token, app.config["JWT_IDENTITY_CLAIM"], user=current_user
+            )
 
             response_body = {"trial_api_key": token}
             return make_response(response_body, HttpStatus.CREATED_201.value)
@@ -356,7 +362,9 @@ class PermanentToken(Resource):
 
             # Add new tokens to the database
             # JWT_IDENTITY_CLAIM is an identity claim and it defaults to "identity"
-            add_token_to_database(token, app.config["JWT_IDENTITY_CLAIM"])
+            add_token_to_database(
+                token, app.config["JWT_IDENTITY_CLAIM"], user=current_user
+            )
 
             response_body = {"permanent_api_key": token}
             return make_response(response_body, HttpStatus.CREATED_201.value)
@@ -9,12 +9,13 @@ from flask_jwt_extended import (
 )
 
 from quotes_api.auth.models import User
-from quotes_api.extensions import pwd_context
+from quotes_api.extensions import pwd_context, bus, generations
 from quotes_api.auth.helpers import (
     add_token_to_database,
+    delete_user,
 )
 from quotes_api.auth.decorators import Role, role_required
-from quotes_api.common import HttpStatus, paginator
+from quotes_api.common import HttpStatus, paginator, CursorPagination, get_schema
 from quotes_api.auth.schemas import UserSchema
 
 
@@ -65,14 +66,15 @@ class UserSignup(Resource):
     def post(self):
         """User registration to the database."""
         try:
-            # Create user schema instance
-            user_schema = UserSchema(only=["username", "email", "password"])
+            # Get the shared user schema instance
+            user_schema = get_schema(UserSchema, only=["username", "email", "password"])
             data = user_schema.load(request.json)
             data["password"] = pwd_context.hash(data["password"])
 
             try:
                 user = User(**data)
                 user.save()
+                generations.bump("users")
 
                 return {"message": "Successful sign up."}, HttpStatus.CREATED_201.value
 
@@ -135,8 +137,8 @@ class UserLogin(Resource):
         """Authenticate a user and return tokens."""
 
         try:
-            # Create user schema instance
-            user_schema = UserSchema(only=["username", "password"])
+            # Get the shared user schema instance
+            user_schema = get_schema(UserSchema, only=["username", "password"])
 
             # Get data from request
             data = user_schema.load(request.json)
@@ -167,8 +169,12 @@ class UserLogin(Resource):
 
                 # Add new tokens to the database
                 # JWT_IDENTITY_CLAIM is an identity claim and it defaults to "sub"
-                add_token_to_database(access_token, app.config["JWT_IDENTITY_CLAIM"])
-                add_token_to_database(refresh_token, app.config["JWT_IDENTITY_CLAIM"])
+                add_token_to_database(
+                    access_token, app.config["JWT_IDENTITY_CLAIM"], user=user
+                )
+                add_token_to_database(
+                    refresh_token, app.config["JWT_IDENTITY_CLAIM"], user=user
+                )
 
                 response_body = {
                     "access_token": access_token,
@@ -329,8 +335,8 @@ class UserResource(Resource):
                 HttpStatus.NOT_FOUND_404.value,
             )
 
-        # Create user schema instance
-        user_schema = UserSchema()
+        # Get the shared user schema instance
+        user_schema = get_schema(UserSchema)
         return make_response(user_schema.dump(user), HttpStatus.OK_200.value)
 
     @role_required([Role.ADMIN])
@@ -346,13 +352,16 @@ class UserResource(Resource):
             )
 
         try:
-            # Create user schema instance
-            user_schema = UserSchema()
+            # Get the shared user schema instance
+            user_schema = get_schema(UserSchema)
 
             data = user_schema.load(request.json)
             user.update(**data)
             user.save()
 
+            generations.bump("users")
+            bus.publish("users", {"username": user.username})
+
             return "", HttpStatus.NO_CONTENT_204.value
 
         except Exception:
@@ -371,13 +380,16 @@ class UserResource(Resource):
             )
 
         try:
-            # Create user schema instance and ignore any missing fields
-            user_schema = UserSchema(partial=True)
+            # Get the shared user schema instance that ignores any missing fields
+            user_schema = get_schema(UserSchema, partial=True)
 
             data = user_schema.load(request.json, partial=True)
             user.update(**data)
             user.save()
 
+            generations.bump("users")
+            bus.publish("users", {"username": user.username})
+
             return "", HttpStatus.NO_CONTENT_204.value
 
         except Exception:
@@ -397,7 +409,8 @@ class UserResource(Resource):
             )
 
         try:
-            user.delete()
+            delete_user(user)
+
             return "", HttpStatus.NO_CONTENT_204.value
 
         except Exception:
@@ -432,6 +445,13 @@ class UserList(Resource):
             type: integer
             default: 5
           description: Number of results per page.
+        - in: query
+          name: cursor
+          schema:
+            type: string
+          description:
+              Opaque cursor for keyset pagination, taken from the `next` and `prev` links.
+              Send it empty to get the first page. Replaces `page` and skips the totals.
       responses:
         200:
           content:
@@ -449,6 +469,8 @@ class UserList(Resource):
                         items:
                           $ref: '#/components/schemas/UserSchema'
 
+        400:
+          description: Invalid cursor.
         401:
           description: Missing authentication header.
         500:
@@ -465,14 +487,22 @@ class UserList(Resource):
 
         page = int(args.get("page", 1))
         per_page = int(args.get("per_page", 5))
+        cursor = args.get("cursor", None)
 
         try:
-            # Generating pagination of quotes
-            pagination = User.objects.paginate(page=page, per_page=per_page)
+            # Generating pagination of users
+            if cursor is not None:
+                pagination = CursorPagination(User.objects, cursor, per_page)
+            else:
+                pagination = User.objects.paginate(page=page, per_page=per_page)
+
             response_body = paginator(pagination, "auth.users", UserSchema)
 
             return make_response(response_body, HttpStatus.OK_200.value)
 
+        except ValueError:
+            return {"error": "Invalid cursor."}, HttpStatus.BAD_REQUEST_400.value
+
         except Exception:
             return (
                 {"error": "Could not retrieve users."},
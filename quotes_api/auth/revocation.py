@@ -0,0 +1,115 @@
+"""Revoked token filter file. Used by the "denylist" token revocation mode."""
+
+from threading import Lock
+
+from flask import current_app
+
+from quotes_api.auth.models import RevokedUser, TokenBlacklist
+from quotes_api.common.bloom import BloomFilter
+from quotes_api.extensions import generations
+
+
+class RevocationFilter:
+    """
+    Bloom filter of the revoked token jtis, and of the deleted users.
+
+    Tokens missing from the filter were never revoked, so they're verified without
+    reading the database. Tokens found in it are revoked, or false positives that are
+    told apart by reading their revocation state. Deleted users are added with their
+    "revoked_user_key", which revokes every token issued to them before.
+
+    The filter is built from the stored revoked tokens. Revocations of the next "tokens"
+    generation are added in place from the bus messages, so the filter of every worker on
+    the bus follows them without reading the database. Missed generations, like prunes or
+    writes of workers that aren't on the bus, rebuild the filter on next use, which also
+    drops unrevoked and pruned tokens from it.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.capacity = app.config["TOKEN_REVOCATION_FILTER_CAPACITY"]
+        self.error_rate = app.config["TOKEN_REVOCATION_FILTER_ERROR_RATE"]
+        self.lock = Lock()
+        self.bloom = None
+        self.generation = None
+
+    def load(self):
+        """Build the filter from the revoked tokens in the database."""
+
+        with self.lock:
+            generation = generations.get("tokens", app=self.app)
+            jtis = [
+                document["jti"]
+                for document in TokenBlacklist._get_collection().find(
+                    {"revoked": True}, {"jti": 1, "_id": 0}
+                )
+            ]
+            jtis += [
+                revoked_user_key(document["username"])
+                for document in RevokedUser._get_collection().find(
+                    {}, {"username": 1, "_id": 0}
+                )
+            ]
+
+            # Leave room for the revocations to come before the next rebuild
+            bloom = BloomFilter(max(self.capacity, 2 * len(jtis)), self.error_rate)
+            for jti in jtis:
+                bloom.add(jti)
+
+            self.bloom = bloom
+            self.generation = generation
+
+    def might_contain(self, jti):
+        """False if the token was never revoked, True if it might have been."""
+
+        if self.bloom is None or generations.get("tokens", app=self.app) != (
+            self.generation
+        ):
+            self.load()
+
+        return jti in self.bloom
+
+    def update(self, message):
+        """
+        Apply a token message of the bus to the filter.
+
+        Unrevoked tokens are left in the filter until the next rebuild, as false
+        positives they only cost a database read.
+        """
+
+        generation = message.get("generation")
+
+        # Plain cache evictions don't change the filter
+        if generation is None:
+            return
+
+        with self.lock:
+            if self.bloom is None or generation <= self.generation:
+                return
+
+            # A missed generation can't be applied in place, rebuild on next use
+            if generation != self.generation + 1:
+                self.bloom = None
+                return
+
+            if message.get("revoked"):
+                self.bloom.add(message["jti"])
+
+            self.generation = generation
+
+
+def revoked_user_key(user_identity):
+    """Key of a deleted user in the revoked token filter."""
+
+    return f"user:{user_identity}"
+
+
+def get_revocation_filter(app=None):
+    """Get the revoked token filter of the application, creating it on first use."""
+
+    app = app or current_app
+
+    if "revocation_filter" not in app.extensions:
+        app.extensions["revocation_filter"] = RevocationFilter(app)
+
+    return app.extensions["revocation_filter"]
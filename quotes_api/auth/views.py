@@ -16,10 +16,16 @@ from quotes_api.auth.resources import (
     TrialToken,
     PermanentToken,
 )
-from quotes_api.auth.models import User
 from quotes_api.auth.schemas import UserSchema, TokenBlacklistSchema
-from quotes_api.extensions import jwt, apispec
-from quotes_api.auth.helpers import is_token_revoked
+from quotes_api.extensions import jwt, apispec, bus
+from quotes_api.auth.helpers import (
+    is_token_revoked,
+    evict_token,
+    evict_user,
+    lazy_user,
+)
+from quotes_api.auth.pruner import TokenPruner
+from quotes_api.auth.revocation import get_revocation_filter
 
 blueprint = Blueprint("auth", __name__, url_prefix="/auth")
 
@@ -43,6 +49,33 @@ api.add_resource(TrialToken, "/generate_trial_key", endpoint="trial_token")
 api.add_resource(PermanentToken, "/generate_permanent_key", endpoint="permanent_token")
 
 
+token_pruner = TokenPruner()
+
+
+# Invalidation bus subscribers
+@blueprint.record_once
+def subscribe_invalidations(state):
+    """Evict updated tokens and users from the caches of every worker."""
+    bus.subscribe("tokens", evict_token, app=state.app)
+    bus.subscribe("users", evict_user, app=state.app)
+
+
+# Expired token pruning
+@blueprint.record_once
+def schedule_pruning(state):
+    """Prune expired tokens in the background, if an interval is configured."""
+    token_pruner.init_app(state.app)
+
+
+# Revoked token filter
+@blueprint.before_app_first_request
+def load_revocation_filter():
+    """Load the revoked token filter before serving, in the "denylist" revocation mode."""
+
+    if current_app.config["TOKEN_REVOCATION_MODE"] == "denylist":
+        get_revocation_filter().load()
+
+
 # Callback functions
 @jwt.token_in_blocklist_loader
 def check_if_token_revoked(_, jwt_payload):
@@ -54,18 +87,17 @@ def check_if_token_revoked(_, jwt_payload):
     return is_token_revoked(decoded_token)
 
 
-# It might be unnecessary
 @jwt.user_lookup_loader
 def user_loader_callback(_, jwt_payload):
     """
-    Callback function that will be called to automatically load an object from the database
-    when a protected endpoint is accessed.
+    Callback function that will be called to load the user when a protected endpoint is accessed.
+
+    The user is loaded lazily, so the database is only queried on first access to "current_user".
+    Roles are already in the token claims, so "role_required" never needs the user. Tokens are
+    revoked when their user is deleted.
     """
-    try:
-        identity = jwt_payload["sub"]
-        return User.objects.get(username=identity)
-    except Exception:
-        return None
+    identity = jwt_payload["sub"]
+    return lazy_user(identity)
 
 
 @jwt.additional_claims_loader
@@ -1,13 +1,55 @@
 """Common initialization file."""
 
 from quotes_api.common.http_status import HttpStatus
-from quotes_api.common.paginator import paginator, author_paginator
+from quotes_api.common.paginator import (
+    paginator,
+    OffsetPagination,
+    CursorPagination,
+)
 from quotes_api.common.apispec import FlaskRestfulPlugin, APISpecExt
+from quotes_api.common.cache import TTLCache, CacheRegistry
+from quotes_api.common.bus import InvalidationBus
+from quotes_api.common.search import InvertedIndex
+from quotes_api.common.tag_index import (
+    TagIndex,
+    parse_tag_expression,
+    plain_tags,
+    tag_expression_query,
+)
+from quotes_api.common.response_cache import ResponseCache
+from quotes_api.common.generations import GenerationCounter
+from quotes_api.common.metrics import Metrics, timed
+from quotes_api.common.profiler import QueryProfiler, QueryBudgetExceeded
+from quotes_api.common.serializers import (
+    get_schema,
+    compile_serializer,
+    register_serializer,
+    dump_records,
+)
 
 __all__ = [
     "HttpStatus",
     "paginator",
-    "author_paginator",
+    "OffsetPagination",
+    "CursorPagination",
     "FlaskRestfulPlugin",
     "APISpecExt",
+    "TTLCache",
+    "CacheRegistry",
+    "InvalidationBus",
+    "InvertedIndex",
+    "TagIndex",
+    "parse_tag_expression",
+    "plain_tags",
+    "tag_expression_query",
+    "ResponseCache",
+    "GenerationCounter",
+    "Metrics",
+    "timed",
+    "QueryProfiler",
+    "QueryBudgetExceeded",
+    "get_schema",
+    "compile_serializer",
+    "register_serializer",
+    "dump_records",
 ]
@@ -0,0 +1,52 @@
+"""Common Bloom filter file."""
+
+import math
+from hashlib import blake2b
+
+
+class BloomFilter:
+    """
+    Compact set of strings that can answer "maybe" but never a wrong "no".
+
+    Sized for "capacity" keys at a false positive rate of "error_rate". Past its
+    capacity the filter keeps working, with more false positives. Keys can't be
+    removed, rebuild the filter instead.
+    """
+
+    def __init__(self, capacity=100000, error_rate=0.001):
+        capacity = max(capacity, 1)
+
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(
+            int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)), 8
+        )
+        self.hashes = max(int(round(self.size / capacity * math.log(2))), 1)
+        self.count = 0
+
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def add(self, key):
+        """Add a key to the filter."""
+
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+    def __len__(self):
+        return self.count
+
+    def _positions(self, key):
+        # Double hashing, every position from the two halves of one digest
+        digest = blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+
+        return [(first + index * second) % self.size for index in range(self.hashes)]
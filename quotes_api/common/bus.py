@@ -0,0 +1,207 @@
+"""Common invalidation bus file. Broadcasts cache invalidations between workers."""
+
+import os
+import time
+import logging
+from uuid import uuid4
+from threading import Thread, Lock
+from collections import defaultdict
+
+from flask import current_app
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid, PyMongoError
+from mongoengine.connection import get_db
+
+logger = logging.getLogger(__name__)
+
+
+class LocalBackend:
+    """
+    In-process stand-in backend.
+
+    Messages are only delivered to the subscribers of the publishing process, which
+    is enough for a single worker, the development server and tests.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def listen(self, deliver):
+        """Start receiving messages from other workers. Nothing to do locally."""
+
+    def publish(self, channel, message, origin):
+        """Forward a message to other workers. Nothing to do locally."""
+
+
+class MongoBackend:
+    """
+    Backend that shares messages between workers through a capped collection.
+
+    Every worker tails the collection with a tailable cursor, so a message published
+    by one worker reaches the rest as soon as it's inserted. Messages are read in
+    insertion order, ids created by different workers aren't ordered, so a lost cursor
+    is resumed by reading the collection again past the last delivered message.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.collection_name = app.config["INVALIDATION_BUS_COLLECTION"]
+        self.size = app.config["INVALIDATION_BUS_SIZE"]
+        self.last_id = None
+
+    def _get_collection(self):
+        db = get_db()
+
+        try:
+            db.create_collection(self.collection_name, capped=True, size=self.size)
+        except CollectionInvalid:
+            pass
+
+        return db[self.collection_name]
+
+    def listen(self, deliver):
+        """Start a daemon thread that delivers messages published by other workers."""
+
+        thread = Thread(target=self._tail, args=(deliver,), daemon=True)
+        thread.start()
+
+    def publish(self, channel, message, origin):
+        """Insert a message into the capped collection."""
+
+        self._get_collection().insert_one(
+            {"channel": channel, "message": message, "origin": origin}
+        )
+
+    def _tail(self, deliver):
+        started = False
+
+        while True:
+            try:
+                collection = self._get_collection()
+
+                if not started:
+                    last = collection.find_one(sort=[("$natural", -1)])
+                    self.last_id = last["_id"] if last else None
+                    started = True
+
+                cursor = collection.find(cursor_type=CursorType.TAILABLE_AWAIT)
+                self._follow(cursor, deliver)
+
+                # Tailable cursors die right away on empty collections
+                time.sleep(0.1)
+
+            except PyMongoError:
+                logger.exception("Invalidation bus lost its cursor, retrying.")
+                time.sleep(1)
+
+    def _follow(self, cursor, deliver):
+        """Deliver the messages of a cursor that come after the last delivered one."""
+
+        # Messages up to the last delivered one, kept in case it was overwritten
+        skipped = None if self.last_id is None else []
+
+        while cursor.alive:
+            for event in cursor:
+                if skipped is None:
+                    self._deliver(event, deliver)
+                elif event["_id"] == self.last_id:
+                    skipped = None
+                else:
+                    skipped.append(event)
+
+            # The last delivered message was overwritten, every skipped one is newer
+            if skipped is not None:
+                logger.warning("Invalidation bus fell behind, messages may be lost.")
+
+                for event in skipped:
+                    self._deliver(event, deliver)
+
+                skipped = None
+
+    def _deliver(self, event, deliver):
+        self.last_id = event["_id"]
+        deliver(event["channel"], event["message"], event["origin"])
+
+
+BACKENDS = {"local": LocalBackend, "mongo": MongoBackend}
+
+
+class _BusState:
+    """Subscribers and backend of the invalidation bus for one application."""
+
+    def __init__(self, app, backend):
+        self.app = app
+        self.backend = backend
+        self.subscribers = defaultdict(list)
+        self.token = uuid4().hex
+        self.listening_pid = None
+        self.lock = Lock()
+
+    @property
+    def origin(self):
+        # Forked workers share the token, the process id tells them apart
+        return f"{self.token}:{os.getpid()}"
+
+    def listen(self):
+        pid = os.getpid()
+
+        with self.lock:
+            if self.listening_pid == pid:
+                return
+
+            self.listening_pid = pid
+
+        self.backend.listen(self.deliver)
+
+    def deliver(self, channel, message, origin=None):
+        # Messages published by this process were already delivered locally
+        if origin == self.origin:
+            return
+
+        with self.app.app_context():
+            for callback in self.subscribers[channel]:
+                try:
+                    callback(message)
+                except Exception:
+                    logger.exception("Invalidation bus subscriber failed.")
+
+
+class InvalidationBus:
+    """
+    Flask extension to publish cache invalidation messages to every worker.
+
+    Messages are JSON serializable dictionaries published on a channel. Subscribers
+    of the publishing worker receive them synchronously, and the configured backend
+    forwards them to the subscribers of every other worker.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("INVALIDATION_BUS_BACKEND", "local")
+        app.config.setdefault("INVALIDATION_BUS_COLLECTION", "invalidation_events")
+        app.config.setdefault("INVALIDATION_BUS_SIZE", 1024 * 1024)
+
+        backend = app.config["INVALIDATION_BUS_BACKEND"]
+        backend_class = BACKENDS[backend] if isinstance(backend, str) else backend
+
+        state = _BusState(app, backend_class(app))
+        app.extensions["invalidation_bus"] = state
+
+        # Listen lazily so every forked worker starts its own listener
+        app.before_request(state.listen)
+
+    def subscribe(self, channel, callback, app=None):
+        """Call a function with every message published on a channel."""
+
+        state = (app or current_app).extensions["invalidation_bus"]
+        state.subscribers[channel].append(callback)
+
+    def publish(self, channel, message, app=None):
+        """Publish a message on a channel to every worker."""
+
+        state = (app or current_app).extensions["invalidation_bus"]
+        state.deliver(channel, message)
+        state.backend.publish(channel, message, state.origin)
@@ -0,0 +1,142 @@
+"""Common in-process caching utilities file."""
+
+import time
+from collections import OrderedDict
+from threading import RLock
+
+from flask import current_app
+
+
+class TTLCache:
+    """
+    Bounded least recently used cache whose entries expire after a time to live.
+
+    Every entry can have its own time to live, which is never longer than the
+    cache's default one. Hits and misses are counted so callers can report them.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60, timer=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+        self._timer = timer
+        self._lock = RLock()
+        self._entries = OrderedDict()
+
+    def get(self, key, default=None):
+        """Get the value stored for a key, or the default if it's missing or expired."""
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None:
+                expires_at, value = entry
+
+                if expires_at > self._timer():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+
+                del self._entries[key]
+
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        """
+        Store a value for a key.
+
+        The entry lives for the smallest of the given ttl and the cache's ttl.
+        Entries with a non positive time to live are not stored at all.
+        """
+
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+
+        with self._lock:
+            self._entries.pop(key, None)
+
+            if ttl <= 0 or self.maxsize <= 0:
+                return
+
+            self._entries[key] = (self._timer() + ttl, value)
+
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        """Remove a key from the cache. Missing keys are ignored."""
+
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Remove every entry from the cache."""
+
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Get the hit and miss counters of the cache."""
+
+        lookups = self.hits + self.misses
+
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "size": len(self),
+            "maxsize": self.maxsize,
+        }
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry[0] > self._timer()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class CacheRegistry:
+    """
+    Flask extension that holds the named caches of an application.
+
+    Each cache is created on first use, and its size and time to live are read from
+    the `<NAME>_CACHE_MAXSIZE` and `<NAME>_CACHE_TTL` configuration variables.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("CACHE_DEFAULT_MAXSIZE", 1024)
+        app.config.setdefault("CACHE_DEFAULT_TTL", 60)
+        app.extensions["caches"] = {}
+
+    def get_cache(self, name, app=None):
+        """Get the cache with the given name, creating it if it doesn't exist yet."""
+
+        app = app or current_app
+        registry = app.extensions["caches"]
+
+        if name not in registry:
+            prefix = name.upper()
+            registry[name] = TTLCache(
+                maxsize=app.config.get(
+                    f"{prefix}_CACHE_MAXSIZE", app.config["CACHE_DEFAULT_MAXSIZE"]
+                ),
+                ttl=app.config.get(
+                    f"{prefix}_CACHE_TTL", app.config["CACHE_DEFAULT_TTL"]
+                ),
+            )
+
+        return registry[name]
+
+    def stats(self, app=None):
+        """Get the stats of every cache created for the application."""
+
+        app = app or current_app
+        return {name: cache.stats() for name, cache in app.extensions["caches"].items()}
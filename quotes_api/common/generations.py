@@ -0,0 +1,111 @@
+"""Common generation counters file. Tells caches whether a collection changed."""
+
+import time
+from threading import Lock
+
+from flask import current_app
+from pymongo import ReturnDocument
+from mongoengine.connection import get_db
+
+
+class _GenerationState:
+    """Last known generation of every collection for one application."""
+
+    def __init__(self, app):
+        self.app = app
+        self.collection_name = app.config["GENERATIONS_COLLECTION"]
+        self.refresh = app.config["GENERATIONS_REFRESH"]
+        self.values = {}
+        self.loaded_at = None
+        self.lock = Lock()
+
+    def get_collection(self):
+        return get_db()[self.collection_name]
+
+    def get(self, name):
+        # Reload now and then to see bumps from processes that aren't on the bus
+        if self.loaded_at is None or (
+            self.refresh and time.monotonic() - self.loaded_at > self.refresh
+        ):
+            self.load()
+
+        return self.values.get(name, 0)
+
+    def load(self):
+        generations = {
+            document["_id"]: document["generation"]
+            for document in self.get_collection().find()
+        }
+
+        with self.lock:
+            for name, generation in generations.items():
+                self.observe_generation(name, generation)
+
+            self.loaded_at = time.monotonic()
+
+    def observe(self, message):
+        with self.lock:
+            self.observe_generation(message["collection"], message["generation"])
+
+    def observe_generation(self, name, generation):
+        # Generations only grow, whatever order the messages arrive in
+        if generation > self.values.get(name, 0):
+            self.values[name] = generation
+
+
+class GenerationCounter:
+    """
+    Flask extension with a monotonic generation number per collection.
+
+    Writers bump the generation of the collections they change. The generation is
+    stored in mongodb and broadcast on the invalidation bus, so every worker reads
+    the latest one from memory. Caches embed it in their keys and stay correct
+    without clearing entries or polling the database.
+    """
+
+    def __init__(self, bus, app=None):
+        self.bus = bus
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("GENERATIONS_COLLECTION", "generations")
+        app.config.setdefault("GENERATIONS_REFRESH", 60)
+
+        state = _GenerationState(app)
+        app.extensions["generations"] = state
+
+        self.bus.subscribe("generations", state.observe, app=app)
+
+    def get(self, name, app=None):
+        """Get the current generation of a collection. Collections start at 0."""
+
+        return (app or current_app).extensions["generations"].get(name)
+
+    def bump(self, *names, app=None):
+        """
+        Increment the generation of some collections after writing to them.
+
+        Returns the new generation of the last collection, so writers can tag the
+        messages of their writes with it.
+        """
+
+        app = app or current_app
+        state = app.extensions["generations"]
+
+        for name in names:
+            document = state.get_collection().find_one_and_update(
+                {"_id": name},
+                {"$inc": {"generation": 1}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+
+            self.bus.publish(
+                "generations",
+                {"collection": name, "generation": document["generation"]},
+                app=app,
+            )
+
+        return document["generation"]
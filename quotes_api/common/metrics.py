@@ -0,0 +1,297 @@
+"""Common metrics file. Per-request timing breakdowns and Prometheus metrics."""
+
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import Lock
+
+from flask import Response, current_app, g, has_app_context, has_request_context
+from flask import request
+from pymongo import monitoring
+
+# Seconds, from a cached response to a slow login
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+
+    labels = ",".join(f'{name}="{value}"' for name, value in zip(names, values))
+    return "{" + labels + "}"
+
+
+class Counter:
+    """Monotonic counter with labels, in the Prometheus text format."""
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.values = {}
+        self.lock = Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labels)
+
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} counter",
+        ]
+
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+
+        return lines
+
+
+class Histogram:
+    """Histogram of durations with labels, in the Prometheus text format."""
+
+    def __init__(self, name, description, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = buckets
+        self.values = {}
+        self.lock = Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        bucket = bisect_left(self.buckets, value)
+
+        with self.lock:
+            if key not in self.values:
+                # Counts per bucket, plus the +Inf one, then the sum
+                self.values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+
+            counts, _ = self.values[key]
+            counts[bucket] += 1
+            self.values[key][1] += value
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} histogram",
+        ]
+        bounds = [str(bucket) for bucket in self.buckets] + ["+Inf"]
+
+        with self.lock:
+            for key, (counts, total) in sorted(self.values.items()):
+                cumulative = 0
+
+                for bound, count in zip(bounds, counts):
+                    cumulative += count
+                    labels = _format_labels(self.labels + ("le",), key + (bound,))
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+
+                labels = _format_labels(self.labels, key)
+                lines.append(f"{self.name}_sum{labels} {total}")
+                lines.append(f"{self.name}_count{labels} {cumulative}")
+
+        return lines
+
+
+class _MetricsState:
+    """Metrics of one application."""
+
+    def __init__(self, app):
+        self.app = app
+        self.server_timing = app.config["SERVER_TIMING"]
+
+        self.requests = Histogram(
+            "quotes_api_request_seconds",
+            "Request latency.",
+            ("endpoint", "method", "status"),
+        )
+        self.phases = Histogram(
+            "quotes_api_phase_seconds",
+            "Latency of the phases of the requests, like auth, count or dump.",
+            ("phase",),
+        )
+        self.commands = Histogram(
+            "quotes_api_db_command_seconds",
+            "Latency of the mongodb commands.",
+            ("command",),
+        )
+        self.command_errors = Counter(
+            "quotes_api_db_command_errors_total",
+            "Failed mongodb commands.",
+            ("command",),
+        )
+
+    def render(self):
+        lines = []
+
+        for metric in (self.requests, self.phases, self.commands, self.command_errors):
+            lines.extend(metric.render())
+
+        lines.extend(self._render_caches())
+        return "\n".join(lines) + "\n"
+
+    def _render_caches(self):
+        # Cache counters live in the caches, they're read when scraped
+        caches = dict(self.app.extensions.get("caches", {}))
+        response_cache = self.app.extensions.get("response_cache")
+
+        if response_cache is not None:
+            for group, cache in response_cache.groups.items():
+                caches[f"response_{group}"] = cache
+
+        hits = Counter("quotes_api_cache_hits_total", "Cache hits.", ("cache",))
+        misses = Counter("quotes_api_cache_misses_total", "Cache misses.", ("cache",))
+        lines = [
+            "# HELP quotes_api_cache_hit_ratio Cache hits per lookup.",
+            "# TYPE quotes_api_cache_hit_ratio gauge",
+        ]
+
+        for name, cache in sorted(caches.items()):
+            stats = cache.stats()
+            hits.inc(stats["hits"], cache=name)
+            misses.inc(stats["misses"], cache=name)
+            lines.append(
+                f'quotes_api_cache_hit_ratio{{cache="{name}"}} {stats["hit_ratio"]}'
+            )
+
+        return hits.render() + misses.render() + lines
+
+
+def record_timing(name, seconds, count=1):
+    """Add the duration of a phase to the timings of the current request."""
+
+    if not has_request_context():
+        return
+
+    state = current_app.extensions.get("metrics")
+    if state is None:
+        return
+
+    state.phases.observe(seconds, phase=name)
+
+    timings = g.setdefault("metrics_timings", {})
+    total, total_count = timings.get(name, (0.0, 0))
+    timings[name] = (total + seconds, total_count + count)
+
+
+@contextmanager
+def timed(name):
+    """Context manager that records its duration as a phase of the current request."""
+
+    start = time.perf_counter()
+
+    try:
+        yield
+    finally:
+        record_timing(name, time.perf_counter() - start)
+
+
+class _CommandListener(monitoring.CommandListener):
+    """Times the mongodb commands of the applications with metrics."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._observe(event)
+
+    def failed(self, event):
+        self._observe(event, failed=True)
+
+    def _observe(self, event, failed=False):
+        # Commands outside an application, like the ones of scripts, aren't timed
+        if not has_app_context():
+            return
+
+        state = current_app.extensions.get("metrics")
+        if state is None:
+            return
+
+        seconds = event.duration_micros / 1e6
+        state.commands.observe(seconds, command=event.command_name)
+
+        if failed:
+            state.command_errors.inc(command=event.command_name)
+
+        if has_request_context():
+            timings = g.setdefault("metrics_timings", {})
+            total, count = timings.get("db", (0.0, 0))
+            timings["db"] = (total + seconds, count + 1)
+
+
+_command_listener = None
+
+
+class Metrics:
+    """
+    Flask extension that measures where the time of the requests goes.
+
+    Requests are timed as a whole and by phase: the mongodb commands, through pymongo
+    command monitoring, and the blocks wrapped in "timed", like the authentication,
+    the counts and the serialization. The phases of a request are sent back in its
+    Server-Timing header, and every measure is aggregated into latency histograms
+    served in the Prometheus text format on "METRICS_PATH".
+
+    Metrics and Server-Timing headers are off unless "METRICS_ENABLED" and "SERVER_TIMING"
+    are set, the metrics endpoint isn't authenticated. Metrics are kept per process.
+    Initialize the extension before the database one,
+    pymongo only monitors the clients created after the listener is registered.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        global _command_listener
+
+        app.config.setdefault("METRICS_ENABLED", False)
+        app.config.setdefault("METRICS_PATH", "/metrics")
+        app.config.setdefault("SERVER_TIMING", False)
+
+        if not app.config["METRICS_ENABLED"]:
+            return
+
+        if _command_listener is None:
+            _command_listener = _CommandListener()
+            monitoring.register(_command_listener)
+
+        app.extensions["metrics"] = _MetricsState(app)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.add_url_rule(
+            app.config["METRICS_PATH"], "metrics", self._metrics_view, methods=["GET"]
+        )
+
+    def _start_request(self):
+        g.metrics_start = time.perf_counter()
+
+    def _finish_request(self, response):
+        state = current_app.extensions["metrics"]
+        seconds = time.perf_counter() - g.pop("metrics_start", time.perf_counter())
+
+        state.requests.observe(
+            seconds,
+            endpoint=request.endpoint or "none",
+            method=request.method,
+            status=response.status_code,
+        )
+
+        if state.server_timing:
+            timings = [
+                f'{name};dur={total * 1000:.2f};desc="{count}"'
+                for name, (total, count) in g.get("metrics_timings", {}).items()
+            ]
+            timings.append(f"app;dur={seconds * 1000:.2f}")
+            response.headers["Server-Timing"] = ", ".join(timings)
+
+        return response
+
+    def _metrics_view(self):
+        state = current_app.extensions["metrics"]
+
+        return Response(state.render(), mimetype="text/plain; version=0.0.4")
@@ -1,17 +1,213 @@
 """Common pagination utilities file."""
 
-from flask import url_for
+import json
+import math
+import binascii
+from base64 import urlsafe_b64encode, urlsafe_b64decode
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from flask import abort, url_for
+
+from quotes_api.common.serializers import dump_records
+from quotes_api.common.metrics import timed
+
+
+class OffsetPagination:
+    """
+    Page number pagination whose total is counted by the caller.
+
+    When no total is given, the count is skipped and one extra document is fetched
+    to know if there's another page.
+    """
+
+    def __init__(self, queryset, page, per_page, total=None):
+        if page < 1:
+            abort(404)
+
+        self.page = page
+        self.per_page = per_page
+        self.total = total
+
+        start_index = (page - 1) * per_page
+        limit = per_page if total is not None else per_page + 1
+
+        items = list(queryset.skip(start_index).limit(limit))
+        self._has_more = len(items) > per_page
+        self.items = items[:per_page]
+
+        if not self.items and page != 1:
+            abort(404)
+
+    @property
+    def pages(self):
+        """The total number of pages, if the total is known."""
+
+        if self.total is None:
+            return None
+
+        return int(math.ceil(self.total / float(self.per_page)))
+
+    @property
+    def has_prev(self):
+        """True if a previous page exists."""
+        return self.page > 1
+
+    @property
+    def has_next(self):
+        """True if a next page exists."""
+
+        if self.total is None:
+            return self._has_more
+
+        return self.page < self.pages
+
+    @property
+    def prev_num(self):
+        """Number of the previous page."""
+        return self.page - 1
+
+    @property
+    def next_num(self):
+        """Number of the next page."""
+        return self.page + 1
+
+
+def encode_cursor(key, direction):
+    """Encodes an opaque cursor that seeks from a sort key in a direction."""
+
+    payload = json.dumps({"key": str(key), "dir": direction})
+    return urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    Decodes a cursor into a sort key and a direction.
+
+    An empty cursor points to the first page. Raises ValueError for invalid cursors.
+    """
+
+    if not cursor:
+        return None, "next"
+
+    try:
+        padding = "=" * (-len(cursor) % 4)
+        payload = json.loads(urlsafe_b64decode(cursor + padding))
+        key = str(payload["key"])
+        direction = payload["dir"]
+
+    except (binascii.Error, ValueError, KeyError, TypeError) as err:
+        raise ValueError(f"Invalid cursor '{cursor}'") from err
+
+    if direction not in ("next", "prev"):
+        raise ValueError(f"Invalid cursor '{cursor}'")
+
+    return key, direction
+
+
+class CursorPagination:
+    """
+    Keyset pagination that seeks on a sort key instead of skipping documents.
+
+    The sort field must be unique and indexed, and defaults to the document id.
+    Every page costs the same no matter how deep it is, and no count is needed.
+    """
+
+    def __init__(self, queryset, cursor, per_page, sort_field="id", descending=False):
+        self.cursor = cursor
+        self.per_page = per_page
+        self.sort_field = sort_field
+
+        key, direction = decode_cursor(cursor)
+
+        if key is not None and sort_field == "id":
+            try:
+                key = ObjectId(key)
+            except InvalidId as err:
+                raise ValueError(f"Invalid cursor '{cursor}'") from err
+
+        # Seeking backwards in a descending order is seeking forwards in an ascending one
+        forward = (direction == "next") != descending
+        operator, order = ("gt", "+") if forward else ("lt", "-")
+
+        if key is not None:
+            queryset = queryset.filter(**{f"{sort_field}__{operator}": key})
+
+        # Fetch one extra document to know if there's another page
+        items = list(queryset.order_by(order + sort_field).limit(per_page + 1))
+        has_more = len(items) > per_page
+        items = items[:per_page]
+
+        if direction == "next":
+            self.has_next = has_more
+            self.has_prev = key is not None
+            self.items = items
+
+        else:
+            self.has_next = True
+            self.has_prev = has_more
+            self.items = list(reversed(items))
+
+    @property
+    def next_cursor(self):
+        """Cursor to the page after this one."""
+
+        if not self.has_next or not self.items:
+            return None
+
+        return encode_cursor(self._sort_key(self.items[-1]), "next")
+
+    @property
+    def prev_cursor(self):
+        """Cursor to the page before this one."""
+
+        if not self.has_prev or not self.items:
+            return None
+
+        return encode_cursor(self._sort_key(self.items[0]), "prev")
+
+    def _sort_key(self, item):
+        # Raw mongodb documents are keyed by database field names
+        if isinstance(item, dict) and self.sort_field == "id":
+            return item["_id"]
+
+        return item[self.sort_field]
+
+
+def generate_cursor_links(pagination, endpoint, **kwargs):
+    """Generates an object of links with the cursors of a keyset pagination."""
+
+    def cursor_link(cursor):
+        return url_for(
+            endpoint=endpoint,
+            cursor=cursor,
+            per_page=pagination.per_page,
+            _external=True,
+            **kwargs,
+        )
+
+    next_cursor = pagination.next_cursor
+    prev_cursor = pagination.prev_cursor
+
+    return {
+        "self": cursor_link(pagination.cursor),
+        "prev": cursor_link(prev_cursor) if prev_cursor else None,
+        "next": cursor_link(next_cursor) if next_cursor else None,
+    }
 
 
 def generate_links(pagination, endpoint, **kwargs):
     """Generates an object of links."""
 
+    if isinstance(pagination, CursorPagination):
+        return generate_cursor_links(pagination, endpoint, **kwargs)
+
     self_link = url_for(
         endpoint=endpoint,
         page=pagination.page,
         per_page=pagination.per_page,
         _external=True,
-        **kwargs
+        **kwargs,
     )
 
     next_link = (
@@ -20,7 +216,7 @@ def generate_links(pagination, endpoint, **kwargs):
             page=pagination.next_num,
             per_page=pagination.per_page,
             _external=True,
-            **kwargs
+            **kwargs,
         )
         if pagination.has_next
         else None
@@ -32,7 +228,7 @@ def generate_links(pagination, endpoint, **kwargs):
             page=pagination.prev_num,
             per_page=pagination.per_page,
             _external=True,
-            **kwargs
+            **kwargs,
         )
         if pagination.has_prev
         else None
@@ -44,46 +240,43 @@ def generate_links(pagination, endpoint, **kwargs):
 def paginator(pagination, endpoint, schema, **kwargs):
     """Paginator for supported models."""
 
-    # Create schemas
-    schema = schema(many=True)
-
     # Creating list of items
     items = list(pagination.items)
-    links = generate_links(pagination, endpoint, **kwargs)
 
-    response_body = {
-        "meta": {
-            "page_number": pagination.page,
-            "page_size": pagination.per_page,
-            "total_pages": pagination.pages,
-            "total_records": pagination.total,
-            "links": links,
-        },
-        "records": schema.dump(items),
-    }
+    with timed("links"):
+        links = generate_links(pagination, endpoint, **kwargs)
 
-    return response_body
+    with timed("dump"):
+        records = dump_records(schema, items)
 
+    if isinstance(pagination, CursorPagination):
+        return {
+            "meta": {
+                "page_size": pagination.per_page,
+                "cursors": {
+                    "prev": pagination.prev_cursor,
+                    "next": pagination.next_cursor,
+                },
+                "links": links,
+            },
+            "records": records,
+        }
 
-def author_paginator(pagination, endpoint, schema, **kwargs):
-    """Paginator for list of authors."""
+    meta = {
+        "page_number": pagination.page,
+        "page_size": pagination.per_page,
+    }
 
-    authors = []
-    for item in pagination.items:
-        author_name = item.author_name
+    # Totals are left out when the caller skipped counting them
+    if pagination.total is not None:
+        meta["total_pages"] = pagination.pages
+        meta["total_records"] = pagination.total
 
-        if author_name not in authors:
-            authors.append(author_name)
-    links = generate_links(pagination, endpoint, **kwargs)
+    meta["links"] = links
 
     response_body = {
-        "meta": {
-            "page_number": pagination.page,
-            "page_size": len(authors),
-            "total_pages": pagination.pages,
-            "links": links,
-        },
-        "records": authors,
+        "meta": meta,
+        "records": records,
     }
 
     return response_body
@@ -0,0 +1,316 @@
+"""Common query profiler file. Flags N+1, repeated and unindexed mongodb queries."""
+
+from bson import json_util
+from flask import current_app, g, has_request_context, request
+from mongoengine.connection import get_connection
+from pymongo import monitoring
+
+# Commands that mongodb can explain, with the keys of their filters
+EXPLAINABLE_COMMANDS = {
+    "find": "filter",
+    "aggregate": "pipeline",
+    "count": "query",
+    "distinct": "query",
+    "delete": "deletes",
+    "update": "updates",
+    "findAndModify": "query",
+}
+
+# Maintenance commands, like the index creation on first use, aren't counted
+IGNORED_COMMANDS = {"createIndexes", "listIndexes", "killCursors", "endSessions"}
+
+# Command keys that change between two sends of the same query
+VOLATILE_KEYS = {"lsid", "txnNumber", "$clusterTime", "$db", "$readPreference"}
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised when a request sends more queries than its budget allows."""
+
+
+def _query_key(command):
+    return json_util.dumps(
+        {key: value for key, value in command.items() if key not in VOLATILE_KEYS},
+        sort_keys=True,
+    )
+
+
+def _shape(value):
+    """Replace the values of a query by placeholders, keeping its structure."""
+
+    if isinstance(value, dict):
+        return {key: _shape(item) for key, item in value.items()}
+
+    if isinstance(value, (list, tuple)):
+        shapes = []
+
+        # Lists of any length have the shape of their distinct items
+        for item in value:
+            shape = _shape(item)
+
+            if shape not in shapes:
+                shapes.append(shape)
+
+        return shapes
+
+    return "?"
+
+
+def _query_shape(command_name, command):
+    collection = command.get(command_name)
+    query = command.get(EXPLAINABLE_COMMANDS.get(command_name), {})
+
+    return f"{command_name} {collection} " + json_util.dumps(
+        _shape(query), sort_keys=True
+    )
+
+
+def _find_stages(plan, stage):
+    """True if a plan, or any of its inputs, runs the given stage."""
+
+    if isinstance(plan, dict):
+        if plan.get("stage") == stage:
+            return True
+
+        return any(
+            _find_stages(value, stage)
+            for key, value in plan.items()
+            if key != "rejectedPlans"
+        )
+
+    if isinstance(plan, list):
+        return any(_find_stages(item, stage) for item in plan)
+
+    return False
+
+
+class _QueryProfile:
+    """Queries sent by one request."""
+
+    def __init__(self):
+        self.commands = {}
+        self.queries = []
+
+    def start(self, event):
+        if event.command_name in IGNORED_COMMANDS:
+            return
+
+        command = {
+            key: value
+            for key, value in event.command.items()
+            if key not in VOLATILE_KEYS
+        }
+        self.commands[event.request_id] = {
+            "command_name": event.command_name,
+            "database": event.database_name,
+            "command": command,
+            "key": _query_key(command),
+            "shape": _query_shape(event.command_name, command),
+        }
+
+    def finish(self, event, failed=False):
+        query = self.commands.pop(event.request_id, None)
+
+        if query is not None:
+            query["duration_ms"] = event.duration_micros / 1000
+            query["failed"] = failed
+            self.queries.append(query)
+
+
+class _ProfilerListener(monitoring.CommandListener):
+    """Records the mongodb commands of the profiled requests."""
+
+    def started(self, event):
+        profile = self._get_profile()
+
+        if profile is not None:
+            profile.start(event)
+
+    def succeeded(self, event):
+        profile = self._get_profile()
+
+        if profile is not None:
+            profile.finish(event)
+
+    def failed(self, event):
+        profile = self._get_profile()
+
+        if profile is not None:
+            profile.finish(event, failed=True)
+
+    def _get_profile(self):
+        if not has_request_context():
+            return None
+
+        return g.get("query_profile")
+
+
+_profiler_listener = None
+
+
+class _QueryProfilerState:
+    """Query counts per endpoint of one application."""
+
+    def __init__(self, app):
+        self.app = app
+        self.endpoints = {}
+
+    def record(self, endpoint, report):
+        stats = self.endpoints.setdefault(
+            endpoint, {"requests": 0, "queries": 0, "max_queries": 0}
+        )
+        stats["requests"] += 1
+        stats["queries"] += report["queries"]
+        stats["max_queries"] = max(stats["max_queries"], report["queries"])
+
+
+class QueryProfiler:
+    """
+    Flask extension that profiles the mongodb queries of the requests.
+
+    Profiles every request when "QUERY_PROFILER_ENABLED" is set, or only the ones that
+    send the "QUERY_PROFILER_HEADER" header when "QUERY_PROFILER_ALLOW_HEADER" is set.
+    Queries are recorded through pymongo command monitoring, and every profiled request
+    is checked for:
+
+    - Repeated queries, the same command sent more than once.
+    - N+1 queries, the same query shape sent "QUERY_PROFILER_REPEATS" times or more.
+    - Slow queries, slower than "QUERY_PROFILER_SLOW_MS", which are explained.
+    - Collection scans, found in the explained query plans. Set "QUERY_PROFILER_EXPLAIN"
+      to "all" to explain every query instead of only the slow ones.
+
+    Maintenance commands, like index creation, aren't counted as queries.
+    Requests with findings are logged, and query counts are kept per endpoint.
+    "QUERY_BUDGETS" maps endpoints to the most queries they can send, with
+    "QUERY_BUDGET_DEFAULT" for the rest. Requests over budget are logged, or fail with
+    "QueryBudgetExceeded" when "QUERY_BUDGET_STRICT" is set, like in the tests.
+
+    Initialize the extension before the database one, pymongo only monitors the
+    clients created after the listener is registered.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        global _profiler_listener
+
+        app.config.setdefault("QUERY_PROFILER_ENABLED", False)
+        app.config.setdefault("QUERY_PROFILER_ALLOW_HEADER", False)
+        app.config.setdefault("QUERY_PROFILER_HEADER", "X-Query-Profile")
+        app.config.setdefault("QUERY_PROFILER_SLOW_MS", 100)
+        app.config.setdefault("QUERY_PROFILER_EXPLAIN", "slow")
+        app.config.setdefault("QUERY_PROFILER_REPEATS", 5)
+        app.config.setdefault("QUERY_BUDGETS", {})
+        app.config.setdefault("QUERY_BUDGET_DEFAULT", None)
+        app.config.setdefault("QUERY_BUDGET_STRICT", False)
+
+        if _profiler_listener is None:
+            _profiler_listener = _ProfilerListener()
+            monitoring.register(_profiler_listener)
+
+        app.extensions["query_profiler"] = _QueryProfilerState(app)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+
+    def _start_request(self):
+        config = current_app.config
+        requested = config["QUERY_PROFILER_ALLOW_HEADER"] and request.headers.get(
+            config["QUERY_PROFILER_HEADER"]
+        )
+
+        if config["QUERY_PROFILER_ENABLED"] or requested:
+            g.query_profile = _QueryProfile()
+
+    def _finish_request(self, response):
+        # Stop profiling before explaining, explains aren't part of the request
+        profile = g.pop("query_profile", None)
+        if profile is None:
+            return response
+
+        endpoint = request.endpoint or "none"
+        report = self.analyze(profile.queries)
+        current_app.extensions["query_profiler"].record(endpoint, report)
+
+        response.headers["X-Query-Count"] = str(report["queries"])
+
+        budget = current_app.config["QUERY_BUDGETS"].get(
+            endpoint, current_app.config["QUERY_BUDGET_DEFAULT"]
+        )
+        over_budget = budget is not None and report["queries"] > budget
+        findings = [
+            report[finding]
+            for finding in ("repeated", "n_plus_one", "slow", "collection_scans")
+        ]
+
+        if over_budget or any(findings):
+            current_app.logger.warning(
+                "Queries of %s %s: %s", request.method, request.path, report
+            )
+
+        if over_budget and current_app.config["QUERY_BUDGET_STRICT"]:
+            raise QueryBudgetExceeded(
+                f"{endpoint} sent {report['queries']} queries, its budget is {budget}"
+            )
+
+        return response
+
+    def analyze(self, queries):
+        """Report the findings of the queries sent by a request."""
+
+        config = current_app.config
+        keys = {}
+        shapes = {}
+
+        for query in queries:
+            keys[query["key"]] = keys.get(query["key"], 0) + 1
+            shapes[query["shape"]] = shapes.get(query["shape"], 0) + 1
+
+        slow = [
+            query
+            for query in queries
+            if query["duration_ms"] >= config["QUERY_PROFILER_SLOW_MS"]
+        ]
+        explained = queries if config["QUERY_PROFILER_EXPLAIN"] == "all" else slow
+
+        collection_scans = []
+        for query in explained:
+            query["explain"] = self.explain(query)
+
+            if _find_stages(query["explain"], "COLLSCAN"):
+                collection_scans.append(query["shape"])
+
+        return {
+            "queries": len(queries),
+            "duration_ms": round(sum(query["duration_ms"] for query in queries), 3),
+            "repeated": {key: count for key, count in keys.items() if count > 1},
+            "n_plus_one": {
+                shape: count
+                for shape, count in shapes.items()
+                if count >= config["QUERY_PROFILER_REPEATS"]
+            },
+            "slow": [
+                {
+                    "shape": query["shape"],
+                    "duration_ms": query["duration_ms"],
+                    "explain": query.get("explain"),
+                }
+                for query in slow
+            ],
+            "collection_scans": collection_scans,
+        }
+
+    def explain(self, query):
+        """Get the query plan of a query, or None if it can't be explained."""
+
+        if query["command_name"] not in EXPLAINABLE_COMMANDS or query["failed"]:
+            return None
+
+        try:
+            database = get_connection().get_database(query["database"])
+            return database.command(
+                "explain", query["command"], verbosity="queryPlanner"
+            )
+
+        except Exception:
+            return None
@@ -0,0 +1,236 @@
+"""Common HTTP response caching utilities file. ETags and cached response bodies."""
+
+import hashlib
+from functools import wraps
+from datetime import datetime, timedelta
+
+from bson import Binary
+from flask import request, current_app, Response
+from flask_jwt_extended import get_jwt
+from mongoengine.connection import get_db
+
+from quotes_api.common.cache import TTLCache
+from quotes_api.common.http_status import HttpStatus
+
+
+class LocalBackend:
+    """
+    In-process stand-in shared backend.
+
+    Stores nothing, so every worker only shares responses with itself through its
+    in-memory cache, which is enough for a single worker, the development server
+    and tests.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def get(self, key):
+        """Get a response shared by another worker. Nothing to do locally."""
+
+        return None
+
+    def set(self, key, group, entry, ttl):
+        """Share a response with other workers. Nothing to do locally."""
+
+    def clear(self, group):
+        """Remove the shared responses of a group. Nothing to do locally."""
+
+
+class MongoBackend:
+    """
+    Shared backend that stores responses in a mongodb collection.
+
+    Expired responses are ignored on read and removed by a TTL index.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.collection_name = app.config["RESPONSE_CACHE_COLLECTION"]
+        self._indexed = False
+
+    def _get_collection(self):
+        collection = get_db()[self.collection_name]
+
+        if not self._indexed:
+            collection.create_index("expires", expireAfterSeconds=0)
+            collection.create_index("group")
+            self._indexed = True
+
+        return collection
+
+    def get(self, key):
+        """Get a response shared by any worker, or None if it's missing or expired."""
+
+        document = self._get_collection().find_one(
+            {"_id": key, "expires": {"$gt": datetime.utcnow()}}
+        )
+
+        if document is None:
+            return None
+
+        return document["etag"], bytes(document["body"]), document["mimetype"]
+
+    def set(self, key, group, entry, ttl):
+        """Share a response with every worker."""
+
+        etag, body, mimetype = entry
+        self._get_collection().replace_one(
+            {"_id": key},
+            {
+                "group": group,
+                "etag": etag,
+                "body": Binary(body),
+                "mimetype": mimetype,
+                "expires": datetime.utcnow() + timedelta(seconds=ttl),
+            },
+            upsert=True,
+        )
+
+    def clear(self, group):
+        """Remove the shared responses of a group."""
+
+        self._get_collection().delete_many({"group": group})
+
+
+BACKENDS = {"local": LocalBackend, "mongo": MongoBackend}
+
+
+class _ResponseCacheState:
+    """In-memory caches and shared backend of the response cache for one application."""
+
+    def __init__(self, app, backend):
+        self.app = app
+        self.backend = backend
+        self.maxsize = app.config["RESPONSE_CACHE_MAXSIZE"]
+        self.ttl = app.config["RESPONSE_CACHE_TTL"]
+        self.max_age = app.config["RESPONSE_CACHE_MAX_AGE"]
+        self.groups = {}
+
+    def get_group(self, group):
+        if group not in self.groups:
+            self.groups[group] = TTLCache(maxsize=self.maxsize, ttl=self.ttl)
+
+        return self.groups[group]
+
+    def get(self, key, group):
+        entries = self.get_group(group)
+        entry = entries.get(key)
+
+        if entry is None:
+            entry = self.backend.get(key)
+
+            if entry is not None:
+                entries.set(key, entry)
+
+        return entry
+
+    def set(self, key, group, entry):
+        self.get_group(group).set(key, entry)
+        self.backend.set(key, group, entry, self.ttl)
+
+    def clear(self, group):
+        self.get_group(group).clear()
+        self.backend.clear(group)
+
+
+def _role_key():
+    # Responses can depend on the roles of the user
+    return ",".join(sorted(get_jwt().get("roles", [])))
+
+
+class ResponseCache:
+    """
+    Flask extension that caches the responses of read endpoints.
+
+    Successful responses are cached by endpoint, view arguments, normalized query
+    arguments and user roles, in a bounded in-memory cache in front of a shared
+    backend. Responses belong to a group named after the collection they're built
+    from, and the generation of that collection is part of the key, so writes make
+    the previous responses unreachable.
+
+    The strong ETag of a response is a hash of its body, so it only matches the body a
+    worker would send, even a worker that hasn't seen the latest generation yet. Requests
+    with a matching If-None-Match header get a "304 Not Modified" without the body.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("RESPONSE_CACHE_BACKEND", "local")
+        app.config.setdefault("RESPONSE_CACHE_COLLECTION", "response_cache")
+        app.config.setdefault("RESPONSE_CACHE_MAXSIZE", 1024)
+        app.config.setdefault("RESPONSE_CACHE_TTL", 60)
+        app.config.setdefault("RESPONSE_CACHE_MAX_AGE", 0)
+
+        backend = app.config["RESPONSE_CACHE_BACKEND"]
+        backend_class = BACKENDS[backend] if isinstance(backend, str) else backend
+
+        app.extensions["response_cache"] = _ResponseCacheState(app, backend_class(app))
+
+    def cached(self, group, vary=_role_key):
+        """
+        Decorator that caches the successful responses of a resource method.
+
+        Apply it below the authentication decorators, so only allowed requests are
+        answered from the cache.
+        """
+
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                state = current_app.extensions["response_cache"]
+                key = self._make_key(group, vary())
+                entry = state.get(key, group)
+
+                if entry is None:
+                    response = func(*args, **kwargs)
+
+                    # Only successful responses are cached, errors go through
+                    if (
+                        not isinstance(response, Response)
+                        or response.status_code != HttpStatus.OK_200.value
+                    ):
+                        return response
+
+                    body = response.get_data()
+                    entry = (self._make_etag(body), body, response.mimetype)
+                    state.set(key, group, entry)
+
+                return self._make_response(state, *entry)
+
+            return wrapper
+
+        return decorator
+
+    def clear(self, group, app=None):
+        """Remove every cached response of a group."""
+
+        (app or current_app).extensions["response_cache"].clear(group)
+
+    def _make_key(self, group, variant):
+        generation = current_app.extensions["generations"].get(group)
+        view_args = sorted((request.view_args or {}).items())
+        query_args = sorted(request.args.items(multi=True))
+
+        key = repr(
+            (group, generation, request.endpoint, view_args, query_args, variant)
+        )
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    def _make_etag(self, body):
+        return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+    def _make_response(self, state, etag, body, mimetype):
+        if etag in request.if_none_match:
+            response = Response(status=HttpStatus.NOT_MODIFIED_304.value)
+        else:
+            response = Response(body, mimetype=mimetype)
+
+        response.set_etag(etag)
+        response.cache_control.private = True
+        response.cache_control.max_age = state.max_age
+
+        return response
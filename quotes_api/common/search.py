@@ -0,0 +1,295 @@
+"""Common full-text search utilities file. In-process inverted index with BM25 ranking."""
+
+import re
+import gzip
+import json
+import math
+from array import array
+from bisect import bisect_left
+from itertools import islice
+from collections import Counter, defaultdict
+
+TOKEN_PATTERN = re.compile(r"\w+")
+QUERY_PATTERN = re.compile(r'"([^"]*)"|(\S+)')
+
+# Term id placed between the fields of a document, so phrases can't span them
+FIELD_GAP = 0
+
+# Maximum number of terms a prefix query expands to
+MAX_PREFIX_EXPANSIONS = 64
+
+
+def tokenize(text):
+    """Splits a text into lowercase word tokens."""
+
+    return TOKEN_PATTERN.findall(text.lower()) if text else []
+
+
+class InvertedIndex:
+    """
+    Inverted index over documents with one or more text fields.
+
+    Postings are kept in compact unsigned int arrays of document ordinals and term
+    frequencies, and a forward index of term ids is kept per document to verify
+    phrase queries. Removed documents are tombstoned and compacted away in bulk.
+
+    Queries match any of their terms and are ranked with BM25. Words between double
+    quotes are phrases that must appear in the document, and words ending in "*" are
+    prefixes that match every term starting with them.
+    """
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+
+        self._terms = {}
+        self._term_list = [None]
+        self._sorted_terms = None
+        self._postings = [None]
+        self._frequencies = [None]
+
+        self._doc_ids = []
+        self._doc_terms = []
+        self._lengths = array("I")
+        self._ordinals = {}
+        self._total_length = 0
+        self._removed = 0
+
+        # Saved with the snapshots, for the owners of the index
+        self.metadata = {}
+
+    def __len__(self):
+        return len(self._ordinals)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._ordinals
+
+    def __iter__(self):
+        return iter(list(self._ordinals))
+
+    def add(self, doc_id, *fields):
+        """Index a document, replacing any previous version of it."""
+
+        self.remove(doc_id)
+
+        term_ids = array("I")
+        for position, text in enumerate(fields):
+            if position > 0:
+                term_ids.append(FIELD_GAP)
+
+            term_ids.extend(self._term_id(token) for token in tokenize(text))
+
+        self._append(doc_id, term_ids)
+
+    def remove(self, doc_id):
+        """Remove a document from the index. Missing documents are ignored."""
+
+        ordinal = self._ordinals.pop(doc_id, None)
+        if ordinal is None:
+            return
+
+        self._total_length -= self._lengths[ordinal]
+        self._doc_ids[ordinal] = None
+        self._doc_terms[ordinal] = None
+        self._removed += 1
+
+        # Compact once tombstones are a quarter of the postings
+        if self._removed > 1024 and self._removed * 4 > len(self._doc_ids):
+            self.compact()
+
+    def compact(self):
+        """Rebuild the postings without the removed documents."""
+
+        documents = [
+            (doc_id, term_ids)
+            for doc_id, term_ids in zip(self._doc_ids, self._doc_terms)
+            if doc_id is not None
+        ]
+
+        self._postings = [None] + [array("I") for _ in self._term_list[1:]]
+        self._frequencies = [None] + [array("I") for _ in self._term_list[1:]]
+        self._doc_ids = []
+        self._doc_terms = []
+        self._lengths = array("I")
+        self._ordinals = {}
+        self._total_length = 0
+        self._removed = 0
+
+        for doc_id, term_ids in documents:
+            self._append(doc_id, term_ids)
+
+    def search(self, query):
+        """
+        Search the documents matching a query.
+
+        :return: List of (document id, score) tuples, best matches first
+        """
+
+        parsed = self._parse(query)
+        if parsed is None or not self._ordinals:
+            return []
+
+        terms, phrases = parsed
+        if not terms and not phrases:
+            return []
+
+        scores = self._score(set(terms).union(*phrases))
+
+        if phrases:
+            scores = {
+                ordinal: score
+                for ordinal, score in scores.items()
+                if all(self._has_phrase(ordinal, phrase) for phrase in phrases)
+            }
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [(self._doc_ids[ordinal], score) for ordinal, score in ranked]
+
+    def save(self, path):
+        """Write a gzipped JSON snapshot of the index to a file."""
+
+        snapshot = {
+            "metadata": self.metadata,
+            "terms": self._term_list[1:],
+            "documents": [
+                [doc_id, term_ids.tolist()]
+                for doc_id, term_ids in zip(self._doc_ids, self._doc_terms)
+                if doc_id is not None
+            ],
+        }
+
+        with gzip.open(path, "wt", encoding="utf-8") as snapshot_file:
+            json.dump(snapshot, snapshot_file)
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        """Read an index from a snapshot written by "save"."""
+
+        with gzip.open(path, "rt", encoding="utf-8") as snapshot_file:
+            snapshot = json.load(snapshot_file)
+
+        index = cls(**kwargs)
+        index.metadata = snapshot.get("metadata", {})
+
+        for term in snapshot["terms"]:
+            index._term_id(term)
+
+        for doc_id, term_ids in snapshot["documents"]:
+            index._append(doc_id, array("I", term_ids))
+
+        return index
+
+    def _term_id(self, term):
+        term_id = self._terms.get(term)
+
+        if term_id is None:
+            term_id = len(self._term_list)
+            self._terms[term] = term_id
+            self._term_list.append(term)
+            self._postings.append(array("I"))
+            self._frequencies.append(array("I"))
+            self._sorted_terms = None
+
+        return term_id
+
+    def _append(self, doc_id, term_ids):
+        ordinal = len(self._doc_ids)
+        frequencies = Counter(term_ids)
+        frequencies.pop(FIELD_GAP, None)
+
+        # Ordinals only grow, so postings stay sorted
+        for term_id, frequency in frequencies.items():
+            self._postings[term_id].append(ordinal)
+            self._frequencies[term_id].append(frequency)
+
+        length = sum(frequencies.values())
+        self._doc_ids.append(doc_id)
+        self._doc_terms.append(term_ids)
+        self._lengths.append(length)
+        self._ordinals[doc_id] = ordinal
+        self._total_length += length
+
+    def _parse(self, query):
+        terms = []
+        phrases = []
+
+        for phrase, word in QUERY_PATTERN.findall(query):
+            if phrase:
+                tokens = tokenize(phrase)
+                phrase_ids = [self._terms.get(token) for token in tokens]
+
+                # A phrase with unknown words can't match any document
+                if None in phrase_ids:
+                    return None
+
+                if phrase_ids:
+                    phrases.append(phrase_ids)
+                continue
+
+            tokens = tokenize(word)
+            if word.endswith("*") and tokens:
+                terms.extend(self._expand_prefix(tokens.pop()))
+
+            terms.extend(self._terms[token] for token in tokens if token in self._terms)
+
+        return terms, phrases
+
+    def _expand_prefix(self, prefix):
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self._terms)
+
+        expansions = []
+        start = bisect_left(self._sorted_terms, prefix)
+
+        for term in islice(self._sorted_terms, start, None):
+            if not term.startswith(prefix) or len(expansions) == MAX_PREFIX_EXPANSIONS:
+                break
+
+            expansions.append(self._terms[term])
+
+        return expansions
+
+    def _score(self, term_ids):
+        scores = defaultdict(float)
+
+        documents = len(self._ordinals)
+        average_length = self._total_length / documents or 1.0
+
+        for term_id in term_ids:
+            postings = self._postings[term_id]
+            frequencies = self._frequencies[term_id]
+
+            # Tombstones are counted until compaction, which is close enough
+            document_frequency = len(postings)
+            idf = math.log(
+                1 + (documents - document_frequency + 0.5) / (document_frequency + 0.5)
+            )
+
+            for ordinal, frequency in zip(postings, frequencies):
+                if self._doc_ids[ordinal] is None:
+                    continue
+
+                length_norm = (
+                    1 - self.b + self.b * self._lengths[ordinal] / average_length
+                )
+                scores[ordinal] += (
+                    idf
+                    * frequency
+                    * (self.k1 + 1)
+                    / (frequency + self.k1 * length_norm)
+                )
+
+        return scores
+
+    def _has_phrase(self, ordinal, phrase):
+        term_ids = self._doc_terms[ordinal]
+        size = len(phrase)
+
+        for start in range(len(term_ids) - size + 1):
+            if (
+                term_ids[start] == phrase[0]
+                and list(term_ids[start : start + size]) == phrase
+            ):
+                return True
+
+        return False
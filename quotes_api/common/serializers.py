@@ -0,0 +1,137 @@
+"""Common serialization utilities file. Shared schema instances and compiled dumpers."""
+
+from functools import lru_cache
+
+from marshmallow import fields
+
+# Marshmallow fields the compiler knows how to inline, and the expression that
+# serializes a value that is not None. Subclasses like URL and Email dump as strings.
+CONVERTERS = [
+    (fields.String, "str({})"),
+    (fields.Integer, "int({})"),
+    (fields.Float, "float({})"),
+    (fields.Boolean, "bool({})"),
+    (fields.DateTime, "{}.isoformat()"),
+]
+
+
+def get_schema(schema_class, **kwargs):
+    """
+    Get a shared instance of a schema.
+
+    Schemas hold no state between dumps and loads, so one instance per set of options
+    is reused instead of building the fields of a new schema on every request.
+    """
+
+    options = tuple(
+        sorted(
+            (name, tuple(value) if isinstance(value, list) else value)
+            for name, value in kwargs.items()
+        )
+    )
+
+    return _get_schema(schema_class, options)
+
+
+@lru_cache(maxsize=None)
+def _get_schema(schema_class, options):
+    return schema_class(**dict(options))
+
+
+def _converter(field, value):
+    if isinstance(field, fields.DateTime) and field.format not in (None, "iso"):
+        raise TypeError(f"Unsupported date time format '{field.format}'")
+
+    if isinstance(field, fields.Number) and field.as_string:
+        raise TypeError("Unsupported number dumped as string")
+
+    if isinstance(field, fields.List):
+        item = _converter(field.inner, "item")
+        return f"[None if item is None else {item} for item in {value}]"
+
+    for field_class, expression in CONVERTERS:
+        if isinstance(field, field_class):
+            return expression.format(value)
+
+    raise TypeError(f"Unsupported field '{type(field).__name__}'")
+
+
+def compile_serializer(schema_class, document_class, **kwargs):
+    """
+    Generate a function that dumps raw mongodb documents like a schema would.
+
+    The function takes the dictionaries returned by "as_pymongo" querysets and returns
+    the same records as dumping the matching mongoengine documents with the schema,
+    without building documents or dispatching on every field of every record. Unset
+    fields dump their model default or None, like documents do.
+
+    Raises TypeError for schemas with fields that can't be compiled, like nested ones.
+    """
+
+    schema = schema_class(**kwargs)
+    namespace = {}
+    lines = [
+        "def dump(documents):",
+        "    records = []",
+        "    for document in documents:",
+        "        get = document.get",
+    ]
+    record = []
+
+    for number, (name, field) in enumerate(schema.dump_fields.items()):
+        attribute = field.attribute or name
+        model_field = document_class._fields.get(attribute)
+
+        if model_field is None:
+            raise TypeError(f"Field '{attribute}' is not a field of the document")
+
+        value = f"value_{number}"
+        lines.append(f"        {value} = get({model_field.db_field!r})")
+
+        # Documents replace unset fields with their default
+        if model_field.default is not None and not model_field.null:
+            default = model_field.default
+            namespace[f"default_{number}"] = (
+                default if callable(default) else lambda default=default: default
+            )
+            lines.append(f"        if {value} is None:")
+            lines.append(f"            {value} = default_{number}()")
+
+        key = field.data_key or name
+        record.append(
+            f"{key!r}: None if {value} is None else {_converter(field, value)}"
+        )
+
+    lines.append("        records.append({" + ", ".join(record) + "})")
+    lines.append("    return records")
+
+    exec(
+        compile("\n".join(lines), f"<{schema_class.__name__} serializer>", "exec"),
+        namespace,
+    )
+    return namespace["dump"]
+
+
+_SERIALIZERS = {}
+
+
+def register_serializer(schema_class, document_class, **kwargs):
+    """Compile the serializer used by "dump_records" for a schema."""
+
+    _SERIALIZERS[schema_class] = compile_serializer(
+        schema_class, document_class, **kwargs
+    )
+
+
+def dump_records(schema_class, items):
+    """
+    Dump a list of items with a schema.
+
+    Raw mongodb documents go through the compiled serializer of the schema, and
+    everything else through a shared schema instance.
+    """
+
+    if items and isinstance(items[0], dict) and schema_class in _SERIALIZERS:
+        return _SERIALIZERS[schema_class](items)
+
+    return get_schema(schema_class, many=True).dump(items)
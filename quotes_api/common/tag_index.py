@@ -0,0 +1,425 @@
+"""Common tag index file. In-process tag bitmaps of documents and tag expressions."""
+
+import re
+from collections import namedtuple
+
+TagCount = namedtuple("TagCount", ["tag", "count"])
+
+TOKEN_PATTERN = re.compile(r"\s*(?:([,|!()])|([^,|!()]+))")
+
+# Ordinals per bitmap block
+BLOCK_SHIFT = 12
+BLOCK_MASK = (1 << BLOCK_SHIFT) - 1
+
+
+def parse_tag_expression(text):
+    """
+    Parses a tag expression into a tree of tuples.
+
+    Tags are joined with "," (AND) and "|" (OR), negated with "!" (NOT) and grouped
+    with parentheses. AND binds tighter than OR, so "a,b|c" is "(a,b)|c". Nodes are
+    ("tag", name), ("not", node), ("and", [nodes]) and ("or", [nodes]).
+
+    Raises ValueError for invalid expressions.
+    """
+
+    tokens = []
+    position = 0
+    text = text.strip()
+
+    while position < len(text):
+        match = TOKEN_PATTERN.match(text, position)
+        operator, tag = match.groups()
+        tokens.append(operator or tag.strip())
+        position = match.end()
+
+    expression, position = _parse_binary(tokens, 0, "|")
+
+    if position != len(tokens):
+        raise ValueError(f"Unexpected '{tokens[position]}' in tag expression")
+
+    return expression
+
+
+def _parse_binary(tokens, position, operator):
+    # "|" operands are "," expressions, and "," operands are unary expressions
+    operands = []
+
+    while True:
+        if operator == "|":
+            operand, position = _parse_binary(tokens, position, ",")
+        else:
+            operand, position = _parse_unary(tokens, position)
+
+        operands.append(operand)
+
+        if position < len(tokens) and tokens[position] == operator:
+            position += 1
+        else:
+            break
+
+    if len(operands) == 1:
+        return operands[0], position
+
+    return ("or" if operator == "|" else "and", operands), position
+
+
+def _parse_unary(tokens, position):
+    if position == len(tokens):
+        raise ValueError("Unexpected end of tag expression")
+
+    token = tokens[position]
+
+    if token == "!":
+        operand, position = _parse_unary(tokens, position + 1)
+        return ("not", operand), position
+
+    if token == "(":
+        operand, position = _parse_binary(tokens, position + 1, "|")
+
+        if position == len(tokens) or tokens[position] != ")":
+            raise ValueError("Unbalanced parentheses in tag expression")
+
+        return operand, position + 1
+
+    if token in (",", "|", ")"):
+        raise ValueError(f"Unexpected '{token}' in tag expression")
+
+    return ("tag", token), position + 1
+
+
+def plain_tags(expression, kind):
+    """Get the tags of an AND or OR node of plain tags, or None for other nodes."""
+
+    if expression[0] != kind or any(node[0] != "tag" for node in expression[1]):
+        return None
+
+    return [node[1] for node in expression[1]]
+
+
+def tag_expression_query(expression, field="tags"):
+    """Translates a tag expression into a mongodb query on a list field."""
+
+    kind, operand = expression
+
+    if kind == "tag":
+        return {field: operand}
+
+    if kind == "not":
+        if operand[0] == "tag":
+            return {field: {"$ne": operand[1]}}
+
+        return {"$nor": [tag_expression_query(operand, field)]}
+
+    # Plain tags can use the multikey index operators
+    tags = plain_tags(expression, kind)
+    if tags is not None:
+        return {field: {"$all" if kind == "and" else "$in": tags}}
+
+    queries = [tag_expression_query(node, field) for node in operand]
+    return {"$and" if kind == "and" else "$or": queries}
+
+
+class Bitmap:
+    """
+    Set of ordinals stored as blocks of 4096 bits, keyed by block number.
+
+    Only blocks with ordinals are kept, so updates touch one small block and set
+    operations go block by block. Sizes add up the popcounts of the blocks, and pages
+    skip whole blocks by their popcounts, so skipping costs the number of blocks and
+    not the number of skipped ordinals.
+    """
+
+    __slots__ = ("blocks",)
+
+    def __init__(self, blocks=None):
+        self.blocks = {} if blocks is None else blocks
+
+    def add(self, ordinal):
+        block = ordinal >> BLOCK_SHIFT
+        self.blocks[block] = self.blocks.get(block, 0) | (1 << (ordinal & BLOCK_MASK))
+
+    def discard(self, ordinal):
+        block = ordinal >> BLOCK_SHIFT
+        bits = self.blocks.get(block, 0) & ~(1 << (ordinal & BLOCK_MASK))
+
+        if bits:
+            self.blocks[block] = bits
+        else:
+            self.blocks.pop(block, None)
+
+    def copy(self):
+        return Bitmap(dict(self.blocks))
+
+    def __bool__(self):
+        return bool(self.blocks)
+
+    def __len__(self):
+        return sum(bits.bit_count() for bits in self.blocks.values())
+
+    def __and__(self, other):
+        small, large = sorted((self.blocks, other.blocks), key=len)
+        blocks = {}
+
+        for block, bits in small.items():
+            bits &= large.get(block, 0)
+
+            if bits:
+                blocks[block] = bits
+
+        return Bitmap(blocks)
+
+    def __or__(self, other):
+        blocks = dict(self.blocks)
+
+        for block, bits in other.blocks.items():
+            blocks[block] = blocks.get(block, 0) | bits
+
+        return Bitmap(blocks)
+
+    def __sub__(self, other):
+        blocks = {}
+
+        for block, bits in self.blocks.items():
+            bits &= ~other.blocks.get(block, 0)
+
+            if bits:
+                blocks[block] = bits
+
+        return Bitmap(blocks)
+
+    def select(self, skip=0, limit=None):
+        """Get the ordinals in order, skipping the first ones."""
+
+        ordinals = []
+
+        if limit == 0:
+            return ordinals
+
+        for block in sorted(self.blocks):
+            bits = self.blocks[block]
+            count = bits.bit_count()
+
+            # Skip whole blocks by their popcount
+            if skip >= count:
+                skip -= count
+                continue
+
+            base = block << BLOCK_SHIFT
+
+            while bits:
+                low_bit = bits & -bits
+                bits ^= low_bit
+
+                if skip:
+                    skip -= 1
+                    continue
+
+                ordinals.append(base + low_bit.bit_length() - 1)
+
+                if limit is not None and len(ordinals) == limit:
+                    return ordinals
+
+        return ordinals
+
+
+class TagIndex:
+    """
+    Tag and author filter engine over a set of documents.
+
+    Documents get integer ordinals in the order of their ids, and every tag and
+    author keeps a block bitmap of the ordinals of its documents. Tag expressions
+    and author filters are evaluated with set operations on the bitmaps, so the
+    count of a result is its popcount and its ids come out in id order, ready to
+    paginate.
+
+    Bitmaps and tag counts are updated incrementally as documents are added and
+    removed. Removed ordinals are tombstoned and compacted away in bulk. Sorted tag
+    lists are built lazily and kept until the next change.
+    """
+
+    def __init__(self):
+        self._ordinals = {}
+        self._doc_ids = []
+        self._doc_tags = []
+        self._doc_authors = []
+        self._last_id = None
+        self._live = Bitmap()
+        self._removed = 0
+
+        self._bitmaps = {}
+        self._author_bitmaps = {}
+        self._counts = {}
+        self._sorted = {}
+
+    def __len__(self):
+        return len(self._ordinals)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._ordinals
+
+    def add(self, doc_id, tags, author=None):
+        """Index the tags and author of a document, replacing any previous ones."""
+
+        ordinal = self._ordinals.get(doc_id)
+
+        # Updates keep their ordinal, only new documents can break the id order
+        if ordinal is not None:
+            self._unset(ordinal)
+            self._set(ordinal, frozenset(tags), author)
+            self._sorted.clear()
+            return
+
+        self._set(self._append(doc_id), frozenset(tags), author)
+        self._sorted.clear()
+
+        # Ids mostly arrive in order, renumber when a new one doesn't
+        if self._last_id is not None and doc_id < self._last_id:
+            self.compact()
+        else:
+            self._last_id = doc_id
+
+    def remove(self, doc_id):
+        """Remove a document from the index. Missing documents are ignored."""
+
+        ordinal = self._ordinals.pop(doc_id, None)
+        if ordinal is None:
+            return
+
+        self._unset(ordinal)
+        self._live.discard(ordinal)
+        self._doc_ids[ordinal] = None
+        self._removed += 1
+        self._sorted.clear()
+
+        # Compact when tombstones are a quarter of the ordinals
+        if self._removed > 1024 and self._removed * 4 > len(self._doc_ids):
+            self.compact()
+
+    def compact(self):
+        """Renumber the documents in id order, dropping removed ordinals."""
+
+        documents = sorted(
+            (doc_id, self._doc_tags[ordinal], self._doc_authors[ordinal])
+            for doc_id, ordinal in self._ordinals.items()
+        )
+
+        self.__init__()
+
+        for doc_id, tags, author in documents:
+            self._set(self._append(doc_id), tags, author)
+            self._last_id = doc_id
+
+    def count(self, tag):
+        """Get the number of documents with a tag."""
+
+        return self._counts.get(tag, 0)
+
+    def tags(self, by="tag", descending=False):
+        """
+        Get the tag counts of every tag, sorted by tag or by count.
+
+        Ties in the count are sorted by tag. The list is shared, don't modify it.
+        """
+
+        key = (by, descending)
+
+        if key not in self._sorted:
+            if by == "count":
+                sign = -1 if descending else 1
+                tag_counts = sorted(
+                    self._counts.items(), key=lambda item: (sign * item[1], item[0])
+                )
+            else:
+                tag_counts = sorted(self._counts.items(), reverse=descending)
+
+            self._sorted[key] = [TagCount(*tag_count) for tag_count in tag_counts]
+
+        return self._sorted[key]
+
+    def match(self, expression=None, author=None):
+        """Get the bitmap of the documents matching a tag expression and an author."""
+
+        bitmap = self._live.copy()
+
+        if author is not None:
+            bitmap &= self._author_bitmaps.get(author, Bitmap())
+
+        if expression is not None and bitmap:
+            bitmap &= self._evaluate(expression)
+
+        return bitmap
+
+    def doc_ids(self, bitmap, skip=0, limit=None):
+        """Get the ids of the documents in a bitmap in id order, skipping some."""
+
+        return [self._doc_ids[ordinal] for ordinal in bitmap.select(skip, limit)]
+
+    def _evaluate(self, expression):
+        kind, operand = expression
+
+        if kind == "tag":
+            return self._bitmaps.get(operand, Bitmap())
+
+        if kind == "not":
+            return self._live - self._evaluate(operand)
+
+        bitmaps = [self._evaluate(node) for node in operand]
+
+        if kind == "or":
+            bitmap = Bitmap()
+            for other in bitmaps:
+                bitmap |= other
+
+            return bitmap
+
+        # Start from the bitmap with the fewest blocks, intersections only shrink it
+        bitmaps.sort(key=lambda bitmap: len(bitmap.blocks))
+        bitmap = bitmaps[0]
+        for other in bitmaps[1:]:
+            bitmap &= other
+
+        return bitmap
+
+    def _append(self, doc_id):
+        ordinal = len(self._doc_ids)
+
+        self._ordinals[doc_id] = ordinal
+        self._doc_ids.append(doc_id)
+        self._doc_tags.append(frozenset())
+        self._doc_authors.append(None)
+        self._live.add(ordinal)
+
+        return ordinal
+
+    def _set(self, ordinal, tags, author):
+        for tag in tags:
+            self._bitmaps.setdefault(tag, Bitmap()).add(ordinal)
+            self._counts[tag] = self._counts.get(tag, 0) + 1
+
+        if author is not None:
+            self._author_bitmaps.setdefault(author, Bitmap()).add(ordinal)
+
+        self._doc_tags[ordinal] = tags
+        self._doc_authors[ordinal] = author
+
+    def _unset(self, ordinal):
+        for tag in self._doc_tags[ordinal]:
+            self._counts[tag] -= 1
+
+            if self._counts[tag] == 0:
+                del self._counts[tag]
+                del self._bitmaps[tag]
+            else:
+                self._bitmaps[tag].discard(ordinal)
+
+        author = self._doc_authors[ordinal]
+
+        if author is not None:
+            self._author_bitmaps[author].discard(ordinal)
+
+            if not self._author_bitmaps[author]:
+                del self._author_bitmaps[author]
+
+        self._doc_tags[ordinal] = frozenset()
+        self._doc_authors[ordinal] = None
@@ -20,6 +20,90 @@ class Config(object):
     JWT_REFRESH_TOKEN_EXPIRES = 30 * 24 * 60 * 60  # 30 days in seconds
     JWT_ERROR_MESSAGE_KEY = "message"
 
+    # Token Revocation Configuration
+    # "allowlist" stores every issued token, "denylist" only the revoked ones, checked
+    # against an in-memory Bloom filter so unrevoked tokens skip the database
+    TOKEN_REVOCATION_MODE = os.getenv("TOKEN_REVOCATION_MODE", "allowlist")
+    TOKEN_REVOCATION_FILTER_CAPACITY = 100000
+    TOKEN_REVOCATION_FILTER_ERROR_RATE = 0.001
+
+    # Token Revocation Cache Configuration
+    # Seconds a cached revocation state can be served before reading it again
+    REVOCATION_CACHE_MAXSIZE = 10000
+    REVOCATION_CACHE_TTL = 30
+
+    # Expired Token Pruning Configuration
+    # Seconds between background prunes, disabled with zero. Expired tokens can also be
+    # pruned with "flask auth prune", or by mongodb with the TOKEN_TTL_INDEX variable.
+    TOKEN_PRUNE_INTERVAL = int(os.getenv("TOKEN_PRUNE_INTERVAL", "0"))
+
+    # User Identity Cache Configuration
+    # Disabled by default, set a few seconds to skip user lookups between requests
+    USER_CACHE_MAXSIZE = 1024
+    USER_CACHE_TTL = 0
+
+    # Quote Count Cache Configuration
+    QUOTE_COUNT_CACHE_MAXSIZE = 1024
+    QUOTE_COUNT_CACHE_TTL = 5 * 60  # 5 minutes in seconds
+
+    # Quote Search Configuration
+    # Use "index" to rank searches with the in-process inverted index
+    SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "mongo")
+    SEARCH_INDEX_SNAPSHOT = os.getenv("SEARCH_INDEX_SNAPSHOT")
+
+    # Random Quotes Configuration
+    RANDOM_QUOTES_MAX_COUNT = 50
+
+    # Batch Quotes Configuration
+    QUOTE_BATCH_MAX_IDS = 100
+
+    # Bulk Quotes Configuration
+    # Quotes validated and written per bulk write, and errors kept in the report
+    QUOTE_BULK_CHUNK_SIZE = 1000
+    QUOTE_BULK_MAX_ERRORS = 100
+
+    # Quote Export Configuration
+    # Quotes read from the database and serialized per streamed chunk
+    QUOTE_EXPORT_BATCH_SIZE = 1000
+
+    # Generation Counters Configuration
+    # Seconds between reloads, to see writes from processes that aren't on the bus
+    GENERATIONS_REFRESH = 60
+
+    # Response Cache Configuration
+    # Use "mongo" to share cached responses between several workers
+    RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "local")
+    RESPONSE_CACHE_MAXSIZE = 1024
+    RESPONSE_CACHE_TTL = 60
+    RESPONSE_CACHE_MAX_AGE = 0
+
+    # Metrics Configuration
+    # Prometheus metrics and Server-Timing headers of the requests, kept per process
+    # Off unless opted in, the metrics endpoint isn't authenticated and both expose
+    # internals. Keep the endpoint behind an internal network or an allowlist.
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() == "true"
+    METRICS_PATH = "/metrics"
+    SERVER_TIMING = os.getenv("SERVER_TIMING", "false").lower() == "true"
+
+    # Query Profiler Configuration
+    # Profile every request, or only the ones sending "QUERY_PROFILER_HEADER"
+    QUERY_PROFILER_ENABLED = (
+        os.getenv("QUERY_PROFILER_ENABLED", "false").lower() == "true"
+    )
+    QUERY_PROFILER_ALLOW_HEADER = False
+    QUERY_PROFILER_SLOW_MS = 100
+    # Use "all" to find collection scans on every query, not only the slow ones
+    QUERY_PROFILER_EXPLAIN = "slow"
+    QUERY_PROFILER_REPEATS = 5
+    # Most queries per request by endpoint, like {"api.quotes": 4}
+    QUERY_BUDGETS = {}
+    QUERY_BUDGET_DEFAULT = None
+    QUERY_BUDGET_STRICT = False
+
+    # Invalidation Bus Configuration
+    # Use "mongo" to broadcast invalidations between several workers
+    INVALIDATION_BUS_BACKEND = os.getenv("INVALIDATION_BUS_BACKEND", "local")
+
 
 class ProductionConfig(Config):
     """Production environment configuration class."""
@@ -39,6 +123,13 @@ class DevelopmentConfig(Config):
     ENV = "development"
     DEBUG = True
 
+    # Query Profiler Configuration
+    QUERY_PROFILER_ALLOW_HEADER = True
+
+    # Metrics Configuration
+    METRICS_ENABLED = True
+    SERVER_TIMING = True
+
     # Mongoengine Configuration
     MONGODB_DB = os.getenv("MONGODB_DB")
     MONGODB_HOST = os.getenv("MONGODB_HOST")
@@ -57,6 +148,23 @@ class TestingConfig(Config):
     TESTING = True
     SECRET_KEY = "testing"
 
+    # Metrics Configuration
+    METRICS_ENABLED = True
+    SERVER_TIMING = True
+
+    # Query Profiler Configuration
+    # Tests fail when a request goes over its query budget
+    QUERY_PROFILER_ENABLED = True
+    QUERY_BUDGET_STRICT = True
+    QUERY_BUDGETS = {
+        # User, and an insert for each token
+        "auth.user_login": 3,
+        # Token revocation check, user and token insert
+        "auth.token_refresh": 3,
+        # Token revocation check, generations load, count or tag index build, page
+        "api.quotes": 4,
+    }
+
     # Mongoengine Configuration
     MONGODB_DB = "test_quotes_database"
     MONGODB_HOST = "mongo"
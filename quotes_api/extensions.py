@@ -11,11 +11,25 @@ from flask_cors import CORS
 from passlib.context import CryptContext
 
 
-from quotes_api.common import APISpecExt
+from quotes_api.common import (
+    APISpecExt,
+    CacheRegistry,
+    InvalidationBus,
+    ResponseCache,
+    GenerationCounter,
+    Metrics,
+    QueryProfiler,
+)
 
 odm = MongoEngine()
 jwt = JWTManager()
 ma = Marshmallow()
 cors = CORS()
 apispec = APISpecExt()
+caches = CacheRegistry()
+bus = InvalidationBus()
+generations = GenerationCounter(bus)
+response_cache = ResponseCache()
+metrics = Metrics()
+query_profiler = QueryProfiler()
 pwd_context = CryptContext(schemes=["sha256_crypt"])
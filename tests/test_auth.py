@@ -3,11 +3,16 @@ Tests for the authentication resource.
 """
 
 import secrets
+from datetime import datetime, timedelta
 
 from faker import Faker
 from flask import url_for
 
 from quotes_api.common import HttpStatus
+from quotes_api.common.bloom import BloomFilter
+from quotes_api.extensions import caches, generations
+from quotes_api.auth import helpers
+from quotes_api.auth.helpers import is_token_revoked, lazy_user, prune_database
 
 fake = Faker()
 
@@ -17,6 +22,7 @@ def test_user_login(client, new_admin):
 
     # Create the required data
     data = {"username": new_admin.username, "password": "admin"}
+    generation = generations.get("tokens")
 
     # Perform request
     login_url = url_for("auth.user_login")
@@ -32,6 +38,9 @@ def test_user_login(client, new_admin):
     assert isinstance(access_token, str)
     assert isinstance(refresh_token, str)
 
+    # New tokens don't invalidate the cached revocation states
+    assert generations.get("tokens") == generation
+
 
 def test_user_signup(client):
     """Tests the user signup operation."""
@@ -147,3 +156,152 @@ def test_create_permanent_token(client, admin_headers):
     res = client.get(users_url, headers=headers, query_string=query_parameters)
 
     assert res.status_code == HttpStatus.OK_200.value
+
+
+def test_lazy_user_lookup(app, new_user):
+    """Tests the current user is only fetched on first access."""
+
+    user = lazy_user(new_user.username)
+
+    assert user.username == new_user.username
+    assert user.roles == new_user.roles
+    assert lazy_user("missing-user")._get_current_object() is None
+
+
+def test_deleted_user_tokens(
+    app, client, admin_headers, new_user, user_model, password_hasher
+):
+    """Tests the tokens of a deleted user stop working, in both revocation modes."""
+
+    quotes_url = url_for("api.quotes")
+    other_user = user_model(
+        username="other-user",
+        email="other-user@email.com",
+        password=password_hasher.hash("user"),
+    )
+    other_user.save()
+
+    for mode, user in [("allowlist", new_user), ("denylist", other_user)]:
+        app.config["TOKEN_REVOCATION_MODE"] = mode
+
+        data = {"username": user.username, "password": "user"}
+        res = client.post(url_for("auth.user_login"), json=data)
+        headers = {"authorization": f"Bearer {res.get_json()['access_token']}"}
+
+        # The token is cached as not revoked before the user is deleted
+        res = client.get(quotes_url, headers=headers)
+        assert res.status_code == HttpStatus.OK_200.value
+
+        user_url = url_for("auth.user_by_id", user_id=str(user.id))
+        res = client.delete(user_url, headers=admin_headers)
+        assert res.status_code == HttpStatus.NO_CONTENT_204.value
+
+        res = client.get(quotes_url, headers=headers)
+        assert res.status_code == HttpStatus.UNAUTHORIZED_401.value
+
+    # Tokens of the other users are still valid
+    res = client.get(quotes_url, headers=admin_headers)
+    assert res.status_code == HttpStatus.OK_200.value
+
+
+def test_revocation_lookup_failure(app, monkeypatch, new_access_token):
+    """Tests tokens are revoked when their lookup fails, without caching it."""
+
+    decoded_token = {"jti": new_access_token.jti, "sub": new_access_token.user.username}
+
+    class FailingTokens:
+        DoesNotExist = helpers.TokenBlacklist.DoesNotExist
+        objects = None
+
+    monkeypatch.setattr(helpers, "TokenBlacklist", FailingTokens)
+    assert is_token_revoked(decoded_token)
+    assert len(caches.get_cache("revocation")) == 0
+
+    # The next lookup reaches the database again
+    monkeypatch.undo()
+    assert not is_token_revoked(decoded_token)
+
+
+def test_prune_database(app, new_user, token_blacklist_model):
+    """Tests expired tokens are pruned, and tokens without expiration are kept."""
+
+    now = datetime.utcnow()
+    expirations = [now - timedelta(days=1), now - timedelta(seconds=1), None]
+    expirations.append(now + timedelta(days=1))
+
+    for number, expires in enumerate(expirations):
+        token_blacklist_model(
+            jti=f"jti_{number}",
+            token_type="access",
+            user=new_user,
+            revoked=False,
+            expires=expires,
+        ).save()
+
+    assert prune_database(now) == 2
+    assert token_blacklist_model.objects.count() == 2
+    assert prune_database(now) == 0
+
+    # The command prunes with the current time
+    res = app.test_cli_runner().invoke(args=["auth", "prune"])
+    assert res.output == "Pruned 0 expired tokens.\n"
+
+
+def test_token_pruner(app, new_access_token):
+    """Tests the pruning scheduler reports the reclaimed tokens."""
+
+    pruner = app.extensions["token_pruner"]
+
+    assert pruner.interval == 0
+    assert pruner.prune() == 1
+    assert (pruner.runs, pruner.reclaimed, pruner.last_reclaimed) == (1, 1, 1)
+
+
+def test_bloom_filter():
+    """Tests bloom filters find every added key and few others."""
+
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+
+    for number in range(1000):
+        bloom.add(f"jti-{number}")
+
+    assert len(bloom) == 1000
+    assert all(f"jti-{number}" in bloom for number in range(1000))
+    assert sum(f"other-{number}" in bloom for number in range(1000)) < 50
+
+
+def test_denylist_revocation(app, client, new_admin, token_blacklist_model):
+    """Tests only revoked tokens are stored in the denylist revocation mode."""
+
+    app.config["TOKEN_REVOCATION_MODE"] = "denylist"
+
+    data = {"username": new_admin.username, "password": "admin"}
+    res = client.post(url_for("auth.user_login"), json=data)
+    assert res.status_code == HttpStatus.OK_200.value
+    assert token_blacklist_model.objects.count() == 0
+
+    headers = {"authorization": f"Bearer {res.get_json()['access_token']}"}
+    res = client.get(url_for("auth.users"), headers=headers)
+    assert res.status_code == HttpStatus.OK_200.value
+
+    # Tokens missing from the filter aren't even looked up
+    assert len(caches.get_cache("revocation")) == 0
+
+    bloom = app.extensions["revocation_filter"].bloom
+
+    res = client.delete(url_for("auth.revoke_access_token"), headers=headers)
+    assert res.status_code == HttpStatus.NO_CONTENT_204.value
+    assert token_blacklist_model.objects.get().revoked
+
+    # Revocations are added in place, without rebuilding the filter
+    jti = token_blacklist_model.objects.get().jti
+    assert app.extensions["revocation_filter"].might_contain(jti)
+    assert app.extensions["revocation_filter"].bloom is bloom
+
+    # Missed generations rebuild it
+    generations.bump("tokens")
+    app.extensions["revocation_filter"].might_contain(jti)
+    assert app.extensions["revocation_filter"].bloom is not bloom
+
+    res = client.get(url_for("auth.users"), headers=headers)
+    assert res.status_code == HttpStatus.UNAUTHORIZED_401.value
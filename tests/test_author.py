@@ -0,0 +1,64 @@
+"""
+Test for the author resource.
+"""
+
+from flask import url_for
+
+from quotes_api.common import HttpStatus
+
+
+def test_get_all_authors(client, user_headers, quote_model):
+    """Tests the get all authors operation."""
+
+    for number, author_name in enumerate(["First Author", "Second Author"] * 2):
+        quote = quote_model(quote_text=f"Quote {number}.", author_name=author_name)
+        quote.save()
+
+    authors_url = url_for("api.authors")
+    query_parameters = {"page": "1", "per_page": "1", "sort_order": "desc"}
+    res = client.get(authors_url, headers=user_headers, query_string=query_parameters)
+    data = res.get_json()
+
+    assert res.status_code == HttpStatus.OK_200.value
+    assert data["records"] == [{"author_name": "Second Author", "quote_count": 2}]
+    assert data["meta"]["total_records"] == 2
+    assert data["meta"]["total_pages"] == 2
+
+
+def test_author_counts_follow_quote_writes(client, admin_headers, new_quote):
+    """Tests the authors view is updated when quotes are created, updated and deleted."""
+
+    authors_url = url_for("api.authors")
+
+    # Materialize the authors view
+    res = client.get(authors_url, headers=admin_headers)
+    assert res.get_json()["records"] == [{"author_name": "Author", "quote_count": 1}]
+
+    # Create a quote from a new author
+    data = {"quote_text": "Post quote.", "author_name": "Post Author"}
+    res = client.post(url_for("api.quotes"), headers=admin_headers, json=data)
+    assert res.status_code == HttpStatus.CREATED_201.value
+
+    # Move the first quote to the new author
+    quote_url = url_for("api.quote", quote_id=new_quote.id)
+    res = client.patch(
+        quote_url, headers=admin_headers, json=data | {"quote_text": "Patch quote."}
+    )
+    assert res.status_code == HttpStatus.NO_CONTENT_204.value
+
+    res = client.get(authors_url, headers=admin_headers)
+    assert res.get_json()["records"] == [
+        {"author_name": "Post Author", "quote_count": 2}
+    ]
+
+    # Keyset pagination seeks on the author name
+    query_parameters = {"cursor": "", "per_page": "1"}
+    res = client.get(authors_url, headers=admin_headers, query_string=query_parameters)
+    assert res.get_json()["meta"]["cursors"]["next"] is None
+
+    # Delete the quote
+    res = client.delete(quote_url, headers=admin_headers)
+    res = client.get(authors_url, headers=admin_headers)
+    assert res.get_json()["records"] == [
+        {"author_name": "Post Author", "quote_count": 1}
+    ]
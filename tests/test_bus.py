@@ -0,0 +1,75 @@
+"""
+Tests for the invalidation bus.
+"""
+
+from quotes_api.common.bus import MongoBackend
+from quotes_api.extensions import bus
+
+
+def test_publish_to_subscribers(app):
+    """Tests messages reach the subscribers of the publishing worker."""
+
+    messages = []
+    bus.subscribe("test", messages.append)
+    bus.publish("test", {"jti": "jti_example"})
+
+    assert messages == [{"jti": "jti_example"}]
+
+
+def test_deliver_from_other_workers(app):
+    """Tests messages from other workers are delivered, and our own are skipped."""
+
+    messages = []
+    bus.subscribe("test", messages.append)
+
+    state = app.extensions["invalidation_bus"]
+    state.deliver("test", {"jti": "own"}, state.origin)
+    state.deliver("test", {"jti": "remote"}, "another-worker:1")
+
+    assert messages == [{"jti": "remote"}]
+
+
+class FakeTailableCursor:
+    """Cursor that yields its events once, and then dies."""
+
+    def __init__(self, events):
+        self.events = events
+        self.alive = True
+
+    def __iter__(self):
+        yield from self.events
+        self.alive = False
+
+
+def test_resume_in_insertion_order(app):
+    """Tests resumed cursors deliver the messages after the last delivered one."""
+
+    backend = MongoBackend(app)
+    messages = []
+
+    def deliver(channel, message, origin):
+        messages.append(message["jti"])
+
+    # Ids of different workers aren't ordered, the last id is larger than the next one
+    events = [
+        {
+            "_id": number,
+            "channel": "test",
+            "message": {"jti": str(number)},
+            "origin": "",
+        }
+        for number in [1, 5, 3, 2]
+    ]
+
+    backend.last_id = 5
+    backend._follow(FakeTailableCursor(events), deliver)
+
+    assert messages == ["3", "2"]
+    assert backend.last_id == 2
+
+    # Messages are all newer when the last delivered one was overwritten
+    messages.clear()
+    backend.last_id = 4
+    backend._follow(FakeTailableCursor(events), deliver)
+
+    assert messages == ["1", "5", "3", "2"]
@@ -0,0 +1,77 @@
+"""
+Tests for the in-process caches.
+"""
+
+from quotes_api.common import TTLCache
+
+
+class FakeTimer:
+    """Controllable clock for cache expiration."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_cache_expiration():
+    """Tests entries expire after their time to live."""
+
+    timer = FakeTimer()
+    cache = TTLCache(maxsize=10, ttl=30, timer=timer)
+
+    cache.set("default", True)
+    cache.set("short", True, ttl=5)
+    cache.set("expired", True, ttl=-1)
+
+    assert cache.get("default") is True
+    assert cache.get("short") is True
+    assert "expired" not in cache
+
+    # Entries can't outlive the cache time to live
+    cache.set("long", True, ttl=300)
+
+    timer.now = 10
+    assert cache.get("short") is None
+    assert cache.get("default") is True
+
+    timer.now = 31
+    assert cache.get("default") is None
+    assert cache.get("long") is None
+
+
+def test_cache_eviction():
+    """Tests the least recently used entry is evicted when the cache is full."""
+
+    cache = TTLCache(maxsize=2, ttl=30)
+
+    cache.set("first", 1)
+    cache.set("second", 2)
+
+    # Use the first entry so the second one becomes the least recently used
+    cache.get("first")
+    cache.set("third", 3)
+
+    assert cache.get("first") == 1
+    assert cache.get("second") is None
+    assert cache.get("third") == 3
+    assert len(cache) == 2
+
+
+def test_cache_stats():
+    """Tests hits and misses are counted."""
+
+    cache = TTLCache(maxsize=10, ttl=30)
+
+    cache.set("revoked", False)
+    cache.get("revoked")
+    cache.get("missing")
+    cache.delete("revoked")
+    cache.get("revoked")
+
+    stats = cache.stats()
+
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+    assert stats["size"] == 0
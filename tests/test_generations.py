@@ -0,0 +1,44 @@
+"""
+Tests for the collection generation counters.
+"""
+
+from flask import url_for
+
+from quotes_api.extensions import generations
+from quotes_api.common import HttpStatus
+
+
+def test_generation_bumps(app, database):
+    """Tests generations grow on bumps and reach every worker through the bus."""
+
+    assert generations.get("quotes") == 0
+
+    generations.bump("quotes")
+    generations.bump("quotes", "users")
+
+    assert generations.get("quotes") == 2
+    assert generations.get("users") == 1
+
+    # Messages from other workers never move a generation backwards
+    bus_state = app.extensions["invalidation_bus"]
+    bus_state.deliver("generations", {"collection": "quotes", "generation": 5})
+    bus_state.deliver("generations", {"collection": "quotes", "generation": 3})
+
+    assert generations.get("quotes") == 5
+
+
+def test_quote_writes_change_etags(client, admin_headers, new_quote):
+    """Tests quote writes bump the quotes generation and the response ETags."""
+
+    quotes_url = url_for("api.quotes")
+    etag = client.get(quotes_url, headers=admin_headers).headers["ETag"]
+    generation = generations.get("quotes")
+
+    data = {"quote_text": "Post quote.", "author_name": "Post Author"}
+    res = client.post(quotes_url, headers=admin_headers, json=data)
+    assert res.status_code == HttpStatus.CREATED_201.value
+    assert generations.get("quotes") == generation + 1
+
+    res = client.get(quotes_url, headers=admin_headers | {"If-None-Match": etag})
+    assert res.status_code == HttpStatus.OK_200.value
+    assert res.get_json()["meta"]["total_records"] == 2
@@ -0,0 +1,89 @@
+"""
+Tests for the request metrics.
+"""
+
+from types import SimpleNamespace
+
+from flask import Flask, g, url_for
+
+from quotes_api.common import HttpStatus
+from quotes_api.common.metrics import Histogram, Metrics, _CommandListener
+
+
+def test_histogram_render():
+    """Tests histograms render cumulative buckets, sums and counts."""
+
+    histogram = Histogram("latency_seconds", "Latency.", ("phase",), buckets=(0.1, 1))
+    histogram.observe(0.05, phase="db")
+    histogram.observe(0.5, phase="db")
+    histogram.observe(2, phase="db")
+
+    lines = histogram.render()
+
+    assert "# TYPE latency_seconds histogram" in lines
+    assert 'latency_seconds_bucket{phase="db",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{phase="db",le="1"} 2' in lines
+    assert 'latency_seconds_bucket{phase="db",le="+Inf"} 3' in lines
+    assert 'latency_seconds_sum{phase="db"} 2.55' in lines
+    assert 'latency_seconds_count{phase="db"} 3' in lines
+
+
+def test_server_timing(client, user_headers, new_quote):
+    """Tests responses break down their time by phase in the Server-Timing header."""
+
+    res = client.get(url_for("api.quotes"), headers=user_headers)
+    assert res.status_code == HttpStatus.OK_200.value
+
+    timings = res.headers["Server-Timing"]
+    phases = [timing.split(";")[0] for timing in timings.split(", ")]
+
+    assert {"auth", "count", "links", "dump", "app"} <= set(phases)
+    assert phases[-1] == "app"
+
+
+def test_command_listener(app):
+    """Tests mongodb commands are timed for the request that sent them."""
+
+    listener = _CommandListener()
+    event = SimpleNamespace(command_name="find", duration_micros=1500)
+
+    with app.test_request_context():
+        listener.succeeded(event)
+        listener.failed(event)
+
+        state = app.extensions["metrics"]
+        assert 'quotes_api_db_command_seconds_count{command="find"} 2' in state.render()
+        assert state.command_errors.values == {("find",): 1}
+        assert g.metrics_timings["db"] == (0.003, 2)
+
+
+def test_metrics_endpoint(client, user_headers, new_quote):
+    """Tests the metrics endpoint serves histograms and cache ratios."""
+
+    client.get(url_for("api.quotes"), headers=user_headers)
+    client.get(url_for("api.quotes"), headers=user_headers)
+
+    res = client.get("/metrics")
+    assert res.status_code == HttpStatus.OK_200.value
+    assert res.mimetype == "text/plain"
+
+    body = res.get_data(as_text=True)
+
+    assert "# TYPE quotes_api_request_seconds histogram" in body
+    assert 'endpoint="api.quotes",method="GET",status="200"' in body
+    assert 'quotes_api_phase_seconds_count{phase="auth"}' in body
+    assert "# TYPE quotes_api_db_command_seconds histogram" in body
+    assert 'quotes_api_cache_hit_ratio{cache="response_quotes"}' in body
+
+
+def test_metrics_opt_in():
+    """Tests metrics and Server-Timing headers are off unless they're enabled."""
+
+    app = Flask("quotes_api")
+    Metrics(app)
+    app.add_url_rule("/ping", "ping", lambda: "pong")
+
+    client = app.test_client()
+
+    assert client.get("/metrics").status_code == HttpStatus.NOT_FOUND_404.value
+    assert "Server-Timing" not in client.get("/ping").headers
@@ -0,0 +1,181 @@
+"""
+Tests for the query profiler.
+"""
+
+from types import SimpleNamespace
+
+import pytest
+from flask import Response, g, url_for
+
+from quotes_api.auth.models import User
+from quotes_api.auth.resources import token
+from quotes_api.extensions import query_profiler
+from quotes_api.common import HttpStatus, QueryBudgetExceeded
+from quotes_api.common.profiler import _ProfilerListener, _find_stages
+
+
+def send_query(listener, request_id, command, duration_micros=500):
+    """Send the monitoring events of a command through a listener."""
+
+    command_name = next(iter(command))
+    listener.started(
+        SimpleNamespace(
+            command_name=command_name,
+            command=command,
+            database_name="test_quotes_database",
+            request_id=request_id,
+        )
+    )
+    listener.succeeded(
+        SimpleNamespace(
+            command_name=command_name,
+            request_id=request_id,
+            duration_micros=duration_micros,
+        )
+    )
+
+
+def test_query_profile(app):
+    """Tests profiled requests count and flag their repeated queries."""
+
+    listener = _ProfilerListener()
+    app.config["QUERY_BUDGET_STRICT"] = False
+
+    with app.test_request_context("/api/v1/quotes"):
+        app.preprocess_request()
+
+        for request_id in range(5):
+            command = {"find": "users", "filter": {"username": f"user-{request_id}"}}
+            send_query(listener, request_id, command)
+
+        command = {"find": "quotes", "filter": {"tags": "life"}, "lsid": {"id": 1}}
+        send_query(listener, 5, command)
+        command = {"find": "quotes", "filter": {"tags": "life"}, "lsid": {"id": 2}}
+        send_query(listener, 6, command)
+
+        report = app.extensions["query_profiler"].endpoints
+        response = app.process_response(Response())
+
+    assert response.headers["X-Query-Count"] == "7"
+    assert report["api.quotes"] == {"requests": 1, "queries": 7, "max_queries": 7}
+
+
+def test_query_analysis(app):
+    """Tests N+1 and repeated queries are told apart by their shapes and values."""
+
+    listener = _ProfilerListener()
+
+    with app.test_request_context():
+        app.preprocess_request()
+
+        for request_id in range(5):
+            command = {"find": "users", "filter": {"username": f"user-{request_id}"}}
+            send_query(listener, request_id, command)
+
+        send_query(listener, 5, {"count": "quotes", "query": {"tags": "life"}})
+        send_query(listener, 6, {"count": "quotes", "query": {"tags": "life"}})
+
+        # Fake queries can't be explained
+        app.config["QUERY_PROFILER_EXPLAIN"] = "slow"
+        report = query_profiler.analyze(g.query_profile.queries)
+
+    assert report["queries"] == 7
+    assert list(report["n_plus_one"].values()) == [5]
+    assert 'find users {"username": "?"}' in report["n_plus_one"]
+    assert list(report["repeated"].values()) == [2]
+    assert report["slow"] == [] and report["collection_scans"] == []
+
+
+def test_query_budget(app):
+    """Tests requests over their query budget fail when budgets are strict."""
+
+    listener = _ProfilerListener()
+    app.config["QUERY_BUDGET_DEFAULT"] = 1
+
+    with app.test_request_context():
+        app.preprocess_request()
+
+        send_query(listener, 1, {"find": "quotes", "filter": {}})
+        send_query(listener, 2, {"count": "quotes", "query": {}})
+
+        with pytest.raises(QueryBudgetExceeded):
+            app.process_response(Response())
+
+
+def test_configured_query_budgets(app):
+    """Tests one query more than the budget of a hot path fails the tests."""
+
+    listener = _ProfilerListener()
+
+    for endpoint, budget in app.config["QUERY_BUDGETS"].items():
+        with app.test_request_context():
+            path = url_for(endpoint)
+
+        with app.test_request_context(path, method="POST"):
+            app.preprocess_request()
+
+            # Index creation isn't a query
+            send_query(listener, 0, {"createIndexes": "quotes", "indexes": []})
+            for request_id in range(1, budget + 1):
+                send_query(listener, request_id, {"find": "users", "filter": {}})
+
+            response = app.process_response(Response())
+            assert response.headers["X-Query-Count"] == str(budget)
+
+        with app.test_request_context(path, method="POST"):
+            app.preprocess_request()
+
+            for request_id in range(budget + 1):
+                send_query(listener, request_id, {"find": "users", "filter": {}})
+
+            with pytest.raises(QueryBudgetExceeded):
+                app.process_response(Response())
+
+
+def test_hot_path_query_budgets(client, admin_headers, new_quote, monkeypatch):
+    """Tests the hot paths stay within their budgets, and a regression doesn't."""
+
+    quotes_url = url_for("api.quotes")
+    res = client.get(quotes_url, headers=admin_headers)
+
+    if res.headers["X-Query-Count"] == "0":
+        pytest.skip("The database client doesn't send command monitoring events")
+
+    for query_parameters in [
+        {"per_page": "2"},
+        {"tags": "test-tag"},
+        {"cursor": ""},
+        {"query": "quote"},
+    ]:
+        res = client.get(
+            quotes_url, headers=admin_headers, query_string=query_parameters
+        )
+        assert res.status_code == HttpStatus.OK_200.value
+
+    res = client.post(url_for("auth.token_refresh"), headers=admin_headers)
+    assert res.status_code == HttpStatus.OK_200.value
+
+    # Fetching the user again for the new token goes over the budget
+    def add_token_to_database(encoded_token, identity_claim, user=None):
+        add_token(encoded_token, identity_claim, User.objects.get(id=user.id))
+
+    add_token = token.add_token_to_database
+    monkeypatch.setattr(token, "add_token_to_database", add_token_to_database)
+
+    with pytest.raises(QueryBudgetExceeded):
+        client.post(url_for("auth.token_refresh"), headers=admin_headers)
+
+
+def test_collection_scans():
+    """Tests collection scans are found in winning plans, not in rejected ones."""
+
+    plan = {
+        "queryPlanner": {
+            "winningPlan": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}},
+            "rejectedPlans": [{"stage": "COLLSCAN"}],
+        }
+    }
+    assert not _find_stages(plan, "COLLSCAN")
+
+    plan["queryPlanner"]["winningPlan"]["inputStage"] = {"stage": "COLLSCAN"}
+    assert _find_stages(plan, "COLLSCAN")
@@ -2,12 +2,20 @@
 Tests for the quote resource.
 """
 
+import io
+import gzip
+import json
 import secrets
 
 import pytest
 
 from flask import url_for
+from pymongo.errors import AutoReconnect
 from quotes_api.common import HttpStatus
+from quotes_api.api import bulk
+from quotes_api.api.bulk import read_json_array, read_csv
+from quotes_api.api.models import Author
+from quotes_api.extensions import generations
 
 
 def test_get_quote(client, user_headers, new_quote):
@@ -21,6 +29,12 @@ def test_get_quote(client, user_headers, new_quote):
     assert res.status_code == HttpStatus.NOT_FOUND_404.value
     assert res.get_json() == {"error": "Quote does not exist."}
 
+    # Test 404 error for malformed ids
+    quote_url = url_for("api.quote", quote_id="not-an-id")
+    res = client.get(quote_url, headers=user_headers)
+
+    assert res.status_code == HttpStatus.NOT_FOUND_404.value
+
     # Test get quote
     quote_url = url_for("api.quote", quote_id=new_quote.id)
     res = client.get(quote_url, headers=user_headers)
@@ -160,3 +174,420 @@ def test_get_random_quote(client, user_headers, new_quote):
     assert data["quote_text"] == new_quote.quote_text
     assert data["author_name"] == new_quote.author_name
     assert data["tags"] == new_quote.tags
+
+
+def test_get_all_quotes_with_cursor(client, user_headers, quote_model):
+    """Tests the get all quotes operation with keyset pagination."""
+
+    quote_ids = []
+    for number in range(3):
+        quote = quote_model(
+            quote_text=f"Cursor quote {number}.",
+            author_name="Cursor Author",
+            tags=["cursor-tag"],
+        )
+        quote.save()
+        quote_ids.append(str(quote.id))
+
+    quotes_url = url_for("api.quotes")
+
+    # Test invalid cursor
+    query_parameters = {"cursor": "invalid", "per_page": "2"}
+    res = client.get(quotes_url, headers=user_headers, query_string=query_parameters)
+
+    assert res.status_code == HttpStatus.BAD_REQUEST_400.value
+
+    # Test first page
+    query_parameters = {"cursor": "", "per_page": "2"}
+    res = client.get(quotes_url, headers=user_headers, query_string=query_parameters)
+    data = res.get_json()
+
+    assert res.status_code == HttpStatus.OK_200.value
+    assert [quote["id"] for quote in data["records"]] == quote_ids[:2]
+    assert data["meta"]["links"]["prev"] is None
+    assert "total_records" not in data["meta"]
+
+    # Test next page
+    query_parameters["cursor"] = data["meta"]["cursors"]["next"]
+    res = client.get(quotes_url, headers=user_headers, query_string=query_parameters)
+    data = res.get_json()
+
+    assert [quote["id"] for quote in data["records"]] == quote_ids[2:]
+    assert data["meta"]["links"]["next"] is None
+
+    # Test previous page
+    query_parameters["cursor"] = data["meta"]["cursors"]["prev"]
+    res = client.get(quotes_url, headers=user_headers, query_string=query_parameters)
+    data = res.get_json()
+
+    assert [quote["id"] for quote in data["records"]] == quote_ids[:2]
+
+
+def test_get_all_quotes_without_total(client, user_headers, new_quote):
+    """Tests the get all quotes operation without counting the totals."""
+
+    quotes_url = url_for("api.quotes")
+    query_parameters = {"page": "1", "per_page": "5", "include_total": "false"}
+
+    res = client.get(quotes_url, headers=user_headers, query_string=query_parameters)
+    data = res.get_json()
+    meta = data["meta"]
+
+    assert res.status_code == HttpStatus.OK_200.value
+    assert "total_records" not in meta
+    assert "total_pages" not in meta
+    assert meta["links"]["next"] is None
+    assert data["records"][0]["id"] == str(new_quote.id)
+
+
+def test_get_quotes_by_tags_expression(client, user_headers, quote_model):
+    """Tests filtering the quote list with a tags expression and an author."""
+
+    quote_ids = []
+    for number, tags in enumerate([["love", "life"], ["love"], ["love", "humor"]]):
+        quote = quote_model(
+            quote_text=f"Tagged quote {number}.",
+            author_name="Tag Author" if number < 2 else "Other Author",
+            tags=tags,
+        )
+        quote.save()
+        quote_ids.append(str(quote.id))
+
+    quotes_url = url_for("api.quotes")
+
+    query_parameters = {"tags": "love,!life", "per_page": "1"}
+    res = client.get(quotes_url, headers=user_headers, query_string=query_parameters)
+    data = res.get_json()
+
+    assert res.status_code == HttpStatus.OK_200.value
+    assert [quote["id"] for quote in data["records"]] == quote_ids[1:2]
+    assert data["meta"]["total_records"] == 2
+
+    query_parameters["page"] = "2"
+    res = client.get(quotes_url, headers=user_headers, query_string=query_parameters)
+    assert [quote["id"] for quote in res.get_json()["records"]] == quote_ids[2:]
+
+    query_parameters = {"tags": "(life|humor),love", "author": "Tag Author"}
+    res = client.get(quotes_url, headers=user_headers, query_string=query_parameters)
+    data = res.get_json()
+
+    assert [quote["id"] for quote in data["records"]] == quote_ids[:1]
+    assert data["meta"]["total_records"] == 1
+
+    # Cursor pages filter with the translated mongodb query
+    query_parameters = {"tags": "love,!life", "cursor": ""}
+    res = client.get(quotes_url, headers=user_headers, query_string=query_parameters)
+    assert [quote["id"] for quote in res.get_json()["records"]] == quote_ids[1:]
+
+    query_parameters = {"tags": "love,(life"}
+    res = client.get(quotes_url, headers=user_headers, query_string=query_parameters)
+    assert res.status_code == HttpStatus.BAD_REQUEST_400.value
+
+
+def test_get_random_quotes(client, user_headers, quote_model):
+    """Tests the get random quote operation with a count."""
+
+    for number in range(3):
+        quote = quote_model(
+            quote_text=f"Random quote {number}.",
+            author_name="Random Author",
+            tags=["random-tag"],
+        )
+        quote.save()
+
+    random_quote_url = url_for("api.random_quote")
+
+    # Test invalid count
+    query_parameters = {"count": "0"}
+    res = client.get(
+        random_quote_url, headers=user_headers, query_string=query_parameters
+    )
+
+    assert res.status_code == HttpStatus.BAD_REQUEST_400.value
+
+    # Test get distinct random quotes
+    query_parameters = {"count": "2", "tags": "random-tag"}
+    res = client.get(
+        random_quote_url, headers=user_headers, query_string=query_parameters
+    )
+    records = res.get_json()["records"]
+
+    assert res.status_code == HttpStatus.OK_200.value
+    assert len(records) == 2
+    assert len({quote["id"] for quote in records}) == 2
+
+    # Test count larger than the matching quotes
+    query_parameters = {"count": "5", "author": "Random Author"}
+    res = client.get(
+        random_quote_url, headers=user_headers, query_string=query_parameters
+    )
+
+    assert len(res.get_json()["records"]) == 3
+
+
+def test_get_random_unkeyed_quotes(client, user_headers, quote_model):
+    """Tests quotes without a random key are still drawn."""
+
+    quote_model(quote_text="Keyed quote.", author_name="Author").save()
+    quote_model._get_collection().insert_one(
+        {"quote_text": "Unkeyed quote.", "author_name": "Author", "tags": []}
+    )
+
+    random_quote_url = url_for("api.random_quote")
+    quote_texts = set()
+
+    for _ in range(20):
+        res = client.get(random_quote_url, headers=user_headers)
+        assert res.status_code == HttpStatus.OK_200.value
+        quote_texts.add(res.get_json()["quote_text"])
+
+    assert quote_texts == {"Keyed quote.", "Unkeyed quote."}
+
+
+def test_get_quote_batch(client, user_headers, quote_model):
+    """Tests getting several quotes by id in one request."""
+
+    quote_ids = []
+    for number in range(3):
+        quote = quote_model(quote_text=f"Batch quote {number}.", author_name="Author")
+        quote.save()
+        quote_ids.append(str(quote.id))
+
+    batch_url = url_for("api.quote_batch")
+    missing_id = "5f0c5c5e2a1b3c4d5e6f7a8b"
+    data = {"ids": [quote_ids[2], missing_id, quote_ids[0], "invalid", quote_ids[2]]}
+
+    res = client.post(batch_url, headers=user_headers, json=data)
+    data = res.get_json()
+
+    assert res.status_code == HttpStatus.OK_200.value
+    assert [quote["id"] for quote in data["records"]] == [quote_ids[2], quote_ids[0]]
+    assert data["records"][0]["quote_text"] == "Batch quote 2."
+    assert data["missing"] == [missing_id, "invalid"]
+
+    # Ids are matched and deduplicated whatever their case
+    data = {"ids": [quote_ids[1].upper(), quote_ids[1], missing_id.upper()]}
+    res = client.post(batch_url, headers=user_headers, json=data)
+    data = res.get_json()
+
+    assert [quote["id"] for quote in data["records"]] == [quote_ids[1]]
+    assert data["missing"] == [missing_id]
+
+    # Test invalid ids
+    for data in [{}, {"ids": []}, {"ids": "invalid"}, {"ids": [1]}]:
+        res = client.post(batch_url, headers=user_headers, json=data)
+        assert res.status_code == HttpStatus.BAD_REQUEST_400.value
+
+    data = {"ids": quote_ids * 50}
+    res = client.post(batch_url, headers=user_headers, json=data)
+    assert res.status_code == HttpStatus.BAD_REQUEST_400.value
+
+
+def test_post_quote_bulk(client, admin_headers, quote_model):
+    """Tests creating and upserting many quotes in one request."""
+
+    quote_model(quote_text="Existing bulk quote.", author_name="Author").save()
+
+    bulk_url = url_for("api.quote_bulk")
+    data = [
+        {"quote_text": "Bulk quote 1.", "author_name": "Bulk Author"},
+        {"quote_text": "Bulk quote 2.", "author_name": "Bulk Author", "tags": ["a"]},
+        {"author_name": "Bulk Author"},
+        {"quote_text": "Existing bulk quote.", "author_name": "Author"},
+    ]
+
+    res = client.post(bulk_url, headers=admin_headers, json=data)
+    report = res.get_json()
+
+    assert res.status_code == HttpStatus.OK_200.value
+    assert report["inserted"] == 2
+    assert report["failed"] == 2
+    assert [error["index"] for error in report["errors"]] == [2, 3]
+    assert "quote_text" in report["errors"][0]["messages"]
+
+    quote = quote_model.objects.get(quote_text="Bulk quote 1.")
+    assert quote.tags == ["other"]
+    assert quote.random_key is not None
+
+    # NDJSON streams, with upserts on the quote text
+    lines = [
+        '{"quote_text": "Bulk quote 1.", "author_name": "New Author"}',
+        "",
+        "not json",
+        '{"quote_text": "Bulk quote 3.", "author_name": "Bulk Author"}',
+    ]
+    res = client.post(
+        bulk_url,
+        headers={**admin_headers, "content-type": "application/x-ndjson"},
+        query_string={"upsert": "true"},
+        data="\n".join(lines),
+    )
+    report = res.get_json()
+
+    assert res.status_code == HttpStatus.OK_200.value
+    assert (report["inserted"], report["updated"], report["failed"]) == (1, 1, 1)
+    assert report["errors"][0]["index"] == 1
+    assert quote_model.objects.get(quote_text="Bulk quote 1.").author_name == (
+        "New Author"
+    )
+    assert quote_model.objects.get(quote_text="Bulk quote 1.").random_key == (
+        quote.random_key
+    )
+
+    # The previous and the new authors of upserted quotes are recounted
+    author_counts = {
+        author.author_name: author.quote_count for author in Author.objects
+    }
+    assert author_counts["Bulk Author"] == 2
+    assert author_counts["New Author"] == 1
+
+    res = client.post(bulk_url, headers=admin_headers, json={"quote_text": "Quote"})
+    assert res.status_code == HttpStatus.BAD_REQUEST_400.value
+
+
+def test_post_quote_bulk_failure(app, client, admin_headers, quote_model, monkeypatch):
+    """Tests the chunks written before a failed one are refreshed in the authors."""
+
+    app.config["QUOTE_BULK_CHUNK_SIZE"] = 2
+    generation = generations.get("quotes")
+
+    collection_class = type(quote_model._get_collection())
+    bulk_write = collection_class.bulk_write
+    calls = []
+
+    def failing_bulk_write(collection, requests, **kwargs):
+        calls.append(requests)
+
+        if len(calls) == 2:
+            raise AutoReconnect("Connection lost")
+
+        return bulk_write(collection, requests, **kwargs)
+
+    def materialize_authors():
+        raise AssertionError("Only the written authors are recounted")
+
+    monkeypatch.setattr(collection_class, "bulk_write", failing_bulk_write)
+    monkeypatch.setattr(bulk, "materialize_authors", materialize_authors)
+
+    data = [
+        {"quote_text": f"Chunk quote {number}.", "author_name": "Chunk Author"}
+        for number in range(4)
+    ]
+    res = client.post(url_for("api.quote_bulk"), headers=admin_headers, json=data)
+
+    assert res.status_code == HttpStatus.INTERNAL_SERVER_ERROR_500.value
+    assert Author.objects.get(author_name="Chunk Author").quote_count == 2
+    assert generations.get("quotes") > generation
+
+
+def test_export_quotes(client, user_headers, quote_model):
+    """Tests streaming the quotes as NDJSON, filtered and gzip compressed."""
+
+    quote_ids = []
+    for number, tags in enumerate([["export"], ["export", "other"], ["other"]]):
+        quote = quote_model(
+            quote_text=f"Export quote {number}.", author_name="Author", tags=tags
+        )
+        quote.save()
+        quote_ids.append(str(quote.id))
+
+    export_url = url_for("api.quote_export")
+
+    res = client.get(export_url, headers=user_headers)
+    lines = res.get_data(as_text=True).splitlines()
+
+    assert res.status_code == HttpStatus.OK_200.value
+    assert res.mimetype == "application/x-ndjson"
+    assert [json.loads(line)["id"] for line in lines] == quote_ids
+    assert json.loads(lines[0])["quote_text"] == "Export quote 0."
+
+    query_parameters = {"tags": "export,!other"}
+    res = client.get(
+        export_url,
+        headers={**user_headers, "Accept-Encoding": "gzip"},
+        query_string=query_parameters,
+    )
+    lines = gzip.decompress(res.get_data()).decode("utf-8").splitlines()
+
+    assert res.headers["Content-Encoding"] == "gzip"
+    assert [json.loads(line)["id"] for line in lines] == quote_ids[:1]
+
+    query_parameters = {"tags": "export,"}
+    res = client.get(export_url, headers=user_headers, query_string=query_parameters)
+    assert res.status_code == HttpStatus.BAD_REQUEST_400.value
+
+
+def test_read_quote_files():
+    """Tests streaming quote items from JSON arrays and CSV files."""
+
+    quotes = [{"quote_text": f'Quote [{number}], "quoted".'} for number in range(20)]
+    text = json.dumps(quotes, indent=2)
+
+    # Items split between buffers are read whole
+    assert list(read_json_array(io.StringIO(text), buffer_size=7)) == quotes
+    assert list(read_json_array(io.StringIO(" [ ] "))) == []
+
+    for text in ["{}", '[{"quote_text": "Quote"}']:
+        with pytest.raises(ValueError):
+            list(read_json_array(io.StringIO(text), buffer_size=4))
+
+    text = 'quote_text,author_name,tags\n"Quote, text",Author,"love, life"\nQuote,,\n'
+    assert list(read_csv(io.StringIO(text))) == [
+        {
+            "quote_text": "Quote, text",
+            "author_name": "Author",
+            "tags": ["love", "life"],
+        },
+        {"quote_text": "Quote"},
+    ]
+
+
+def test_import_quotes_failure(app, quote_model, tmp_path):
+    """Tests a stopped import reports its error and fails the command."""
+
+    path = tmp_path / "quotes.json"
+    path.write_text('[{"quote_text": "Quote.", "author_name": "Author"}, {"quote')
+
+    res = app.test_cli_runner().invoke(args=["database", "import", str(path)])
+
+    assert res.exit_code == 1
+    assert "Import failed: JSONDecodeError" in res.output
+    assert "Resume it with --offset" in res.output
+
+
+def test_import_quotes_resume(app, quote_model, tmp_path, monkeypatch):
+    """Tests an import stopped by a failed chunk resumes from the start of the chunk."""
+
+    path = tmp_path / "quotes.json"
+    quotes = [
+        {"quote_text": f"Quote {number}.", "author_name": "Author"}
+        for number in range(4)
+    ]
+    path.write_text(json.dumps(quotes))
+
+    collection_class = type(quote_model._get_collection())
+    bulk_write = collection_class.bulk_write
+    calls = []
+
+    def failing_bulk_write(collection, requests, **kwargs):
+        calls.append(requests)
+
+        if len(calls) == 2:
+            raise AutoReconnect("Connection lost")
+
+        return bulk_write(collection, requests, **kwargs)
+
+    monkeypatch.setattr(collection_class, "bulk_write", failing_bulk_write)
+
+    args = ["database", "import", str(path), "--chunk-size", "2"]
+    res = app.test_cli_runner().invoke(args=args)
+
+    assert res.exit_code == 1
+    assert "Resume it with --offset 2." in res.output
+    assert quote_model.objects.count() == 2
+
+    monkeypatch.setattr(collection_class, "bulk_write", bulk_write)
+    res = app.test_cli_runner().invoke(args=args + ["--offset", "2"])
+
+    assert res.exit_code == 0
+    assert quote_model.objects.count() == 4
@@ -0,0 +1,52 @@
+"""
+Tests for the HTTP response cache.
+"""
+
+from flask import url_for
+
+from quotes_api.common import HttpStatus
+from quotes_api.extensions import generations
+
+
+def test_quote_response_revalidation(client, admin_headers, new_quote):
+    """Tests cached quote responses are revalidated and cleared on quote writes."""
+
+    quote_url = url_for("api.quote", quote_id=new_quote.id)
+    res = client.get(quote_url, headers=admin_headers)
+    etag = res.headers["ETag"]
+
+    assert res.status_code == HttpStatus.OK_200.value
+    assert res.cache_control.private
+
+    # Matching ETags skip the response body
+    res = client.get(quote_url, headers=admin_headers | {"If-None-Match": etag})
+
+    assert res.status_code == HttpStatus.NOT_MODIFIED_304.value
+    assert res.headers["ETag"] == etag
+    assert res.get_data() == b""
+
+    # ETags follow the body, not the generation of the cached response
+    generations.bump("quotes")
+    res = client.get(quote_url, headers=admin_headers | {"If-None-Match": etag})
+
+    assert res.status_code == HttpStatus.NOT_MODIFIED_304.value
+
+    # Quote writes clear the cached responses
+    res = client.patch(quote_url, headers=admin_headers, json={"tags": ["patched"]})
+    assert res.status_code == HttpStatus.NO_CONTENT_204.value
+
+    res = client.get(quote_url, headers=admin_headers | {"If-None-Match": etag})
+
+    assert res.status_code == HttpStatus.OK_200.value
+    assert res.headers["ETag"] != etag
+    assert res.get_json()["tags"] == ["patched"]
+
+
+def test_error_responses_are_not_cached(client, admin_headers):
+    """Tests only successful responses are cached."""
+
+    quote_url = url_for("api.quote", quote_id="5fd8a2b4c3d4e5f6a7b8c9d0")
+    res = client.get(quote_url, headers=admin_headers)
+
+    assert res.status_code == HttpStatus.NOT_FOUND_404.value
+    assert "ETag" not in res.headers
@@ -0,0 +1,126 @@
+"""
+Tests for the quote search index.
+"""
+
+from datetime import datetime
+
+from flask import url_for
+
+from quotes_api.api.search import InvertedIndexBackend
+from quotes_api.common import HttpStatus, InvertedIndex
+from quotes_api.extensions import generations
+
+
+def test_inverted_index_search(tmp_path):
+    """Tests ranking, phrase, prefix and removal queries on the inverted index."""
+
+    index = InvertedIndex()
+    index.add("1", "The only way out is through.", "Robert Frost")
+    index.add("2", "Way leads on to way.", "Robert Frost")
+    index.add("3", "Be yourself, everyone else is taken.", "Oscar Wilde")
+
+    # Documents with more occurrences of the term rank first
+    assert [doc_id for doc_id, _ in index.search("way")] == ["2", "1"]
+
+    # Phrases must appear in order, and can't span fields
+    assert [doc_id for doc_id, _ in index.search('"way out"')] == ["1"]
+    assert index.search('"through robert"') == []
+    assert index.search('"unknown words"') == []
+
+    assert [doc_id for doc_id, _ in index.search("every*")] == ["3"]
+    assert {doc_id for doc_id, _ in index.search("frost")} == {"1", "2"}
+
+    index.remove("2")
+    assert [doc_id for doc_id, _ in index.search("way")] == ["1"]
+
+    # Snapshots keep the indexed documents
+    path = tmp_path / "index.json.gz"
+    index.save(path)
+    snapshot = InvertedIndex.load(path)
+
+    assert len(snapshot) == 2
+    assert [doc_id for doc_id, _ in snapshot.search("way")] == ["1"]
+
+
+def test_search_quotes_with_index(app, client, user_headers, quote_model):
+    """Tests quote searches served by the in-process index follow quote writes."""
+
+    app.config["SEARCH_BACKEND"] = "index"
+    app.extensions.pop("quote_search", None)
+
+    quote_model(quote_text="Wisdom begins in wonder.", author_name="Socrates").save()
+    quote_model(quote_text="Wonder, then wonder again.", author_name="Author").save()
+
+    quotes_url = url_for("api.quotes")
+    res = client.get(quotes_url, headers=user_headers, query_string={"query": "wonder"})
+    data = res.get_json()
+
+    assert res.status_code == HttpStatus.OK_200.value
+    assert [quote["author_name"] for quote in data["records"]] == [
+        "Author",
+        "Socrates",
+    ]
+
+    # Filters are applied to the matches
+    query_parameters = {"query": "wonder", "author": "Socrates"}
+    res = client.get(quotes_url, headers=user_headers, query_string=query_parameters)
+    assert [quote["author_name"] for quote in res.get_json()["records"]] == ["Socrates"]
+
+    # New quotes are indexed as they're written
+    index = app.extensions["quote_search"].index
+    quote = quote_model(quote_text="Stay in wonder.", author_name="Newcomer")
+    quote.save()
+    app.extensions["invalidation_bus"].deliver(
+        "quotes",
+        {"op": "saved", "id": str(quote.id), "generation": generations.bump("quotes")},
+    )
+
+    res = client.get(quotes_url, headers=user_headers, query_string={"query": "stay"})
+    assert [quote["author_name"] for quote in res.get_json()["records"]] == ["Newcomer"]
+    assert app.extensions["quote_search"].index is index
+
+    # Writes of workers that aren't on the bus only move the generation
+    quote_model(quote_text="Stay curious.", author_name="Elsewhere").save()
+    generations.bump("quotes")
+
+    query_parameters = {"query": "stay", "author": "Elsewhere"}
+    res = client.get(quotes_url, headers=user_headers, query_string=query_parameters)
+    assert [quote["author_name"] for quote in res.get_json()["records"]] == [
+        "Elsewhere"
+    ]
+
+    # Quotes edited by workers that aren't on the bus are caught up with
+    index = app.extensions["quote_search"].index
+    quote_model.objects(id=quote.id).update(
+        quote_text="Stay humble.", updated_at=datetime.utcnow()
+    )
+    generations.bump("quotes")
+
+    res = client.get(quotes_url, headers=user_headers, query_string={"query": "humble"})
+    assert [quote["author_name"] for quote in res.get_json()["records"]] == ["Newcomer"]
+    assert app.extensions["quote_search"].index is index
+
+
+def test_search_index_snapshot(app, quote_model, tmp_path):
+    """Tests indexes loaded from a snapshot catch up with the quotes written since."""
+
+    path = str(tmp_path / "index.json.gz")
+    quote = quote_model(quote_text="Wisdom begins in wonder.", author_name="Socrates")
+    quote.save()
+
+    InvertedIndexBackend(app).get_index().save(path)
+
+    quote_model.objects(id=quote.id).update(
+        quote_text="Wisdom begins in doubt.", updated_at=datetime.utcnow()
+    )
+    other_quote = quote_model(quote_text="Doubt everything.", author_name="Author")
+    other_quote.save()
+
+    app.config["SEARCH_INDEX_SNAPSHOT"] = path
+    index = InvertedIndexBackend(app).get_index()
+
+    assert index.search("wonder") == []
+    assert {doc_id for doc_id, _ in index.search("doubt")} == {
+        str(quote.id),
+        str(other_quote.id),
+    }
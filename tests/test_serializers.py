@@ -0,0 +1,44 @@
+"""
+Tests for the compiled serializers.
+"""
+
+import json
+
+from quotes_api.common import compile_serializer, get_schema
+from quotes_api.api.schemas import QuoteSchema
+from quotes_api.auth.schemas import TokenBlacklistSchema
+
+
+def test_compiled_quote_serializer(quote_model, new_quote):
+    """Tests raw quotes dump exactly like quote documents."""
+
+    # Unset fields dump their default, or None
+    quote_model(quote_text="Bare quote.", author_name="Author").save()
+    quote_model._get_collection().update_one(
+        {"quote_text": "Bare quote."}, {"$unset": {"tags": ""}}
+    )
+
+    dump_quotes = compile_serializer(QuoteSchema, quote_model)
+    records = dump_quotes(quote_model.objects.order_by("id").as_pymongo())
+    expected = get_schema(QuoteSchema, many=True).dump(
+        quote_model.objects.order_by("id")
+    )
+
+    assert json.dumps(records) == json.dumps(expected)
+    assert records[1]["author_image"] is None
+    assert records[1]["tags"] == ["other"]
+
+
+def test_compiled_token_serializer(token_blacklist_model, new_access_token):
+    """Tests raw tokens dump exactly like token documents."""
+
+    dump_tokens = compile_serializer(
+        TokenBlacklistSchema, token_blacklist_model, exclude=["user"]
+    )
+    records = dump_tokens(token_blacklist_model.objects.as_pymongo())
+    expected = get_schema(TokenBlacklistSchema, many=True, exclude=["user"]).dump(
+        token_blacklist_model.objects
+    )
+
+    assert json.dumps(records) == json.dumps(expected)
+    assert "exp" in records[0]
@@ -2,9 +2,17 @@
 Test for the tag resource.
 """
 
+import pytest
 from flask import url_for
 
-from quotes_api.common import HttpStatus
+from quotes_api.common import (
+    HttpStatus,
+    TagIndex,
+    parse_tag_expression,
+    tag_expression_query,
+)
+from quotes_api.common.tag_index import Bitmap
+from quotes_api.extensions import generations
 
 
 def test_get_all_tags(client, user_headers):
@@ -14,3 +22,153 @@ def test_get_all_tags(client, user_headers):
     res = client.get(tags_url, headers=user_headers)
 
     assert res.status_code == HttpStatus.OK_200.value
+
+
+def test_tag_counts_follow_quote_writes(client, admin_headers, quote_model):
+    """Tests the tag list is sorted, paginated and updated on quote writes."""
+
+    for number, tags in enumerate([["love", "life"], ["love"], ["humor"]]):
+        quote_model(
+            quote_text=f"Quote {number}.", author_name="Author", tags=tags
+        ).save()
+
+    tags_url = url_for("api.tags")
+    query_parameters = {"sort_by": "count", "sort_order": "desc", "per_page": "2"}
+    res = client.get(tags_url, headers=admin_headers, query_string=query_parameters)
+    data = res.get_json()
+
+    assert res.status_code == HttpStatus.OK_200.value
+    assert data["records"] == [
+        {"tag": "love", "count": 2},
+        {"tag": "humor", "count": 1},
+    ]
+    assert data["meta"]["total_records"] == 3
+
+    # New quotes are counted as they're created
+    data = {"quote_text": "Post quote.", "author_name": "Author", "tags": ["humor"]}
+    res = client.post(url_for("api.quotes"), headers=admin_headers, json=data)
+    assert res.status_code == HttpStatus.CREATED_201.value
+
+    res = client.get(tags_url, headers=admin_headers)
+    assert res.get_json()["records"] == [
+        {"tag": "humor", "count": 2},
+        {"tag": "life", "count": 1},
+        {"tag": "love", "count": 2},
+    ]
+
+    # Tag filtered lists are counted with the tag index
+    query_parameters = {"tags": "love,life"}
+    res = client.get(
+        url_for("api.quotes"), headers=admin_headers, query_string=query_parameters
+    )
+    assert res.get_json()["meta"]["total_records"] == 1
+
+    # Writes of workers that aren't on the bus rebuild the index
+    quote_model(quote_text="Other quote.", author_name="Author", tags=["life"]).save()
+    generations.bump("quotes")
+
+    res = client.get(
+        url_for("api.quotes"), headers=admin_headers, query_string=query_parameters
+    )
+    assert res.get_json()["meta"]["total_records"] == 1
+
+    res = client.get(tags_url, headers=admin_headers)
+    assert {"tag": "life", "count": 2} in res.get_json()["records"]
+
+
+def test_get_tags_invalid_sort(client, user_headers):
+    """Tests the tag list rejects unknown sort fields."""
+
+    query_parameters = {"sort_by": "author"}
+    res = client.get(
+        url_for("api.tags"), headers=user_headers, query_string=query_parameters
+    )
+
+    assert res.status_code == HttpStatus.BAD_REQUEST_400.value
+
+
+def test_tag_index_bitmaps():
+    """Tests tag bitmaps and counts as documents are added and removed."""
+
+    index = TagIndex()
+    index.add("1", ["love", "life"], "Author A")
+    index.add("2", ["love"], "Author B")
+    index.add("3", ["humor"], "Author A")
+
+    assert index.doc_ids(index.match(parse_tag_expression("love,life"))) == ["1"]
+    assert index.doc_ids(index.match(parse_tag_expression("life|humor"))) == ["1", "3"]
+    assert index.doc_ids(index.match(author="Author A")) == ["1", "3"]
+    assert not index.match(parse_tag_expression("love,unknown"))
+
+    # Out of order ids are renumbered, and unused tags are dropped
+    index.remove("1")
+    index.add("0", ["humor"])
+
+    assert index.count("love") == 1
+    assert index.count("life") == 0
+    assert index.doc_ids(index.match(parse_tag_expression("humor"))) == ["0", "3"]
+    assert index.doc_ids(index.match(), skip=1, limit=1) == ["2"]
+    assert index.tags(by="count", descending=True) == [("humor", 2), ("love", 1)]
+
+    # Updates of older documents keep their ordinals
+    index.compact = None
+    index.add("0", ["love"])
+
+    assert index.doc_ids(index.match(parse_tag_expression("love"))) == ["0", "2"]
+
+
+def test_bitmap_blocks():
+    """Tests block bitmaps skip, limit and combine ordinals across blocks."""
+
+    evens = Bitmap()
+    thirds = Bitmap()
+
+    for ordinal in range(0, 20000, 2):
+        evens.add(ordinal)
+    for ordinal in range(0, 20000, 3):
+        thirds.add(ordinal)
+
+    assert len(evens) == 10000
+    assert evens.select(skip=5000, limit=3) == [10000, 10002, 10004]
+    assert evens.select(skip=9999) == [19998]
+    assert evens.select(skip=10000) == []
+    assert (evens & thirds).select(limit=3) == [0, 6, 12]
+    assert len(evens | thirds) == len(evens) + len(thirds) - len(evens & thirds)
+    assert (evens - thirds).select(limit=3) == [2, 4, 8]
+
+    evens.discard(0)
+    assert evens.select(limit=1) == [2]
+
+
+def test_tag_expressions():
+    """Tests parsing tag expressions and evaluating them on the tag index."""
+
+    index = TagIndex()
+    index.add("1", ["love", "life"])
+    index.add("2", ["love"])
+    index.add("3", ["humor", "life"])
+    index.add("4", [])
+
+    expected = {
+        "love,!life": ["2"],
+        "!love": ["3", "4"],
+        "love,life|humor": ["1", "3"],
+        "(love|humor),life": ["1", "3"],
+        "!(love|life)": ["4"],
+        " love , ! life ": ["2"],
+    }
+
+    for text, doc_ids in expected.items():
+        assert index.doc_ids(index.match(parse_tag_expression(text))) == doc_ids
+
+    assert parse_tag_expression("love,life|humor") == (
+        "or",
+        [("and", [("tag", "love"), ("tag", "life")]), ("tag", "humor")],
+    )
+    assert tag_expression_query(parse_tag_expression("love,!life")) == {
+        "$and": [{"tags": "love"}, {"tags": {"$ne": "life"}}]
+    }
+
+    for text in ["", "love,", "(love", "love)", "love||life", "!"]:
+        with pytest.raises(ValueError):
+            parse_tag_expression(text)